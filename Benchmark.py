@@ -0,0 +1,402 @@
+from Settings import *
+from World_Utils import *
+from Window_Utils import *
+from Checks import FakeContext, loadTexturesLegacy
+from opensimplex import OpenSimplex
+import tempfile
+import numba
+import types
+
+BENCHMARK_SEED = 2024
+
+def timeFunction(function, *args, repeats = 3):
+    '''
+    Time a function over a number of repeats and return the median time in seconds
+    '''
+    times = []
+    for _ in range(repeats):
+        startTime = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - startTime)
+    return float(np.median(times))
+
+def generateChunksLegacy(worldArray, heightMap):
+    '''
+    The original generation path (a Python loop that launches the chunk kernel once per chunk)
+    '''
+    numChunks = [size // CHUNK_SIZE for size in worldArray.shape]
+    for worldXIndex in range(numChunks[X_INDEX]):
+        for worldYIndex in range(numChunks[Y_INDEX]):
+            for worldZIndex in range(numChunks[Z_INDEX]):
+                chunkIndex = (worldXIndex, worldYIndex, worldZIndex)
+                chunk = Chunk(worldArray, heightMap, chunkIndex, World.convertWorldIndexToPosition(chunkIndex))
+                chunk.upload()
+
+def generateChunksColumns(worldArray, heightMap):
+    '''
+    The single kernel column fill generation path
+    '''
+    generateTerrain(worldArray, heightMap, BENCHMARK_SEED)
+
+def benchmarkGeneration(scales = (1, 2), repeats = 3):
+    '''
+    Compare the legacy per chunk generation with the column fill kernel at multiples of the default world size (in x and z)
+    '''
+    warmUpArray = np.zeros((CHUNK_SIZE, CHUNK_SIZE * WORLD_SIZE_Y, CHUNK_SIZE), 'u1')
+    warmUpHeightMap = np.full((CHUNK_SIZE, CHUNK_SIZE), 0.5)
+    generateChunksLegacy(warmUpArray, warmUpHeightMap)
+    generateChunksColumns(warmUpArray, warmUpHeightMap)
+
+    for scale in scales:
+        worldSizeXZ = CHUNK_SIZE * WORLD_SIZE_XZ * scale
+        heightMap = generateHeightMap(BENCHMARK_SEED, worldSizeXZ)
+        worldArray = np.zeros((worldSizeXZ, CHUNK_SIZE * WORLD_SIZE_Y, worldSizeXZ), 'u1')
+
+        legacyTime = timeFunction(generateChunksLegacy, worldArray, heightMap, repeats = repeats)
+        columnTime = timeFunction(generateChunksColumns, worldArray, heightMap, repeats = repeats)
+        print(f'Generation {worldArray.shape}: legacy {legacyTime:.3f}s, column fill {columnTime:.3f}s ({legacyTime / columnTime:.1f}x)')
+
+def generateHeightMapLegacy(seed, worldSize):
+    '''
+    The original height map path (one OpenSimplex.noise2array call per octave over the whole grid)
+    '''
+    generator = OpenSimplex(seed)
+    xCoords = zCoords = convertToNormalized(np.arange(worldSize), worldSize)
+
+    elevation = np.zeros((worldSize, worldSize))
+    amplitude, frequency, sumAmplitude = 1, 3, 0
+    for _ in range(NUM_OCTAVES):
+        elevation += amplitude * shift(generator.noise2array(xCoords * frequency, zCoords * frequency))
+        sumAmplitude += amplitude 
+
+        amplitude *= 0.5
+        frequency *= 2
+    
+    elevation /= sumAmplitude
+    return applyHeightRedistribution(elevation, FUDGE_FACTOR, REDISTRIBUTION)
+
+def benchmarkHeightMap(worldSize = CHUNK_SIZE * WORLD_SIZE_XZ, repeats = 3):
+    '''
+    Time the height map per octave and in total for the legacy path and the height map engine
+    '''
+    engine = HeightMapEngine(BENCHMARK_SEED, worldSize)
+    generateHeightMapLegacy(BENCHMARK_SEED, 64)
+    engine.evaluate(0, 64, 0, 64)
+
+    for octave in range(NUM_OCTAVES):
+        octaveMask = np.arange(NUM_OCTAVES) == octave
+        octaveTime = timeFunction(engine.evaluate, 0, worldSize, 0, worldSize, octaveMask, repeats = repeats)
+        status = 'kept' if engine.activeOctaves[octave] else 'culled'
+        print(f'Octave {octave} (frequency {engine.frequencies[octave]:g}): {octaveTime:.3f}s single threaded, {status}')
+
+    legacyTime = timeFunction(generateHeightMapLegacy, BENCHMARK_SEED, worldSize, repeats = repeats)
+    engineTime = timeFunction(engine.generate, repeats = repeats)
+    print(f'Height map {worldSize}x{worldSize}: legacy {legacyTime:.3f}s, engine {engineTime:.3f}s ({legacyTime / engineTime:.1f}x, {np.count_nonzero(engine.activeOctaves)} of {NUM_OCTAVES} octaves)')
+
+def benchmarkParallelGeneration(workerCounts = (1, 2, 4), seed = BENCHMARK_SEED):
+    '''
+    Time generating the default world with different numbers of worker processes (Checks.py's checkDeterminism checks that they give the same world)
+    '''
+    worldArray = np.zeros((CHUNK_SIZE * WORLD_SIZE_XZ, CHUNK_SIZE * WORLD_SIZE_Y, CHUNK_SIZE * WORLD_SIZE_XZ), 'u1')
+    for numWorkers in workerCounts:
+        generationTime = timeFunction(generateTerrainParallel, worldArray, seed, numWorkers, repeats = 1)
+        print(f'Parallel generation with {numWorkers} workers: {generationTime:.3f}s')
+
+def benchmarkSaveFormats(seed = BENCHMARK_SEED):
+    '''
+    Compare save time, load time, and file size of the legacy .npz save with the region file on a generated world, along with loading a single chunk column from the region file
+    '''
+    worldSize = (CHUNK_SIZE * WORLD_SIZE_XZ, CHUNK_SIZE * WORLD_SIZE_Y, CHUNK_SIZE * WORLD_SIZE_XZ)
+    worldArray = np.zeros(worldSize, 'u1')
+    generateTerrain(worldArray, generateHeightMap(seed, worldSize[X_INDEX]), seed)
+
+    chunkSummary = ChunkSummary(worldSize)
+    chunkSummary.build(worldArray)
+    lightArray, cameraPosition = np.zeros(0, LIGHT_DTYPE), glm.vec3(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacyPath, regionPath = os.path.join(directory, 'World.npz'), os.path.join(directory, 'World' + REGION_EXTENSION)
+
+        legacySaveTime = timeFunction(lambda: np.savez_compressed(legacyPath, worldArray = worldArray, lightArray = lightArray, cameraPosition = cameraPosition, seed = seed), repeats = 1)
+        regionSaveTime = timeFunction(writeRegionFile, regionPath, worldArray, chunkSummary, seed, cameraPosition, lightArray, repeats = 1)
+
+        legacyLoadTime = timeFunction(lambda: np.load(legacyPath)['worldArray'], repeats = 1)
+        regionLoadTime = timeFunction(lambda: RegionFile(regionPath).loadWorld(), repeats = 1)
+        columnLoadTime = timeFunction(lambda: RegionFile(regionPath).loadRegion((0, 0, 0), (1, WORLD_SIZE_Y, 1)), repeats = 3)
+
+        print(f'Save: npz {legacySaveTime:.3f}s, region {regionSaveTime:.3f}s ({legacySaveTime / regionSaveTime:.1f}x)')
+        print(f'Load: npz {legacyLoadTime:.3f}s, region {regionLoadTime:.3f}s ({legacyLoadTime / regionLoadTime:.1f}x), one chunk column {columnLoadTime * 1000:.2f}ms')
+        print(f'Size: npz {os.path.getsize(legacyPath) / 2 ** 20:.1f} MiB, region {os.path.getsize(regionPath) / 2 ** 20:.1f} MiB')
+
+def benchmarkColumnRLE(numAccesses = 100000, seed = BENCHMARK_SEED):
+    '''
+    Compare the memory of the column RLE world with the dense world array for a default sized world, along with the cost of voxel reads, writes, and decoding a chunk
+    '''
+    worldSize = (CHUNK_SIZE * WORLD_SIZE_XZ, CHUNK_SIZE * WORLD_SIZE_Y, CHUNK_SIZE * WORLD_SIZE_XZ)
+    worldArray = np.zeros(worldSize, 'u1')
+    generateTerrain(worldArray, generateHeightMap(seed, worldSize[X_INDEX]), seed)
+
+    encodeTime = timeFunction(ColumnRLE.fromDense, worldArray, repeats = 1)
+    rleWorld = ColumnRLE.fromDense(worldArray)
+    print(f'Memory: dense {worldArray.nbytes / 2 ** 20:.1f} MiB, column RLE {rleWorld.nbytes / 2 ** 20:.1f} MiB ({worldArray.nbytes / rleWorld.nbytes:.1f}x smaller, {rleWorld.usedRuns / rleWorld.numColumns:.1f} runs per column, encoded in {encodeTime:.3f}s)')
+
+    rng = np.random.default_rng(seed)
+    positions = list(zip(*(rng.integers(0, size, numAccesses).tolist() for size in worldSize)))
+    voxelIDs = rng.integers(0, NUM_VOXEL_TYPES, numAccesses).tolist()
+    rleWorld.getVoxel(0, 0, 0)
+
+    def readVoxels(world):
+        for mapPos in positions:
+            world[mapPos]
+
+    def writeVoxels(world):
+        for mapPos, voxelID in zip(positions, voxelIDs):
+            world[mapPos] = voxelID
+
+    for name, world in (('dense', worldArray), ('column RLE', rleWorld)):
+        readTime, writeTime = timeFunction(readVoxels, world, repeats = 1), timeFunction(writeVoxels, world, repeats = 1)
+        chunkTime = timeFunction(lambda: world[0:CHUNK_SIZE, 0:CHUNK_SIZE, 0:CHUNK_SIZE].copy())
+        print(f'{name}: read {readTime / numAccesses * 1e6:.2f}us, write {writeTime / numAccesses * 1e6:.2f}us per voxel, chunk to dense {chunkTime * 1e6:.0f}us')
+    print(f'Column RLE memory after {numAccesses} writes: {rleWorld.nbytes / 2 ** 20:.1f} MiB')
+
+def benchmarkStartup(seed = BENCHMARK_SEED):
+    '''
+    Compare the CPU time to the first frame (loading the world array and building the chunk summary and brickmap that the first frame needs) from the legacy .npz save, the region file, and the memory mapped world cache
+    '''
+    worldSize = (CHUNK_SIZE * WORLD_SIZE_XZ, CHUNK_SIZE * WORLD_SIZE_Y, CHUNK_SIZE * WORLD_SIZE_XZ)
+    worldArray = np.zeros(worldSize, 'u1')
+    generateTerrain(worldArray, generateHeightMap(seed, worldSize[X_INDEX]), seed)
+
+    chunkSummary = ChunkSummary(worldSize)
+    chunkSummary.build(worldArray)
+
+    def firstFrame(loadWorldArray):
+        loadedArray = loadWorldArray()
+        loadedSummary = ChunkSummary(worldSize)
+        loadedSummary.build(loadedArray)
+        Brickmap(worldSize).build(loadedArray, loadedSummary.state)
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacyPath, regionPath = os.path.join(directory, 'World.npz'), os.path.join(directory, 'World' + REGION_EXTENSION)
+        np.savez_compressed(legacyPath, worldArray = worldArray)
+        writeRegionFile(regionPath, worldArray, chunkSummary, seed, glm.vec3(0), np.zeros(0, LIGHT_DTYPE))
+        WorldCache(os.path.join(directory, 'World' + CACHE_EXTENSION)).create(worldArray, seed, regionPath, True)
+        firstFrame(lambda: worldArray) # Compile the summary and brickmap kernels
+
+        legacyTime = timeFunction(firstFrame, lambda: np.load(legacyPath)['worldArray'], repeats = 1)
+        regionTime = timeFunction(firstFrame, lambda: RegionFile(regionPath).loadWorld(), repeats = 1)
+        cacheTime = timeFunction(firstFrame, lambda: WorldCache(os.path.join(directory, 'World' + CACHE_EXTENSION)).open(), repeats = 1)
+        openTime = timeFunction(lambda: WorldCache(os.path.join(directory, 'World' + CACHE_EXTENSION)).open())
+        print(f'Time to first frame: npz {legacyTime:.3f}s, region {regionTime:.3f}s, memory mapped cache {cacheTime:.3f}s (opening the cache alone {openTime * 1000:.2f}ms)')
+
+def benchmarkRayCasting(numRays = 2 ** 20, seed = BENCHMARK_SEED):
+    '''
+    Measure how many rays per second the batched DDA casts over a generated world (random rays starting just above the terrain, limited to the shader's VIEW_RANGE steps)
+    '''
+    worldSize = (CHUNK_SIZE * WORLD_SIZE_XZ, CHUNK_SIZE * WORLD_SIZE_Y, CHUNK_SIZE * WORLD_SIZE_XZ)
+    worldArray = np.zeros(worldSize, 'u1')
+    generateTerrain(worldArray, generateHeightMap(seed, worldSize[X_INDEX]), seed)
+
+    chunkSummary = ChunkSummary(worldSize)
+    chunkSummary.build(worldArray)
+    brickmap = Brickmap(worldSize)
+    brickmap.build(worldArray, chunkSummary.state)
+
+    rng = np.random.default_rng(seed)
+    origins = rng.uniform((0, 0, 0), worldSize, (numRays, 3))
+    surfaceHeights = np.argmin(worldArray != EMPTY_VOXEL, axis = Y_INDEX)
+    origins[:, Y_INDEX] = surfaceHeights[origins[:, X_INDEX].astype(int), origins[:, Z_INDEX].astype(int)] + rng.uniform(0, 2 * CHUNK_SIZE, numRays)
+    directions = rng.normal(size = (numRays, 3))
+    directions /= np.linalg.norm(directions, axis = 1)[:, None]
+    worldOrigin = np.zeros(3, np.int64)
+
+    castRays(worldArray, brickmap.brickArray, worldOrigin, origins[:1], directions[:1], np.inf, VIEW_RANGE) # Compile the kernel
+    castTime = timeFunction(castRays, worldArray, brickmap.brickArray, worldOrigin, origins, directions, np.inf, VIEW_RANGE)
+    hits = castRays(worldArray, brickmap.brickArray, worldOrigin, origins, directions, np.inf, VIEW_RANGE)[0]
+    print(f'Batched DDA: {numRays / castTime / 1e6:.2f}M rays/s on {numba.get_num_threads()} threads ({hits.mean() * 100:.1f}% of rays hit)')
+
+def benchmarkPathTracer(imageSize = (160, 90), numFrames = 4, worldChunks = 8, seed = BENCHMARK_SEED):
+    '''
+    Measure the samples per second of the CPU path tracer on a small generated world with a few lights for every thread count up to the number of cores (tiles should make it scale close to linearly)
+    '''
+    worldSize = (CHUNK_SIZE * worldChunks, CHUNK_SIZE * WORLD_SIZE_Y, CHUNK_SIZE * worldChunks)
+    worldArray = np.zeros(worldSize, 'u1')
+    generateTerrain(worldArray, generateHeightMap(seed, worldSize[X_INDEX]), seed)
+
+    lights = {}
+    for i, voxelID in enumerate((RED_LIGHT, GREEN_LIGHT, BLUE_LIGHT)):
+        lightX, lightZ = worldSize[X_INDEX] // 2 + 20 * (i - 1), worldSize[Z_INDEX] // 2
+        lightPos = (lightX, int(np.argmin(worldArray[lightX, :, lightZ] != EMPTY_VOXEL)) + 3, lightZ)
+        worldArray[lightPos], lights[lightPos] = voxelID, voxelID
+
+    chunkSummary = ChunkSummary(worldSize)
+    chunkSummary.build(worldArray)
+    brickmap = Brickmap(worldSize)
+    brickmap.build(worldArray, chunkSummary.state)
+
+    camera = Camera(types.SimpleNamespace(rayTracer = None, window_size = imageSize, renderSize = imageSize), glm.vec3(worldSize[X_INDEX] / 2, worldSize[Y_INDEX] - 20, worldSize[Z_INDEX] - 25), 20, 60, 0.2)
+    camera.pitch = -30
+    camera.calculateUnitVectors()
+    cameraState = getCameraState(camera)
+
+    pathTracer = PathTracer(worldArray, brickmap.brickArray, buildMaterialArray(createMaterialList()), buildLightArray(lights), len(lights), time = 'Day', seed = seed)
+    pathTracer.render(cameraState, imageSize) # Compile the kernels
+
+    numSamples = imageSize[0] * imageSize[1] * numFrames
+    for numThreads in sorted({1, numba.config.NUMBA_NUM_THREADS}):
+        numba.set_num_threads(numThreads)
+        renderTime = timeFunction(pathTracer.render, cameraState, imageSize, numFrames, repeats = 1)
+        print(f'CPU path tracer on {numThreads} threads: {numSamples / renderTime:.0f} samples/s ({imageSize[0]}x{imageSize[1]}, {numFrames} frames)')
+    numba.set_num_threads(numba.config.NUMBA_NUM_THREADS)
+
+def benchmarkTextures(repeats = 3):
+    '''
+    Compare the load time and bytes of the block textures between the old float32 path and the 8 bit texture array (decoding everything, and reading the texture cache)
+    '''
+    legacyTime = timeFunction(loadTexturesLegacy, repeats = repeats)
+    _, legacyBytes = loadTexturesLegacy()
+
+    with tempfile.TemporaryDirectory() as cacheFolder:
+        uncachedTime = timeFunction(lambda: BlockTextures(cacheFolder = None).load(), repeats = repeats)
+        blockTextures = BlockTextures(cacheFolder = cacheFolder).load()
+        cachedTime = timeFunction(lambda: BlockTextures(cacheFolder = cacheFolder).load(), repeats = repeats)
+
+    print(f'Textures: old float32 path {legacyTime:.3f}s for {legacyBytes / 2 ** 20:.1f} MiB on the GPU, texture array {uncachedTime:.3f}s decoded and {cachedTime:.3f}s cached for {blockTextures.nbytes / 2 ** 20:.1f} MiB ({legacyBytes / blockTextures.nbytes:.1f}x fewer bytes)')
+
+def benchmarkEditJournal(numEdits = 200000, worldChunks = 4, seed = BENCHMARK_SEED):
+    '''
+    Measure how many single voxel edits per second go through World.writeToMapPos with and without the edit journal, how many records per second the journal alone sustains, and how long replaying them takes
+    '''
+    worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+    rng = np.random.default_rng(seed)
+    mapPositions = list(zip(*(rng.integers(0, size, numEdits).tolist() for size in worldSize)))
+    voxelIDs = rng.integers(0, NUM_VOXEL_TYPES, numEdits).tolist()
+    workingDirectory = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        os.makedirs('Worlds')
+        try:
+            world = World(None, None, types.SimpleNamespace(cameraPosition = glm.vec3(0)), seed, worldSize)
+            journal = world.journal
+
+            def editWorld():
+                for mapPos, voxelID in zip(mapPositions, voxelIDs):
+                    world.writeToMapPos(mapPos, voxelID)
+                if world.journal is not None:
+                    world.journal.flush()
+
+            def appendRecords():
+                for mapPos, voxelID in zip(mapPositions, voxelIDs):
+                    journal.append(mapPos, EMPTY_VOXEL, voxelID)
+                journal.flush()
+
+            world.journal = None
+            editWorld() # Warm up (the first pass compiles the kernels and touches every page)
+            plainTime = timeFunction(editWorld)
+            world.journal = journal
+            journalTime = timeFunction(editWorld)
+            appendTime = timeFunction(appendRecords)
+
+            records = journal.read()
+            world.journal = None
+            replayTime = timeFunction(world.replayJournal, records, repeats = 1)
+            journal.close()
+            world.saveService.close()
+        finally:
+            os.chdir(workingDirectory)
+
+    print(f'Edits: {numEdits / plainTime:,.0f}/s through writeToMapPos without the journal, {numEdits / journalTime:,.0f}/s with it, {numEdits / appendTime:,.0f}/s journal records alone')
+    print(f'Replayed {len(records)} journal records ({records.nbytes / 2 ** 20:.1f} MiB) in {replayTime:.3f}s')
+
+def benchmarkRegionEdits(worldChunks = 4, fillSize = 64, numVoxelEdits = 4096, repeats = 5, seed = BENCHMARK_SEED):
+    '''
+    Time filling a fillSize^3 box with the region edit API against writing the same number of voxels one at a time like mouse clicks (writing the light SSBOs to a fake context)
+    '''
+    worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+    rng = np.random.default_rng(seed)
+    workingDirectory = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        os.makedirs('Worlds')
+        try:
+            world = World(None, None, types.SimpleNamespace(cameraPosition = glm.vec3(0)), seed, worldSize) # Saved like a played world, so the edits also go through the journal
+            world.ctx, world.rayTracer = FakeContext(), {}
+            world.writeLightsToSSBO()
+
+            minPos = (8, 40, 8)
+            maxPos = tuple(axis + fillSize for axis in minPos)
+            fillIDs = iter([STONE, EMPTY_VOXEL] * repeats)
+            fillTime = timeFunction(lambda: world.fillBox(minPos, maxPos, next(fillIDs)), repeats = 2 * repeats)
+
+            voxelPositions = [tuple(int(axis) for axis in mapPos) for mapPos in rng.integers(minPos, maxPos, (numVoxelEdits, 3))]
+            startTime = time.perf_counter()
+            for mapPos in voxelPositions:
+                world.writeToMapPos(mapPos, DIRT)
+                world.writeToLights(mapPos, DIRT)
+            voxelTime = (time.perf_counter() - startTime) / numVoxelEdits
+            print(f'{fillSize}^3 fill: {fillTime * 1000:.1f}ms with the region edit API, {voxelTime * fillSize ** 3:.1f}s estimated one voxel at a time ({voxelTime * 1e6:.1f}us a voxel)')
+            world.saveService.close()
+        finally:
+            os.chdir(workingDirectory)
+
+def benchmarkProfiler(numCalls = 1000000):
+    '''
+    Measure what a profiled stage costs when the profiler is disabled and enabled
+    '''
+    def runScopes(scopeProfiler):
+        for _ in range(numCalls):
+            with scopeProfiler.scope('Stage'):
+                pass
+
+    def runEmpty():
+        for _ in range(numCalls):
+            pass
+
+    emptyTime = timeFunction(runEmpty)
+    disabledTime = timeFunction(runScopes, Profiler(enabled = False))
+    enabledTime = timeFunction(runScopes, Profiler(enabled = True))
+    print(f'Profiler: a stage costs {(disabledTime - emptyTime) / numCalls * 1e9:.0f}ns disabled and {(enabledTime - emptyTime) / numCalls * 1e9:.0f}ns enabled')
+
+def benchmarkLODPyramid(numRays = 4096, numEdits = 2000, worldChunks = 16, maxDistance = 512, seed = BENCHMARK_SEED):
+    '''
+    Time building the LOD pyramid of a generated world, updating it after single voxel edits, and tracing rays with the LOD traversal against the dense DDA on one thread (Checks.py's checkLODPyramid checks the pyramid and counts the steps the traversal saves)
+    '''
+    worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+    world = World(None, None, types.SimpleNamespace(cameraPosition = glm.vec3(0)), seed, worldSize, persistent = False)
+    worldArray, pyramid = world.worldArray, world.lodPyramid
+
+    buildTime = timeFunction(LODPyramid(worldSize).build, worldArray, world.chunkSummary.state)
+    print(f'LOD pyramid: {len(pyramid.levels)} levels built in {buildTime * 1000:.1f}ms for {np.prod(worldSize) / 1e6:.1f}M voxels ({sum(cells.nbytes for cells in pyramid.levels) / worldArray.nbytes * 100:.1f}% of the world array)')
+
+    rng = np.random.default_rng(seed)
+    positions = list(zip(*(rng.integers(0, size, numEdits).tolist() for size in worldSize)))
+    updateTime = timeFunction(lambda: [pyramid.update(worldArray, mapPos) for mapPos in positions])
+    print(f'LOD pyramid: {updateTime / numEdits * 1e6:.1f}us per voxel update')
+
+    origins = rng.uniform((0, 0, 0), worldSize, (numRays, 3))
+    surfaceHeights = np.argmin(worldArray != EMPTY_VOXEL, axis = Y_INDEX)
+    origins[:, Y_INDEX] = surfaceHeights[origins[:, X_INDEX].astype(int), origins[:, Z_INDEX].astype(int)] + rng.uniform(0, 2 * CHUNK_SIZE, numRays)
+    directions = rng.normal(size = (numRays, 3))
+    directions /= np.linalg.norm(directions, axis = 1)[:, None]
+    levels = pyramid.getLevels(worldArray)
+
+    denseTime = timeFunction(lambda: [denseTraversal(levels[0], origins[i], directions[i], maxDistance, 4 * maxDistance) for i in range(numRays)])
+    lodTime = timeFunction(lambda: [lodTraversal(levels, origins[i], directions[i], maxDistance, 4 * maxDistance, LOD_DISTANCE) for i in range(numRays)])
+    print(f'LOD traversal: {denseTime / lodTime:.2f}x faster than the dense DDA to {maxDistance} voxels on one thread')
+
+if __name__ == '__main__':
+    benchmarkHeightMap()
+    benchmarkGeneration()
+    benchmarkParallelGeneration()
+    benchmarkSaveFormats()
+    benchmarkColumnRLE()
+    benchmarkStartup()
+    benchmarkRayCasting()
+    benchmarkPathTracer()
+    benchmarkTextures()
+    benchmarkRegionEdits()
+    benchmarkEditJournal()
+    benchmarkProfiler()
+    benchmarkLODPyramid()
@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+def parseArguments():
+    '''
+    Parse the command line arguments of the benchmark runner
+    '''
+    parser = argparse.ArgumentParser(description = 'Time the CPU hot paths of the world without a window or OpenGL context and write the results as JSON')
+    parser.add_argument('--world-chunks', dest = 'worldChunks', type = int, nargs = '+', default = [8, 16], help = 'world sizes to benchmark in chunks along x and z')
+    parser.add_argument('--repeats', type = int, default = 5, help = 'timed repeats of every benchmark after its warm-up call')
+    parser.add_argument('--picks', type = int, default = 1000, help = 'ray march picks per repeat')
+    parser.add_argument('--light-edits', dest = 'lightEdits', type = int, default = 200, help = 'light placements and removals per repeat')
+    parser.add_argument('--seed', type = int, default = 2024)
+    parser.add_argument('--output', default = 'benchmark.json', help = 'file the JSON results are written to')
+    parser.add_argument('--baseline', help = 'JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type = float, default = 0.1, help = 'relative slowdown of a median over the baseline that counts as a regression')
+    parser.add_argument('--cold-jit', dest = 'coldJit', action = 'store_true', help = "compile every Numba function from scratch (an empty cache) so the warm-up times include compilation")
+    return parser.parse_args()
+
+arguments = parseArguments()
+if arguments.coldJit:
+    os.environ['NUMBA_CACHE_DIR'] = tempfile.mkdtemp() # Has to be set before Numba is imported
+
+from Settings import *
+from World_Utils import *
+from Checks import FakeContext
+import numba
+import platform
+import types
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+PERCENTILES = (10, 50, 90, 99)
+
+def getPeakRSS():
+    '''
+    Get the peak resident set size of the process so far in MiB (None where the resource module doesn't exist)
+    '''
+    if resource is None:
+        return None
+    peakRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peakRSS / 2 ** 20 if sys.platform == 'darwin' else peakRSS / 2 ** 10 # Bytes on macOS and KiB on Linux
+
+def summarizeTimes(times):
+    '''
+    Summarize the timed repeats of a benchmark (in seconds)
+    '''
+    summary = {'median': float(np.median(times)), 'mean': float(np.mean(times)), 'min': float(np.min(times)), 'max': float(np.max(times))}
+    for percentile in PERCENTILES:
+        summary[f'p{percentile}'] = float(np.percentile(times, percentile))
+    return summary
+
+def timeBenchmark(name, worldChunks, function, repeats, setup = None, operations = 1):
+    '''
+    Time the first call of a benchmark on its own (for @njit(cache = True) functions it loads or compiles the machine code) and then the steady state over a number of repeats. setup runs before every call without being timed. Returns the result entry of the benchmark
+    '''
+    times = []
+    for _ in range(repeats + 1):
+        if setup is not None:
+            setup()
+        startTime = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - startTime)
+
+    result = {
+        'name': name,
+        'worldChunks': worldChunks,
+        'operations': operations,
+        'warmupSeconds': times[0],
+        'seconds': summarizeTimes(times[1:]),
+        'peakRssMiB': getPeakRSS()
+    }
+    print(f'{name} ({worldChunks} chunks): warm-up {times[0]:.4f}s, median {result["seconds"]["median"]:.4f}s, p90 {result["seconds"]["p90"]:.4f}s')
+    return result
+
+def getPickRays(world, numPicks, rng):
+    '''
+    Random camera rays for ray march picks (starting a few voxels above the surface and pointing anywhere below the horizon)
+    '''
+    surfaceHeights = np.argmin(world.worldArray != EMPTY_VOXEL, axis = Y_INDEX)
+    rays = []
+    for _ in range(numPicks):
+        x, z = rng.integers(0, world.worldSize[X_INDEX]), rng.integers(0, world.worldSize[Z_INDEX])
+        origin = glm.vec3(x + 0.5, surfaceHeights[x, z] + rng.uniform(1, 4), z + 0.5)
+        direction = glm.normalize(glm.vec3(rng.normal(), -abs(rng.normal()), rng.normal()))
+        rays.append(Ray(origin, direction))
+    return rays
+
+def runBenchmarks(worldChunks, repeats, numPicks, numLightEdits, seed):
+    '''
+    Benchmark every CPU hot path on a headless world of worldChunks x WORLD_SIZE_Y x worldChunks chunks (uploads go to a fake context). Only the world the saves are timed on is persistent, and it saves to a temporary directory so real saves are never touched
+    '''
+    worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+    rng = np.random.default_rng(seed)
+    results = []
+    workingDirectory = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        os.makedirs('Worlds')
+        try:
+            results.append(timeBenchmark('generateHeightMap', worldChunks, lambda: generateHeightMap(seed, worldSize[X_INDEX]), repeats))
+
+            camera = types.SimpleNamespace(cameraPosition = glm.vec3(worldSize[X_INDEX] / 2, worldSize[Y_INDEX], worldSize[Z_INDEX] / 2))
+            worlds = []
+            def createWorld():
+                worlds[:] = [World(None, None, camera, seed, worldSize, persistent = False)] # Not persistent, so the repeats don't load the save of the first one or leave save threads and journals open
+            results.append(timeBenchmark('World.__init__', worldChunks, createWorld, repeats)) # The warm-up compiles the generation, chunk summary and brickmap kernels
+            world = worlds[0]
+
+            results.append(timeBenchmark('World.generateChunks', worldChunks, lambda: world.generateChunks(GENERATION_WORKERS), repeats))
+
+            savedWorld = World(None, None, camera, seed, worldSize) # The only persistent world, saving to the temporary directory
+            results.append(timeBenchmark('World.saveWorld', worldChunks, savedWorld.saveWorld, repeats, setup = savedWorld.saveService.dirtyChunks.markAll))
+            results.append(timeBenchmark('World.loadWorld', worldChunks, savedWorld.loadWorld, repeats))
+            if savedWorld.journal is not None:
+                savedWorld.journal.close()
+            savedWorld.saveService.close()
+
+            pickRays = getPickRays(world, numPicks, rng)
+            results.append(timeBenchmark('World.rayMarch', worldChunks, lambda: [world.rayMarch(ray, PLACE_MINE_DISTANCE) for ray in pickRays], repeats, operations = numPicks))
+
+            lightPositions = [(int(x), worldSize[Y_INDEX] - 1, int(z)) for x, z in rng.integers(0, worldSize[X_INDEX], (numLightEdits, 2))]
+            ctx = FakeContext()
+            world.ctx, world.rayTracer = ctx, {} # Every light edit uploads the slots and grid cells it changed, like in the game
+            world.writeLightsToSSBO()
+            def churnLights():
+                for mapPos in lightPositions:
+                    world.writeToLights(mapPos, RED_LIGHT)
+                for mapPos in lightPositions:
+                    world.writeToLights(mapPos, EMPTY_VOXEL)
+            results.append(timeBenchmark('World.writeToLights', worldChunks, churnLights, repeats, operations = 2 * numLightEdits))
+
+            uploadedBytes = []
+            def editLights(): # Edited without uploading, so the timed upload writes every slot and grid cell the edits changed at once
+                world.ctx = None
+                for mapPos in lightPositions:
+                    world.writeToLights(mapPos, RED_LIGHT if mapPos not in world.lights else EMPTY_VOXEL)
+                world.ctx = ctx
+            result = timeBenchmark('World.writeLightsToSSBO', worldChunks, lambda: uploadedBytes.append(world.writeLightsToSSBO()), repeats, setup = editLights, operations = numLightEdits)
+            result['bytesWritten'] = int(np.median(uploadedBytes[1:]))
+            results.append(result)
+            print(f'World.writeLightsToSSBO ({worldChunks} chunks): {result["bytesWritten"]} bytes written after {numLightEdits} light edits')
+            world.ctx = None
+
+            results.append(timeBenchmark('World.assignMaterials', worldChunks, world.assignMaterials, repeats))
+        finally:
+            os.chdir(workingDirectory)
+
+    return results
+
+def compareToBaseline(results, baseline, threshold):
+    '''
+    Compare the medians with the same benchmarks (name and world size) of a baseline run. Returns the benchmarks that are slower than the baseline by more than the threshold
+    '''
+    baselineMedians = {(result['name'], result['worldChunks']): result['seconds']['median'] for result in baseline['results']}
+    regressions = []
+    for result in results:
+        key = (result['name'], result['worldChunks'])
+        if key not in baselineMedians:
+            continue
+
+        ratio = result['seconds']['median'] / baselineMedians[key]
+        result['baselineRatio'] = ratio
+        if ratio > 1 + threshold:
+            regressions.append({'name': result['name'], 'worldChunks': result['worldChunks'], 'ratio': ratio})
+    return regressions
+
+def main():
+    results = []
+    for worldChunks in arguments.worldChunks:
+        results += runBenchmarks(worldChunks, arguments.repeats, arguments.picks, arguments.lightEdits, arguments.seed)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpuCount': os.cpu_count(),
+        'numbaThreads': numba.get_num_threads(),
+        'coldJit': arguments.coldJit,
+        'repeats': arguments.repeats,
+        'seed': arguments.seed,
+        'results': results,
+        'peakRssMiB': getPeakRSS()
+    }
+
+    regressions = []
+    if arguments.baseline is not None:
+        with open(arguments.baseline) as file:
+            regressions = compareToBaseline(results, json.load(file), arguments.threshold)
+        report['baseline'], report['threshold'], report['regressions'] = arguments.baseline, arguments.threshold, regressions
+
+        for regression in regressions:
+            print(f'REGRESSION: {regression["name"]} ({regression["worldChunks"]} chunks) is {regression["ratio"]:.2f}x the baseline median')
+        print(f'{len(regressions)} regressions beyond {arguments.threshold * 100:.0f}% of the baseline')
+
+    with open(arguments.output, 'w') as file:
+        json.dump(report, file, indent = 4)
+    print(f'Wrote {arguments.output} (peak RSS {report["peakRssMiB"]} MiB)')
+
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1091 @@
+from Settings import *
+from World_Utils import *
+from Window_Utils import *
+from opensimplex import OpenSimplex
+import argparse
+import tempfile
+import subprocess
+import signal
+import sys
+import types
+import csv
+import json
+import traceback
+import threading
+
+CHECK_SEED = 2024 # Seed of the random edits (and generated worlds) of every check
+
+class FakeBuffer:
+    '''
+    Stand-in for a ModernGL buffer that only counts the bytes written to it
+    '''
+    def __init__(self, data):
+        self.data = bytearray(bytes(data))
+        self.bytesWritten = len(self.data)
+
+    def write(self, data, offset = 0):
+        self.data[offset:offset + len(data)] = data
+        self.bytesWritten += len(data)
+
+    def bind_to_storage_buffer(self, binding):
+        pass
+
+    def release(self):
+        pass
+
+class FakeQuery:
+    '''
+    Stand-in for a ModernGL timer query that measures the CPU time between its begin and end as its elapsed nanoseconds
+    '''
+    def __enter__(self):
+        self.startTime = time.perf_counter_ns()
+
+    def __exit__(self, *exception):
+        self.elapsed = time.perf_counter_ns() - self.startTime
+
+class FakeTexture:
+    '''
+    Stand-in for a ModernGL 3D texture of bytes that keeps its texels the way the texture's memory is laid out (indexed [z][y][x]) and records the viewport and size of every write. Writes outside the texture fail
+    '''
+    def __init__(self, size, data = None):
+        self.size = tuple(size)
+        self.data = np.zeros(self.size[::-1], 'u1')
+        self.writes = []
+        if data is not None:
+            self.write(data)
+
+    def write(self, data, viewport = None):
+        data = np.frombuffer(np.ascontiguousarray(data).tobytes() if isinstance(data, np.ndarray) else bytes(data), 'u1')
+        if viewport is None:
+            viewport = (0, 0, 0, *self.size)
+
+        x, y, z, width, height, depth = viewport
+        assert 0 <= x and x + width <= self.size[0] and 0 <= y and y + height <= self.size[1] and 0 <= z and z + depth <= self.size[2], (viewport, self.size)
+        self.data[z:z + depth, y:y + height, x:x + width] = data.reshape(depth, height, width)
+        self.writes.append((tuple(viewport), data.nbytes))
+
+    def bind_to_image(self, unit):
+        pass
+
+class FakeContext:
+    '''
+    Stand-in for a ModernGL context that hands out fake buffers, 3D textures and timer queries
+    '''
+    def buffer(self, data):
+        return FakeBuffer(data)
+
+    def texture3d(self, size, components, data = None, dtype = 'u1'):
+        return FakeTexture(size, data)
+
+    def query(self, time = False):
+        return FakeQuery()
+
+def checkDirtyUploads(worldChunkCounts = (4, 8), seed = CHECK_SEED):
+    '''
+    Upload a world to a fake context and check that a single voxel edit uploads exactly one chunk (the same number of bytes at every world size) to the chunk's place in the texture, and that an edit spanning several chunks uploads every chunk it touches once, after which the fake textures hold exactly the world array and brickmap (the texture's x and z axes are swapped relative to the array)
+    '''
+    for worldChunks in worldChunkCounts:
+        worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+        world = World(None, None, types.SimpleNamespace(cameraPosition = glm.vec3(0)), seed, worldSize, persistent = False)
+        world.ctx, world.rayTracer = FakeContext(), {}
+        world.assignWorld()
+        assert np.array_equal(world.world.data, world.worldArray)
+        world.world.writes.clear()
+
+        mapPos = (CHUNK_SIZE + 5, 0, 2 * CHUNK_SIZE + 9)
+        assert world.worldArray[mapPos] != EMPTY_VOXEL # Solid bottom layer, so the edit doesn't change the brickmap
+        world.writeToMapPos(mapPos, DIRT if world.worldArray[mapPos] != DIRT else STONE)
+        uploadedBytes = world.uploadDirtyRegions()
+        assert uploadedBytes == CHUNK_SIZE ** 3, uploadedBytes
+        assert world.world.writes == [((2 * CHUNK_SIZE, 0, CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE), CHUNK_SIZE ** 3)], world.world.writes
+        assert np.array_equal(world.world.data, world.worldArray) and world.rayTracer['updatedVoxel']
+
+        minPos, maxPos = (20, 50, 40), (70, 90, 100) # 3 x 2 x 3 chunks
+        world.fillBox(minPos, maxPos, EMPTY_VOXEL)
+        uploadedBytes = world.uploadDirtyRegions()
+        numChunks = np.prod([(maxPos[axis] - 1) // CHUNK_SIZE - minPos[axis] // CHUNK_SIZE + 1 for axis in range(3)])
+        assert uploadedBytes - sum(size for _, size in world.brickmap.texture.writes[1:]) == numChunks * CHUNK_SIZE ** 3
+        assert np.array_equal(world.world.data, world.worldArray) and np.array_equal(world.brickmap.texture.data, world.brickmap.brickArray)
+    print(f'Dirty uploads: one voxel edit uploads {CHUNK_SIZE ** 3} bytes (one chunk) at {worldChunkCounts} chunk worlds, and multi-chunk edits land in the right place of the texture')
+
+def checkChunkSummary(numEdits = 20000, seed = CHECK_SEED):
+    '''
+    Place and remove random voxels in a few chunks (so layers, whole chunks and their lowest and highest layers empty and fill again) and check that the incrementally updated chunk summary always ends up equal to a rebuild
+    '''
+    worldSize = (2 * CHUNK_SIZE, 2 * CHUNK_SIZE, CHUNK_SIZE)
+    worldArray = np.zeros(worldSize, 'u1')
+    chunkSummary = ChunkSummary(worldSize)
+    rng = np.random.default_rng(seed)
+
+    numEmptied = 0
+    for step in range(numEdits):
+        mapPos = tuple(int(rng.integers(0, 2)) * CHUNK_SIZE + int(rng.integers(0, 3)) + 24 * int(rng.integers(0, 2)) for _ in range(2)) + (int(rng.integers(0, 2)),) # Two groups of layers in a small corner of every chunk
+        removing = step // 2000 % 2 == 1 # Alternate between placing and removing so that chunks fill up and empty out
+        newID = EMPTY_VOXEL if removing or rng.random() < 0.3 else int(rng.choice([STONE, DIRT]))
+        wasEmpty = chunkSummary.isEmpty(mapPos)
+        chunkSummary.update(mapPos, worldArray[mapPos], newID)
+        worldArray[mapPos] = newID
+        numEmptied += not wasEmpty and chunkSummary.isEmpty(mapPos)
+
+        if step % 500 == 0 or step == numEdits - 1:
+            rebuilt = ChunkSummary(worldSize)
+            rebuilt.build(worldArray)
+            assert all(np.array_equal(getattr(chunkSummary, name), getattr(rebuilt, name)) for name in ('state', 'solidCount', 'histogram', 'layerCounts', 'minY', 'maxY')), step
+    assert numEmptied > 0
+    print(f'Chunk summary matches a rebuild after {numEdits} voxel edits ({numEmptied} times a chunk emptied out)')
+
+def checkBrickmap(seeds = (CHECK_SEED, 7, 12345), numRays = 2 ** 16, worldChunks = 8):
+    '''
+    Trace random rays (starting above the terrain, inside it and outside the world) through generated worlds of a few seeds with both the dense DDA and the brick DDA and check that they agree on every ray (hit, map position, normal and distance)
+    '''
+    worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+    for seed in seeds:
+        worldArray = np.zeros(worldSize, 'u1')
+        generateTerrain(worldArray, generateHeightMap(seed, worldSize[X_INDEX]), seed)
+        chunkSummary = ChunkSummary(worldSize)
+        chunkSummary.build(worldArray)
+        brickmap = Brickmap(worldSize)
+        brickmap.build(worldArray, chunkSummary.state)
+
+        rng = np.random.default_rng(seed)
+        origins = rng.uniform((-CHUNK_SIZE, 0, -CHUNK_SIZE), (worldSize[X_INDEX] + CHUNK_SIZE, worldSize[Y_INDEX] + CHUNK_SIZE, worldSize[Z_INDEX] + CHUNK_SIZE), (numRays, 3))
+        surfaceHeights = np.argmin(worldArray != EMPTY_VOXEL, axis = Y_INDEX)
+        aboveTerrain = rng.random(numRays) < 0.5
+        columns = np.clip(origins[aboveTerrain].astype(int), 0, np.array(worldSize) - 1)
+        origins[aboveTerrain, Y_INDEX] = surfaceHeights[columns[:, X_INDEX], columns[:, Z_INDEX]] + rng.uniform(0, CHUNK_SIZE, np.count_nonzero(aboveTerrain))
+        directions = rng.normal(size = (numRays, 3))
+        directions[rng.random(numRays) < 0.1, rng.integers(0, 3)] = 0 # Axis aligned rays take the clamped direction path
+
+        mismatches, denseSteps, brickSteps = findTraversalMismatches(worldArray, brickmap.brickArray, origins, directions, np.inf, sum(worldSize))
+        assert np.count_nonzero(mismatches) == 0, np.flatnonzero(mismatches)[:10]
+        print(f'Brickmap (seed {seed}): the brick DDA matches the dense DDA on all {numRays} rays with {brickSteps.mean():.1f} instead of {denseSteps.mean():.1f} mean steps')
+
+def checkDeterminism(workerCounts = (1, 2, 4), worldChunks = 16, seed = CHECK_SEED):
+    '''
+    Generate a world with different numbers of worker processes and check that they're all bit-identical
+    '''
+    worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+    heightMap = generateHeightMap(seed, worldSize[X_INDEX])
+
+    referenceWorld = np.zeros(worldSize, 'u1')
+    generateTerrain(referenceWorld, heightMap, seed)
+
+    for numWorkers in workerCounts:
+        worldArray = np.full(worldSize, STONE, 'u1') # Everything has to be overwritten, air included
+        generateTerrainParallel(worldArray, seed, numWorkers)
+        assert np.array_equal(worldArray, referenceWorld), numWorkers
+    print(f'Parallel generation with {workerCounts} workers is identical to the single process world')
+
+def checkNoise(seeds = (CHECK_SEED, 0, 1, -7, 2 ** 40 + 3), numSamples = 4096):
+    '''
+    Check that the noise kept in Noise.py gives exactly the values of the opensimplex package, at random positions (negative ones included) and on the height map sample grid
+    '''
+    rng = np.random.default_rng(CHECK_SEED)
+    randomCoords = rng.uniform(-1000, 1000, (numSamples, 2))
+    gridCoords = convertToNormalized(np.arange(256), 256) * 3 * 2.0 ** 6
+
+    for seed in seeds:
+        generator, perm = OpenSimplex(seed), buildPermutation(seed)
+        for x, y in randomCoords:
+            assert noise2(x, y, perm) == generator.noise2(x, y), (seed, x, y)
+
+        expected = generator.noise2array(gridCoords, gridCoords)
+        assert np.array_equal(np.array([[noise2(x, y, perm) for x in gridCoords] for y in gridCoords]), expected), seed
+    print(f'Noise matches opensimplex for {len(seeds)} seeds')
+
+def checkStreaming(windowChunks = 8, referenceChunks = 12, seed = CHECK_SEED):
+    '''
+    Walk a chunk streamer along a scripted camera path (out past the negative edge of the fixed world, far along +x, and back) and check that exactly the window is resident, that every resident column matches the fixed world generation wherever the two overlap, that an edited voxel survives being evicted and reloaded, and that the ring buffer never grows
+    '''
+    worldSize = (referenceChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, referenceChunks * CHUNK_SIZE) # The corner of the fixed world the first window overlaps
+    referenceWorld = np.zeros(worldSize, 'u1')
+    generateTerrain(referenceWorld, HeightMapEngine(seed).generateRegion(0, worldSize[X_INDEX], 0, worldSize[Z_INDEX]), seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        ringArray = np.zeros((windowChunks * CHUNK_SIZE, worldSize[Y_INDEX], windowChunks * CHUNK_SIZE), 'u1')
+        streamer = ChunkStreamer(ringArray, seed, directory, windowChunks)
+
+        editPos = (200, worldSize[Y_INDEX] - 1, 200)
+        path = [(200, 200), (-300, 200), (200, 200), (6000, 200), (6000, -4000), (200, 200)]
+        wrongColumns, editSurvived = 0, None
+        for i, cameraXZ in enumerate(path):
+            streamer.update((cameraXZ[0], 0, cameraXZ[1]), wait = True)
+            assert streamer.resident == streamer.windowColumns() and not streamer.pending
+            assert streamer.worldArray is ringArray and ringArray.shape == (windowChunks * CHUNK_SIZE, worldSize[Y_INDEX], windowChunks * CHUNK_SIZE)
+
+            for column in streamer.resident:
+                xStart, zStart = column[0] * CHUNK_SIZE, column[1] * CHUNK_SIZE
+                if 0 <= xStart < worldSize[X_INDEX] and 0 <= zStart < worldSize[Z_INDEX] and (column != streamer.getChunkColumn(editPos) or i == 0):
+                    wrongColumns += not np.array_equal(streamer.getSlot(column), referenceWorld[xStart:xStart + CHUNK_SIZE, :, zStart:zStart + CHUNK_SIZE])
+
+            if i == 0:
+                ringArray[streamer.toArrayPos(editPos)] = WOOD
+                streamer.markModified(editPos)
+                streamer.flush() # What saving the world does, the streamer has to keep loading columns after it
+            elif cameraXZ == path[0]:
+                editSurvived = ringArray[streamer.toArrayPos(editPos)] == WOOD
+
+        streamer.close()
+        assert wrongColumns == 0 and editSurvived, (wrongColumns, editSurvived)
+        print(f'Streaming {len(path)} window moves: every resident column matches the fixed world and the edit survived eviction ({ringArray.nbytes / 2 ** 20:.1f} MiB resident)')
+
+def checkSaveFormats(worldChunks = 8, seed = CHECK_SEED):
+    '''
+    Write a generated world (with lights and a camera position) to a region file and check that loading the whole world, a single chunk column, and the metadata gives back exactly what was saved
+    '''
+    worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+    worldArray = np.zeros(worldSize, 'u1')
+    generateTerrain(worldArray, generateHeightMap(seed, worldSize[X_INDEX]), seed)
+
+    lights = LightTable()
+    for lightPos in ((3, 100, 7), (200, 90, 31)):
+        worldArray[lightPos] = lights[lightPos] = RED_LIGHT
+    chunkSummary = ChunkSummary(worldSize)
+    chunkSummary.build(worldArray)
+    lightArray, cameraPosition = buildLightArray(lights), glm.vec3(12.5, 80.25, -3)
+
+    with tempfile.TemporaryDirectory() as directory:
+        regionPath = os.path.join(directory, 'World' + REGION_EXTENSION)
+        writeRegionFile(regionPath, worldArray, chunkSummary, seed, cameraPosition, lightArray)
+        regionFile = RegionFile(regionPath)
+
+        assert np.array_equal(regionFile.loadWorld(), worldArray)
+        assert np.array_equal(regionFile.loadRegion((1, 0, 2), (2, WORLD_SIZE_Y, 3)), worldArray[CHUNK_SIZE:2 * CHUNK_SIZE, :, 2 * CHUNK_SIZE:3 * CHUNK_SIZE])
+        assert regionFile.seed == seed and regionFile.cameraPosition == cameraPosition and np.array_equal(regionFile.lightArray, lightArray)
+    print('Region file: the world, a single chunk column and the metadata load back exactly as saved')
+
+def checkSaveService(numEdits = 20000, worldChunks = 16, seed = CHECK_SEED):
+    '''
+    Edit the world while background saves are being written and check that every save holds exactly the world at the moment it was snapshotted (and that the edits made during a save land in the next one, like the edits of a save that failed). Also times how long the main thread is blocked by a snapshot compared to the whole save
+    '''
+    worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+    worldArray = np.zeros(worldSize, 'u1')
+    generateTerrain(worldArray, generateHeightMap(seed, worldSize[X_INDEX]), seed)
+
+    chunkSummary = ChunkSummary(worldSize)
+    chunkSummary.build(worldArray)
+    rng = np.random.default_rng(seed)
+
+    def editWorld(count):
+        for mapPos in zip(*(rng.integers(0, size, count) for size in worldSize)):
+            voxelID = int(rng.integers(0, NUM_VOXEL_TYPES))
+            chunkSummary.update(mapPos, worldArray[mapPos], voxelID)
+            worldArray[mapPos] = voxelID
+            saveService.markVoxel(mapPos)
+
+    with tempfile.TemporaryDirectory() as directory:
+        filePath = os.path.join(directory, 'World' + REGION_EXTENSION)
+        saveService = SaveService(filePath, worldSize, autosaveInterval = None)
+
+        for i in range(3):
+            expectedWorld = worldArray.copy()
+            startTime = time.perf_counter()
+            saveService.save(worldArray, chunkSummary, seed, glm.vec3(i), np.zeros(0, LIGHT_DTYPE))
+            snapshotTime = time.perf_counter() - startTime
+
+            editsDuringSave = 0
+            while saveService.isSaving() or editsDuringSave < numEdits:
+                editWorld(100)
+                editsDuringSave += 100
+            saveTime = time.perf_counter() - startTime
+
+            assert np.array_equal(RegionFile(filePath).loadWorld(), expectedWorld), i
+            print(f'Save {i}: snapshot blocked {snapshotTime * 1000:.1f}ms of {saveTime:.3f}s, {editsDuringSave} edits during the save, holds the snapshotted world')
+
+        workerBlocked = threading.Event()
+        saveService.executor.submit(workerBlocked.wait) # Queues both saves before the first one fails
+        saveService.filePath = os.path.join(directory, 'Missing', 'World' + REGION_EXTENSION) # Can't be written
+        editWorld(numEdits)
+        failedSave = saveService.save(worldArray, chunkSummary, seed, glm.vec3(0), np.zeros(0, LIGHT_DTYPE))
+        saveService.executor.submit(setattr, saveService, 'filePath', filePath)
+        editWorld(100)
+        missingSave = saveService.save(worldArray, chunkSummary, seed, glm.vec3(0), np.zeros(0, LIGHT_DTYPE)) # Writable, but without the chunks of the failed save
+        workerBlocked.set()
+        assert isinstance(failedSave.exception(), FileNotFoundError) and isinstance(missingSave.exception(), RuntimeError)
+        assert np.array_equal(RegionFile(filePath).loadWorld(), expectedWorld)
+
+        saveService.save(worldArray, chunkSummary, seed, glm.vec3(0), np.zeros(0, LIGHT_DTYPE))
+        saveService.close()
+        assert np.array_equal(RegionFile(filePath).loadWorld(), worldArray)
+        print('Final save after two failed saves matches the edited world')
+
+def checkColumnRLE(numAccesses = 100000, numRays = 2000, worldChunks = 16, seed = CHECK_SEED):
+    '''
+    Check that a column RLE world decodes back to the dense world it was encoded from and gives the same voxels and World.rayMarch hits as it, before and after random writes to both (voxels, then boxes that only re-encode the columns under them). Then check that random single voxel edits don't grow its run buffers without bound
+    '''
+    worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+    world = World(None, None, types.SimpleNamespace(cameraPosition = glm.vec3(0)), seed, worldSize, persistent = False)
+    worldArray = world.worldArray.toDense() if isColumnRLE(world.worldArray) else world.worldArray
+    rleWorld = ColumnRLE.fromDense(worldArray)
+    assert np.array_equal(rleWorld.toDense(), worldArray)
+
+    rng = np.random.default_rng(seed)
+    positions = list(zip(*(rng.integers(0, size, numAccesses).tolist() for size in worldSize)))
+    voxelIDs = rng.integers(0, NUM_VOXEL_TYPES, numAccesses).tolist()
+
+    origins = rng.uniform((0, 0, 0), worldSize, (numRays, 3))
+    surfaceHeights = np.argmin(worldArray != EMPTY_VOXEL, axis = Y_INDEX)
+    origins[:, Y_INDEX] = surfaceHeights[origins[:, X_INDEX].astype(int), origins[:, Z_INDEX].astype(int)] + rng.uniform(0, CHUNK_SIZE, numRays)
+    directions = rng.normal(size = (numRays, 3))
+    rays = [Ray(glm.vec3(*origin), glm.normalize(glm.vec3(*direction))) for origin, direction in zip(origins.tolist(), directions.tolist())]
+
+    def checkQueries():
+        assert all(rleWorld.getVoxel(*mapPos) == worldArray[mapPos] for mapPos in positions)
+        for maxRange in (PLACE_MINE_DISTANCE, 4 * CHUNK_SIZE): # The column RLE world decodes a box around the ray's origin that grows with the range
+            world.worldArray = worldArray
+            denseResults = [world.rayMarch(ray, maxRange) for ray in rays]
+            world.worldArray = rleWorld
+            assert [world.rayMarch(ray, maxRange) for ray in rays] == denseResults, maxRange
+        world.worldArray = worldArray
+        return sum(mapPos is not None for mapPos, _ in denseResults)
+
+    numHits = checkQueries()
+    for mapPos, voxelID in zip(positions, voxelIDs):
+        worldArray[mapPos] = voxelID
+        rleWorld[mapPos] = voxelID
+    assert np.array_equal(rleWorld.toDense(), worldArray)
+    checkQueries()
+    print(f'Column RLE: round-trips and gives the same voxels at {numAccesses} positions and the same hits for {numRays} rays ({numHits} hit) as the dense world, before and after {numAccesses} writes')
+
+    numBoxes = numAccesses // 500
+    for _ in range(numBoxes):
+        minPos = [int(rng.integers(0, size)) for size in worldSize]
+        maxPos = [min(start + int(rng.integers(1, CHUNK_SIZE)), size) for start, size in zip(minPos, worldSize)]
+        key = tuple(slice(start, stop) for start, stop in zip(minPos, maxPos))
+        voxels = rng.integers(0, NUM_VOXEL_TYPES, np.subtract(maxPos, minPos)).astype('u1')
+
+        columnStart, holeRuns = rleWorld.columnStart.reshape(worldSize[X_INDEX], worldSize[Z_INDEX]).copy(), rleWorld.holeRuns
+        worldArray[key], rleWorld[key] = voxels, voxels
+        if rleWorld.holeRuns > holeRuns: # Not compacted, so only the columns under the box may have moved
+            columnStart[minPos[X_INDEX]:maxPos[X_INDEX], minPos[Z_INDEX]:maxPos[Z_INDEX]] = rleWorld.columnStart.reshape(columnStart.shape)[minPos[X_INDEX]:maxPos[X_INDEX], minPos[Z_INDEX]:maxPos[Z_INDEX]]
+            assert np.array_equal(rleWorld.columnStart.reshape(columnStart.shape), columnStart)
+    assert np.array_equal(rleWorld.toDense(), worldArray)
+    print(f'Column RLE: {numBoxes} box writes re-encode only the columns under the box and match the dense world')
+
+    smallWorld = np.ascontiguousarray(worldArray[:2 * CHUNK_SIZE, :, :2 * CHUNK_SIZE])
+    rleWorld = ColumnRLE.fromDense(smallWorld)
+    startBytes, worstRatio = rleWorld.nbytes, 0.0
+    for i in range(0, 2 * numAccesses, 10000):
+        for mapPos in zip(*(rng.integers(0, size, 10000).tolist() for size in smallWorld.shape)):
+            rleWorld.setVoxel(*mapPos, int(rng.integers(0, NUM_VOXEL_TYPES)))
+        liveRuns = int(rleWorld.columnRuns.sum()) + RUN_SLACK * rleWorld.numColumns
+        worstRatio = max(worstRatio, rleWorld.usedRuns / liveRuns)
+    assert worstRatio < 3, worstRatio # Compacted at 2x the capacity the columns hold (a little more than their runs once edits merge runs), where the holes used to pile up to 10x
+    print(f'Column RLE: {2 * numAccesses} voxel edits on a {smallWorld.shape} world keep the used runs within {worstRatio:.2f}x of the runs the columns hold ({startBytes / 2 ** 10:.0f} KiB -> {rleWorld.nbytes / 2 ** 10:.0f} KiB)')
+
+def checkRayCasting(numRays = 4096, worldChunks = 16, seed = CHECK_SEED):
+    '''
+    Check the batched DDA's hits (with bricks skipped) against the voxel by voxel reference DDA for random rays starting just above the terrain of a generated world
+    '''
+    worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+    worldArray = np.zeros(worldSize, 'u1')
+    generateTerrain(worldArray, generateHeightMap(seed, worldSize[X_INDEX]), seed)
+
+    chunkSummary = ChunkSummary(worldSize)
+    chunkSummary.build(worldArray)
+    brickmap = Brickmap(worldSize)
+    brickmap.build(worldArray, chunkSummary.state)
+
+    rng = np.random.default_rng(seed)
+    origins = rng.uniform((0, 0, 0), worldSize, (numRays, 3))
+    surfaceHeights = np.argmin(worldArray != EMPTY_VOXEL, axis = Y_INDEX)
+    origins[:, Y_INDEX] = surfaceHeights[origins[:, X_INDEX].astype(int), origins[:, Z_INDEX].astype(int)] + rng.uniform(0, 2 * CHUNK_SIZE, numRays)
+    directions = rng.normal(size = (numRays, 3))
+    directions /= np.linalg.norm(directions, axis = 1)[:, None]
+
+    hits, mapPositions, normals, distances, _ = castRays(worldArray, brickmap.brickArray, np.zeros(3, np.int64), origins, directions, np.inf, sum(worldSize))
+    for i in range(numRays):
+        referenceHit, referenceMapPos, referenceNormal, referenceT, _ = denseTraversal(worldArray, origins[i], directions[i], np.inf, sum(worldSize))
+        assert referenceHit == hits[i], i
+        assert not referenceHit or (np.array_equal(referenceMapPos, mapPositions[i]) and np.array_equal(referenceNormal, normals[i]) and np.isclose(referenceT, distances[i])), i
+    print(f'Batched DDA: matches the reference DDA on all {numRays} rays ({hits.mean() * 100:.1f}% hit)')
+
+def checkLightTable(numLights = 20000, numEdits = 20000, seed = CHECK_SEED):
+    '''
+    Fill a light table, then randomly add, change and remove lights (uploading after every edit to a fake context) and check that the table always matches a reference dictionary, that the fake SSBO holds exactly the table, and that the bytes written per edit stay constant no matter how many lights there are (apart from the edits that double the capacity). Also times the edits against rebuilding the whole light array like before
+    '''
+    rng = np.random.default_rng(seed)
+    ctx, lightTable, referenceLights = FakeContext(), LightTable(), {}
+    lightIDs = (RED_LIGHT, GREEN_LIGHT, BLUE_LIGHT)
+
+    def randomPos():
+        return tuple(int(axis) for axis in rng.integers(0, 256, 3))
+
+    editBytes, growBytes = [], []
+    startTime = time.perf_counter()
+    for i in range(numLights + numEdits):
+        capacity = len(lightTable.array)
+        if i < numLights or not referenceLights or rng.random() < 0.5:
+            mapPos, voxelID = randomPos(), int(rng.choice(lightIDs))
+            lightTable[mapPos] = referenceLights[mapPos] = voxelID
+        else:
+            mapPos = list(referenceLights)[int(rng.integers(0, len(referenceLights)))] if rng.random() < 0.5 else next(iter(referenceLights)) # Removing the first light always swaps
+            assert lightTable.pop(mapPos) == referenceLights.pop(mapPos)
+
+        uploadedBytes = lightTable.upload(ctx)
+        (growBytes if len(lightTable.array) != capacity or i == 0 else editBytes).append(uploadedBytes)
+    incrementalTime = time.perf_counter() - startTime
+
+    assert dict(lightTable.items()) == referenceLights and len(lightTable) == len(referenceLights)
+    assert all(lightTable[mapPos] == voxelID for mapPos, voxelID in referenceLights.items())
+    assert bytes(lightTable.buffer.data[:lightTable.getArray().nbytes]) == lightTable.getArray().tobytes()
+
+    startTime = time.perf_counter()
+    for _ in range(1000):
+        ctx.buffer(buildLightArray(referenceLights))
+    rebuildTime = (time.perf_counter() - startTime) / 1000
+
+    print(f'{len(editBytes)} edits: {min(editBytes)}-{max(editBytes)} bytes written per edit ({LIGHT_DTYPE.itemsize} bytes a light), {len(growBytes)} uploads of the whole table on growth')
+    print(f'Incremental: {incrementalTime / (numLights + numEdits) * 1e6:.2f}us per edit, rebuild: {rebuildTime * 1e6:.2f}us and {buildLightArray(referenceLights).nbytes} bytes per edit with {len(referenceLights)} lights')
+    assert max(editBytes) <= LIGHT_DTYPE.itemsize
+
+@njit(cache = True)
+def estimateDirectLighting(pathTracer, pointHit, normalVector, objectColor, numTrials, state):
+    '''
+    Evaluate the direct lighting estimator of the CPU path tracer numTrials times at a point hit. Returns every estimate
+    '''
+    (worldArray, brickArray, worldOrigin, colors, lightPositions, lightVoxelIDs, numLights, gridPositions, gridVoxelIDs, gridWeights, gridSize, cellSize, uniformFraction, badLightSamples, maxSteps) = pathTracer
+    estimates = np.empty((numTrials, 3))
+    for i in range(numTrials):
+        estimates[i] = directLighting(worldArray, brickArray, worldOrigin, colors, lightPositions, lightVoxelIDs, numLights, gridPositions, gridVoxelIDs, gridWeights, gridSize, cellSize, uniformFraction, badLightSamples, maxSteps, pointHit, normalVector, objectColor, state)
+    return estimates
+
+@njit(cache = True, error_model = 'numpy')
+def exactDirectLighting(pathTracer, pointHit, normalVector, objectColor):
+    '''
+    The value the direct lighting estimator converges to: every light's radiance at the point hit (with the same shadow rays)
+    '''
+    (worldArray, brickArray, worldOrigin, colors, lightPositions, lightVoxelIDs, numLights, _, _, _, _, _, _, _, maxSteps) = pathTracer
+    exactRadiance = np.zeros(3)
+    for i in range(numLights):
+        lightDir, radiance = getLightSample(lightPositions[i], lightVoxelIDs[i], colors, pointHit, normalVector, objectColor)
+        if dot(normalVector, lightDir) > 0 and not lightBlocked(worldArray, brickArray, worldOrigin, pointHit, lightDir, lightPositions[i], maxSteps):
+            exactRadiance += radiance
+    return exactRadiance
+
+def checkLightGrid(numLights = 2000, numEdits = 2000, numPoints = 200, numTrials = 400, worldChunks = 16, seed = CHECK_SEED):
+    '''
+    Check the light grid and its sampling on a generated world with lights placed over its surface: randomly edited grids must match a grid built from scratch, the pick probabilities of every light must sum to 1 and match how often sampleLight picks them, and the direct lighting estimator must converge to the brute force sum over every light. Then compares the error of the estimator (at the same number of candidates) with the grid against uniform light selection, and checks that PathTracer.fromWorld doesn't take the world's light grid edits from the GPU upload
+    '''
+    rng = np.random.default_rng(seed)
+    worldSize = (CHUNK_SIZE * worldChunks, CHUNK_SIZE * WORLD_SIZE_Y, CHUNK_SIZE * worldChunks)
+    worldArray = np.zeros(worldSize, 'u1')
+    generateTerrain(worldArray, generateHeightMap(seed, worldSize[X_INDEX]), seed)
+    surfaceHeights = np.argmin(worldArray != EMPTY_VOXEL, axis = Y_INDEX)
+
+    materialArray = buildMaterialArray(createMaterialList())
+    lightIDs = (RED_LIGHT, GREEN_LIGHT, BLUE_LIGHT)
+
+    def randomLight():
+        x, z = int(rng.integers(0, worldSize[X_INDEX])), int(rng.integers(0, worldSize[Z_INDEX]))
+        return (x, int(surfaceHeights[x, z] + rng.integers(1, 4)), z), int(rng.choice(lightIDs))
+
+    lights = LightTable()
+    lightGrid = LightGrid(worldSize, materialArray['color'])
+    startTime = time.perf_counter()
+    for i in range(numLights + numEdits):
+        if i < numLights or rng.random() < 0.5:
+            mapPos, voxelID = randomLight()
+            lights[mapPos] = voxelID
+            lightGrid.addLight(mapPos, voxelID)
+        else:
+            mapPos = list(lights.keys())[int(rng.integers(0, len(lights)))]
+            lights.pop(mapPos)
+            lightGrid.removeLight(mapPos)
+        if i >= numLights:
+            lightGrid.update()
+    editTime = (time.perf_counter() - startTime) / (numLights + numEdits)
+    lightGrid.update()
+
+    rebuiltGrid = LightGrid(worldSize, materialArray['color'], lights)
+    rebuiltGrid.update()
+    assert lightGrid.array.tobytes() == rebuiltGrid.array.tobytes()
+    print(f'Incremental light grid matches a rebuilt grid ({len(lights)} lights, {editTime * 1e6:.0f}us per edit, {lightGrid.array.nbytes / 2 ** 20:.1f} MiB)')
+
+    for mapPos, voxelID in lights.items():
+        worldArray[mapPos] = voxelID
+    chunkSummary = ChunkSummary(worldSize)
+    chunkSummary.build(worldArray)
+    brickmap = Brickmap(worldSize)
+    brickmap.build(worldArray, chunkSummary.state)
+
+    lightArray = buildLightArray(lights)
+    gridTracer = PathTracer(worldArray, brickmap.brickArray, materialArray, lightArray, len(lights), lightGrid = lightGrid)
+    uniformTracer = PathTracer(worldArray, brickmap.brickArray, materialArray, lightArray, len(lights), lightGrid = lightGrid, uniformLightFraction = 1.0)
+
+    worstSum, worstFrequency = 0.0, 0.0
+    state = rng.integers(128, 100000, 4).astype(np.int64)
+    slots = {tuple(lightPos): slot for slot, lightPos in enumerate(gridTracer.lightPositions.tolist())}
+    for cellIndex in rng.choice(np.flatnonzero(gridTracer.gridWeights[:, -1] > 0), 20):
+        probabilities = np.array([getLightProbability(gridTracer.gridPositions, gridTracer.gridVoxelIDs, gridTracer.gridWeights, cellIndex, lightPos, len(lights), gridTracer.uniformFraction) for lightPos in gridTracer.lightPositions])
+        worstSum = max(worstSum, abs(probabilities.sum() - 1))
+
+        counts = np.zeros(len(lights))
+        for _ in range(20000):
+            lightPos, _ = sampleLight(gridTracer.lightPositions, gridTracer.lightVoxelIDs, len(lights), gridTracer.gridPositions, gridTracer.gridVoxelIDs, gridTracer.gridWeights, cellIndex, gridTracer.uniformFraction, state)
+            counts[slots[tuple(lightPos.tolist())]] += 1
+        listed = probabilities > gridTracer.uniformFraction / len(lights) + 1e-12
+        worstFrequency = max(worstFrequency, np.max(np.abs(counts[listed] / counts.sum() - probabilities[listed])))
+    assert worstSum < 1e-9 and worstFrequency < 0.02, (worstSum, worstFrequency) # 20000 picks put a frequency within about 0.0035 of its probability
+    print(f'Pick probabilities sum to 1 within {worstSum:.1e}, sampled frequencies of the listed lights within {worstFrequency:.4f} of them')
+
+    def getArguments(pathTracer):
+        return (pathTracer.worldArray, pathTracer.brickArray, pathTracer.worldOrigin, pathTracer.colors, pathTracer.lightPositions, pathTracer.lightVoxelIDs, pathTracer.numLights, pathTracer.gridPositions, pathTracer.gridVoxelIDs, pathTracer.gridWeights, pathTracer.gridSize, pathTracer.cellSize, pathTracer.uniformFraction, pathTracer.badLightSamples, pathTracer.maxRaySteps)
+
+    normalVector, objectColor = np.array([0.0, 1.0, 0.0]), np.array([0.8, 0.8, 0.8])
+    estimateDirectLighting(getArguments(gridTracer), np.array([0.5, float(surfaceHeights[0, 0]), 0.5]), normalVector, objectColor, 1, state) # Compile before timing
+    squaredErrors, relativeErrors = {'grid': [], 'uniform': []}, {'grid': [], 'uniform': []}
+    exactSquares = []
+    estimateTimes = {'grid': 0.0, 'uniform': 0.0}
+    while len(exactSquares) < numPoints:
+        x, z = int(rng.integers(0, worldSize[X_INDEX])), int(rng.integers(0, worldSize[Z_INDEX]))
+        pointHit = np.array([x + rng.uniform(0.1, 0.9), float(surfaceHeights[x, z]), z + rng.uniform(0.1, 0.9)]) # The top face of the surface voxel
+        exactRadiance = exactDirectLighting(getArguments(gridTracer), pointHit, normalVector, objectColor)
+        if not np.any(exactRadiance > 0) or worldArray[x, surfaceHeights[x, z], z] != EMPTY_VOXEL:
+            continue # In the dark or under a light
+
+        exactSquares.append(dot(exactRadiance, exactRadiance))
+        for name, pathTracer in (('grid', gridTracer), ('uniform', uniformTracer)):
+            startTime = time.perf_counter()
+            estimates = estimateDirectLighting(getArguments(pathTracer), pointHit, normalVector, objectColor, numTrials, state)
+            estimateTimes[name] += time.perf_counter() - startTime
+            squaredErrors[name].append(np.sum(np.mean((estimates - exactRadiance) ** 2, axis = 0))) # Summed over the colour channels. Not the variance of the estimates, which looks small when the few lights that matter are never picked
+            relativeErrors[name].append(np.sum(np.mean(estimates, axis = 0) - exactRadiance) / np.sum(exactRadiance))
+
+    relativeSquaredErrors = {name: np.array(squaredErrors[name]) / exactSquares for name in squaredErrors}
+    for name in ('uniform', 'grid'):
+        assert abs(np.mean(relativeErrors[name])) < 0.15, name # About 3.5 standard deviations of the mean at the default sizes
+        print(f'{name.capitalize()} selection: mean squared error {np.mean(squaredErrors[name]) / np.mean(exactSquares):.3f} of the mean squared radiance ({gridTracer.badLightSamples} candidates), mean relative bias {np.mean(relativeErrors[name]):+.4f}, {numPoints * numTrials / estimateTimes[name]:.0f} estimates/s')
+    gridLower = relativeSquaredErrors['grid'] < relativeSquaredErrors['uniform']
+    print(f'The light grid cuts the mean squared error by {np.mean(squaredErrors["uniform"]) / np.mean(squaredErrors["grid"]):.1f}x and the median relative squared error by {np.median(relativeSquaredErrors["uniform"]) / np.median(relativeSquaredErrors["grid"]):.1f}x (lower at {np.mean(gridLower) * 100:.0f}% of the points)')
+    assert np.mean(squaredErrors['grid']) < np.mean(squaredErrors['uniform']) # Not of the relative squared errors, which a few dim points lit only by a light the grid doesn't list decide
+    assert np.mean(gridLower) > 0.6, np.mean(gridLower) # Where the grid loses, its nearest lights are shadowed and crowd out the visible ones it doesn't list
+
+    world = World(None, None, types.SimpleNamespace(cameraPosition = glm.vec3(0)), seed, (4 * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, 4 * CHUNK_SIZE), persistent = False)
+    ctx = FakeContext()
+    world.ctx, world.rayTracer = ctx, {}
+    world.writeLightsToSSBO()
+    world.ctx = None # Edited without uploading, like an edit the next frame uploads
+    for mapPos in ((10, 150, 10), (100, 140, 70)):
+        world.writeToMapPos(mapPos, RED_LIGHT)
+        world.writeToLights(mapPos, RED_LIGHT)
+    PathTracer.fromWorld(world)
+    world.ctx = ctx
+    world.writeLightsToSSBO()
+    assert bytes(world.lightGrid.buffer.data) == world.lightGrid.array.tobytes()
+    print('Creating a CPU path tracer for a world leaves its light grid edits to be uploaded')
+
+def resolveLineDirectives(source):
+    '''
+    Work out the (source string number, line number) a GLSL compiler gives every line of an expanded shader by following its #line statements
+    '''
+    locations, sourceNumber, lineNumber = [], 0, 1
+    for line in source.splitlines():
+        locations.append((sourceNumber, lineNumber))
+        lineNumber += 1
+        if line.startswith('#line'):
+            _, lineNumber, sourceNumber = line.split()
+            lineNumber, sourceNumber = int(lineNumber), int(sourceNumber)
+    return locations
+
+def checkShaderPreprocessor(numLoads = 100):
+    '''
+    Expand shaders with nested, repeated and cyclic includes in a temporary folder without an OpenGL context, and check that every line maps back to its file and line, that the defines come right after #version, that the cache only misses when a file changes, and that driver errors get file names. Also times expanding the ray tracer with and without the cache
+    '''
+    shaderFiles = {
+        'Root': '#version 460 core\n#include "A"\n#include "B"\nvoid main(){ ROOT_MARK; }\n',
+        'A': '// A\n#include "B"\nfloat aMark = MAX_BOUNCES;\n',
+        'B': 'float bMark = 1.0;\n',
+        'C': '#include "D"\n',
+        'D': '#include "C"\n'
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for name, text in shaderFiles.items():
+            with open(f'{directory}/{name}.comp', 'w') as file:
+                file.write(text)
+
+        preprocessor = ShaderPreprocessor(directory)
+        defines = {'MAX_BOUNCES': 4, 'ROOT_MARK': 'return', 'USE_TAA': True}
+        source = preprocessor.expand('Root', defines)
+        lines = source.splitlines()
+        assert lines[:4] == ['#version 460 core', '#define MAX_BOUNCES 4', '#define ROOT_MARK return', '#define USE_TAA true']
+        assert source.count('bMark') == 1 and '#include' not in source # B is only included once
+
+        locations = resolveLineDirectives(source)
+        for name, text in shaderFiles.items():
+            for lineNumber, line in enumerate(text.splitlines(), 1):
+                if 'Mark' in line:
+                    sourceNumber, mappedLine = locations[lines.index(line)]
+                    assert (preprocessor.sourceNames[sourceNumber], mappedLine) == (f'{name}.comp', lineNumber), (name, line)
+
+        assert preprocessor.expand('Root', defines) is source # Cached
+        assert preprocessor.expand('Root', {'MAX_BOUNCES': 8}) != source
+
+        time.sleep(0.01)
+        with open(f'{directory}/B.comp', 'w') as file:
+            file.write('float bMark = 2.0;\n')
+        changedSource = preprocessor.expand('Root', defines)
+        assert 'float bMark = 2.0;' in changedSource and changedSource != source
+
+        try:
+            preprocessor.expand('C')
+            raise AssertionError('The include cycle was not caught')
+        except RuntimeError as error:
+            assert 'C -> D -> C' in str(error)
+
+        preprocessor.expand('Root', defines)
+        assert preprocessor.mapErrors('0(4) : error C1008: undefined variable') == 'Root.comp:4 : error C1008: undefined variable'
+        assert preprocessor.mapErrors('1:2(7): error: syntax error') == 'A.comp:2(7): error: syntax error'
+
+    rayTracerDefines = {'MAX_BOUNCES': 10, 'ROOT_SPP': 1, 'MAX_RAY_STEPS': VIEW_RANGE, 'NEIGHBORHOOD_SIZE': 1, 'BRICK_SIZE': BRICK_SIZE, 'BRICK_SHIFT': BRICK_SIZE.bit_length() - 1}
+    startTime = time.perf_counter()
+    for _ in range(numLoads):
+        source = ShaderPreprocessor('RayTracer').expand('RayTracing', rayTracerDefines)
+    coldTime = (time.perf_counter() - startTime) / numLoads
+
+    preprocessor = ShaderPreprocessor('RayTracer')
+    preprocessor.expand('RayTracing', rayTracerDefines)
+    startTime = time.perf_counter()
+    for _ in range(numLoads):
+        assert preprocessor.expand('RayTracing', rayTracerDefines) is not None
+    cachedTime = (time.perf_counter() - startTime) / numLoads
+
+    assert '#include' not in source and source.startswith('// Initialize the version\n#version 460 core\n#define MAX_BOUNCES 10\n')
+    print(f'Expanded RayTracing from {len(preprocessor.sourceNames)} files into {len(source.splitlines())} lines: {coldTime * 1e3:.2f}ms uncached, {cachedTime * 1e3:.3f}ms cached')
+
+def getMipChainBytes(width, height, bytesPerTexel):
+    '''
+    Get the bytes of a texture with its whole mip chain (each level halves the size, rounded down, until 1 x 1)
+    '''
+    chainBytes = 0
+    while True:
+        chainBytes += width * height * bytesPerTexel
+        if width == height == 1:
+            return chainBytes
+        width, height = max(width // 2, 1), max(height // 2, 1)
+
+def loadTexturesLegacy():
+    '''
+    The old Main.loadTextures without the GL calls: decode every face on its own (so Grass Side is decoded twice) into float32 faces and np.append a handle per texture. Returns the faces and the bytes the GPU holds for them with the mipmaps it built
+    '''
+    textureHandles, textureFaces, gpuBytes = np.array([], dtype = 'u4'), [], 0
+    for name in TEXTURE_NAMES:
+        if name in TEXTURE_FACES:
+            faces = [np.array(Image.open(findTextureFile(f'{name} {side}')).convert('RGB')).astype('f4') / 255 for side in TEXTURE_FACES[name]]
+        else:
+            faces = [np.array(Image.open(findTextureFile(name)).convert('RGB')).astype('f4') / 255] * 6
+        textureFaces.append(faces)
+        gpuBytes += sum(getMipChainBytes(face.shape[1], face.shape[0], face.itemsize * 3) for face in faces)
+        textureHandles = np.append(textureHandles, len(textureHandles))
+    return textureFaces, gpuBytes
+
+def checkTextures():
+    '''
+    Check that the texture cache gives back exactly what was decoded and that the faces of the 8 bit texture array are laid out like the old float32 cube maps
+    '''
+    legacyFaces, _ = loadTexturesLegacy()
+    with tempfile.TemporaryDirectory() as cacheFolder:
+        blockTextures = BlockTextures(cacheFolder = cacheFolder).load()
+        cachedTextures = BlockTextures(cacheFolder = cacheFolder).load()
+        assert all(np.array_equal(level, cachedLevel) for level, cachedLevel in zip(blockTextures.levels, cachedTextures.levels))
+
+    size = blockTextures.size
+    for textureIndex, faces in enumerate(legacyFaces):
+        for face, legacyFace in enumerate(faces):
+            resizedFace = np.asarray(Image.fromarray((legacyFace * 255).round().astype(np.uint8)).resize((size, size), Image.LANCZOS))
+            difference = np.abs(blockTextures.levels[0][textureIndex * 6 + face].astype(int) - resizedFace).mean()
+            assert difference < 1, (TEXTURE_NAMES[textureIndex], face, difference)
+    assert blockTextures.getFaces(CPU_TEXTURE_SIZE).shape == (len(TEXTURE_NAMES), 6, CPU_TEXTURE_SIZE, CPU_TEXTURE_SIZE, 3)
+    print(f'Textures: the cache round-trips and all {len(TEXTURE_NAMES)} textures are laid out like the old cube maps')
+
+def checkWorldConsistency(world):
+    '''
+    Check that everything derived from the world array (chunk summary, brickmap, light table and light grid) matches what a rebuild from scratch gives
+    '''
+    chunkSummary = ChunkSummary(world.worldSize)
+    chunkSummary.build(world.worldArray)
+    brickmap = Brickmap(world.worldSize)
+    brickmap.build(world.worldArray, chunkSummary.state)
+
+    lightPositions = np.argwhere(np.isin(world.worldArray, list(world.lightIDs))).tolist()
+    lightGrid = LightGrid(world.worldSize, buildMaterialArray(world.materialList)['color'], world.lights)
+    lightGrid.update()
+    world.lightGrid.update()
+
+    assert all(np.array_equal(getattr(world.chunkSummary, name), getattr(chunkSummary, name)) for name in ('state', 'solidCount', 'histogram', 'layerCounts', 'minY', 'maxY'))
+    assert np.array_equal(world.brickmap.brickArray, brickmap.brickArray)
+    assert sorted(world.lights.keys()) == sorted(map(tuple, lightPositions)) and all(world.lights[mapPos] == world.worldArray[mapPos] for mapPos in world.lights)
+    assert world.lightGrid.array.tobytes() == lightGrid.array.tobytes()
+
+def checkRegionEdits(worldChunks = 4, seed = CHECK_SEED):
+    '''
+    Check that fills, replaces, spheres and copy / paste keep the chunk summary, brickmap, lights and light grid consistent with the world while writing the light SSBOs (to a fake context) once per edit
+    '''
+    worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+    world = World(None, None, types.SimpleNamespace(cameraPosition = glm.vec3(0)), seed, worldSize, persistent = False)
+    world.ctx, world.rayTracer = FakeContext(), {}
+    world.writeLightsToSSBO()
+
+    lightUploads, writeLightsToSSBO = [], world.writeLightsToSSBO
+    world.writeLightsToSSBO = lambda: lightUploads.append(writeLightsToSSBO())
+    world.fillBox((0, 100, 0), (16, 101, 16), RED_LIGHT)
+    assert len(lightUploads) == 1 and len(world.lights) == 16 * 16 # 256 lights written with one upload
+    checkWorldConsistency(world)
+
+    assert world.replaceInBox((0, 100, 0), (8, 101, 16), RED_LIGHT, BLUE_LIGHT) == 8 * 16
+    world.fillSphere((40.5, 60.5, 40.5), 12, GREEN_LIGHT)
+    world.fillSphere((40.5, 60.5, 40.5), 10, EMPTY_VOXEL)
+    checkWorldConsistency(world)
+
+    block = world.copyRegion((20, 40, 20), (60, 80, 60))
+    world.pasteRegion((70, 90, 70), block)
+    assert np.array_equal(world.worldArray[70:110, 90:130, 70:110], block)
+    world.pasteRegion((-10, 100, 100), block, skipEmpty = True) # Partly outside the world
+    world.fillBox((-5, -5, -5), (10, 10, 10), EMPTY_VOXEL)
+    checkWorldConsistency(world)
+    print('Region edits keep the chunk summary, brickmap, lights and light grid consistent')
+
+def editAndCrash(directory, worldChunks, seed, saveFirst, numEdits = 2000):
+    '''
+    Edit a world in a directory (voxels, lights and region edits, around a background save if saveFirst), flush the journal, keep the flushed world in Expected.npy, make a few more edits that stay in the journal's buffer, and kill the process without saving (run by checkEditJournal in a child process)
+    '''
+    os.chdir(directory)
+    worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+    camera = types.SimpleNamespace(cameraPosition = glm.vec3(0))
+    world = World(None, None, camera, seed, worldSize)
+    rng = np.random.default_rng(seed)
+
+    def editWorld():
+        for mapPos in zip(*(rng.integers(0, size, numEdits).tolist() for size in worldSize)):
+            world.removeVoxel(mapPos) # Mined before anything is placed, like in play
+            world.voxelPlaceID = int(rng.choice([STONE, RED_LIGHT]))
+            world.placeVoxel(glm.ivec3(mapPos), glm.ivec3(0))
+        world.fillBox(rng.integers(0, 32, 3), rng.integers(32, 64, 3), int(rng.choice([EMPTY_VOXEL, DIRT, BLUE_LIGHT])))
+
+    editWorld()
+    if saveFirst:
+        world.saveWorld(wait = False)
+        editWorld() # Edits during the save land in the next segment
+        world.saveService.wait()
+        editWorld()
+        world.saveWorld(wait = False) # Killed while this save is (probably) still being written
+        editWorld()
+
+    world.journal.flush()
+    np.save('Expected.npy', np.asarray(world.worldArray))
+    for mapPos in zip(*(rng.integers(0, size, 10).tolist() for size in worldSize)):
+        world.writeToMapPos(mapPos, STONE) # Buffered, so these are lost like the edits since the last flush in a real crash
+    os.kill(os.getpid(), signal.SIGKILL)
+
+def checkEditJournal(worldChunks = 4, seed = CHECK_SEED):
+    '''
+    Kill a child process in the middle of editing a world (once before its first save and once after a background save) and check that loading the world again recovers every edit up to the last journal flush, with the chunk summary, brickmap and lights consistent with it. Then check that a journal isn't replayed onto another world of the same size that replaced its save, or onto a freshly generated world after its save was deleted
+    '''
+    workingDirectory = os.getcwd()
+    for saveFirst in (False, True):
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, 'Worlds'))
+            child = subprocess.run([sys.executable, '-c', f'import Checks; Checks.editAndCrash({directory!r}, {worldChunks}, {seed}, {saveFirst})'], cwd = workingDirectory)
+            assert child.returncode == -signal.SIGKILL, child.returncode
+
+            os.chdir(directory)
+            try:
+                journalFiles = sorted(fileName for fileName in os.listdir('Worlds') if JOURNAL_EXTENSION in fileName)
+                startTime = time.perf_counter()
+                world = World(None, None, types.SimpleNamespace(cameraPosition = glm.vec3(0)), None)
+                loadTime = time.perf_counter() - startTime
+
+                assert np.array_equal(world.worldArray, np.load('Expected.npy'))
+                checkWorldConsistency(world)
+                world.saveWorld()
+                assert sorted(fileName for fileName in os.listdir('Worlds') if JOURNAL_EXTENSION in fileName) == [f'{SAVE_NAME}{JOURNAL_EXTENSION}'] # The save folded the recovered journal in
+                world.journal.close()
+            finally:
+                os.chdir(workingDirectory)
+        print(f'Killed {"after" if saveFirst else "before"} the first save: recovered the edits from {journalFiles} in {loadTime:.3f}s (load and replay)')
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, 'Worlds'))
+        os.chdir(directory)
+        try:
+            worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+            camera = types.SimpleNamespace(cameraPosition = glm.vec3(0))
+            rng = np.random.default_rng(seed)
+
+            def editAndClose(world):
+                for mapPos in zip(*(rng.integers(0, size, 2000).tolist() for size in worldSize)):
+                    world.writeToMapPos(mapPos, STONE)
+                world.journal.close() # Without a save, so the edits are only in the journal
+                world.saveService.close()
+
+            world = World(None, None, camera, seed, worldSize)
+            world.saveWorld()
+            editAndClose(world)
+
+            otherArray = np.zeros(worldSize, 'u1')
+            generateTerrain(otherArray, generateHeightMap(seed + 1, worldSize[X_INDEX]), seed + 1)
+            chunkSummary = ChunkSummary(worldSize)
+            chunkSummary.build(otherArray)
+            writeRegionFile(world.filePath, otherArray, chunkSummary, seed + 1, glm.vec3(0), np.zeros(0, LIGHT_DTYPE)) # Another world of the same size replaces the save
+            world = World(None, None, camera, None)
+            assert np.array_equal(world.worldArray, otherArray) and os.path.isfile(world.journalPath + JOURNAL_ORPHAN_EXTENSION)
+            editAndClose(world)
+
+            os.remove(world.filePath) # Deleted to start over, the journal's edits were on top of the save
+            world = World(None, None, camera, seed + 1, worldSize)
+            assert np.array_equal(world.worldArray, otherArray)
+            world.journal.close()
+            world.saveService.close()
+        finally:
+            os.chdir(workingDirectory)
+    print('A journal is set aside instead of replayed when its save is replaced by another world or deleted')
+
+def checkProfiler(history = 600, seed = CHECK_SEED):
+    '''
+    Check the profiler's ring buffer statistics and exports against NumPy on the raw times, and that GPU stages read their timer queries a few frames late (on a fake context)
+    '''
+    rng = np.random.default_rng(seed)
+    stageProfiler = Profiler(enabled = True, history = history)
+    times = rng.exponential(2, 3 * history + 17)
+    for milliseconds in times:
+        stageProfiler.record('Stage', milliseconds)
+    lastTimes = times[-history:]
+    stats = stageProfiler.summarize()['Stage']
+    assert np.array_equal(stageProfiler.stages['Stage'].getTimes(), lastTimes) and stats['count'] == len(times)
+    assert np.allclose([stats['mean'], stats['p50'], stats['p99'], stats['max']], [lastTimes.mean(), *np.percentile(lastTimes, (50, 99)), lastTimes.max()])
+
+    with tempfile.TemporaryDirectory() as directory:
+        stageProfiler.export(os.path.join(directory, 'Profile.json'))
+        stageProfiler.export(os.path.join(directory, 'Profile.csv'))
+        with open(os.path.join(directory, 'Profile.json')) as file:
+            assert np.array_equal(json.load(file)['stages']['Stage']['times'], lastTimes)
+        with open(os.path.join(directory, 'Profile.csv')) as file:
+            assert next(iter(csv.DictReader(file)))['p99_ms'] == f'{stats["p99"]:.4f}'
+
+    stageProfiler.attachContext(FakeContext())
+    for frame in range(10):
+        with stageProfiler.scope('Ray tracing', gpu = True):
+            pass
+    assert stageProfiler.stages['Ray tracing'].count == 10 and stageProfiler.stages['Ray tracing' + GPU_SUFFIX].count == 10 - PROFILER_QUERY_LATENCY
+
+    print('Profiler: ring buffer statistics, exports and delayed GPU queries are correct')
+
+def simulateRenderScale(controller, frameCosts, noise = 0.0, seed = CHECK_SEED):
+    '''
+    Run a render scale controller on a synthetic trace where frame i takes fixedCost + pixelCost * scale^2 seconds (frameCosts gives both for every frame), with relative Gaussian noise. Returns the scale and the time of every frame
+    '''
+    rng = np.random.default_rng(seed)
+    scales, frameTimes = [], []
+    scale = controller.scale
+    for fixedCost, pixelCost in frameCosts:
+        frameTime = (fixedCost + pixelCost * scale ** 2) * max(1 + noise * rng.standard_normal(), 0.1)
+        scales.append(scale)
+        frameTimes.append(frameTime)
+        scale = controller.update(frameTime)
+    return np.array(scales), np.array(frameTimes)
+
+def checkRenderScaleController(numFrames = 600, targetFrameTime = 1 / 60):
+    '''
+    Check the render scale controller against synthetic frame time traces: a GPU that's too slow for the target at full resolution settles on the scale that meets it, a fast GPU stays at full resolution, a load step re-converges, noisy frame times barely move the scale, and a load that can't meet the target bottoms out at the minimum scale
+    '''
+    def idealScale(fixedCost, pixelCost):
+        return np.sqrt((targetFrameTime - fixedCost) / pixelCost)
+
+    def settled(scales, frameTimes, frames):
+        return len(np.unique(scales[-frames:])) == 1 and abs(frameTimes[-frames:].mean() / targetFrameTime - 1) < 0.1
+
+    controller = RenderScaleController(targetFrameTime)
+    scales, frameTimes = simulateRenderScale(controller, [(0.002, 0.033)] * numFrames)
+    settleFrame = int(np.flatnonzero(scales != scales[-1])[-1]) + 1
+    assert settled(scales, frameTimes, numFrames - 60) and abs(scales[-1] - idealScale(0.002, 0.033)) <= controller.step
+    print(f'Render scale: a GPU at 2x the target frame time settles on {scales[-1]:.3f} (ideal {idealScale(0.002, 0.033):.3f}) after {settleFrame} frames with {np.count_nonzero(np.diff(scales))} changes')
+
+    scales, _ = simulateRenderScale(RenderScaleController(targetFrameTime), [(0.002, 0.008)] * numFrames)
+    assert np.all(scales == 1)
+
+    scales, frameTimes = simulateRenderScale(RenderScaleController(targetFrameTime), [(0.002, 0.012)] * (numFrames // 2) + [(0.002, 0.04)] * (numFrames // 2))
+    assert np.all(scales[:numFrames // 2] == 1) and settled(scales, frameTimes, numFrames // 2 - 60)
+    print(f'Render scale: a load step from {0.014 * 1000:.0f}ms to {0.042 * 1000:.0f}ms at full resolution re-converges to {scales[-1]:.3f} within 60 frames')
+
+    controller = RenderScaleController(targetFrameTime)
+    scales, frameTimes = simulateRenderScale(controller, [(0.002, 0.03)] * numFrames, noise = 0.2)
+    lateScales = scales[numFrames // 4:]
+    assert np.all(np.abs(lateScales - idealScale(0.002, 0.03)) <= 2 * controller.step) and abs(frameTimes[numFrames // 4:].mean() / targetFrameTime - 1) < 0.1
+    print(f'Render scale: with 20% frame time noise the scale stays within {np.abs(lateScales - idealScale(0.002, 0.03)).max():.3f} of ideal and changes on {np.count_nonzero(np.diff(lateScales)) / len(lateScales) * 100:.1f}% of frames')
+
+    controller = RenderScaleController(targetFrameTime, minScale = 0.5)
+    scales, _ = simulateRenderScale(controller, [(0.02, 0.03)] * numFrames)
+    assert np.all(scales[-numFrames // 2:] == 0.5)
+    assert getRenderSize((1920, 1080), 0.65625) == (1260, 709) and getRenderSize((3, 1), 0.1) == (1, 1)
+    print('Render scale controller meets the target on every synthetic trace')
+
+def recordSession(filePath, numFrames, worldChunks, seed):
+    '''
+    Play a synthetic session headless the way the window does (mouse movement, clicks and voxel selection between frames, the movement keys and a jittery frame time every frame) while recording it. Returns the camera state after every frame and the final world
+    '''
+    rng = np.random.default_rng(seed)
+    worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+    app = types.SimpleNamespace(rayTracer = None, window_size = (1280, 720), renderSize = (1280, 720))
+    camera = Camera(app, glm.vec3(worldSize[X_INDEX] // 2, WORLD_CENTER_Y * 2, worldSize[Z_INDEX] // 2), 20, 60, 0.2)
+    world = World(None, None, camera, seed, worldSize, persistent = False)
+    column = world.worldArray[worldSize[X_INDEX] // 2, :, worldSize[Z_INDEX] // 2]
+    camera.cameraPosition.y = int(np.flatnonzero(np.asarray(column))[-1]) + 3 # Just above the ground and looking down at it, so clicks reach voxels
+    camera.pitch = -60
+    camera.calculateUnitVectors()
+    recorder = InputRecorder(filePath, world, camera)
+
+    cameraPath = []
+    for _ in range(numFrames):
+        for _ in range(rng.integers(0, 3)):
+            dx, dy = rng.integers(-20, 21, 2).tolist() # The window gets whole pixels
+            recorder.record(EVENT_MOUSE, dx, -dy)
+            camera.updateMouse(dx, -dy)
+        if rng.random() < 0.05:
+            keyIndex = int(rng.integers(0, 9))
+            recorder.record(EVENT_SELECT, keyIndex)
+            world.setVoxel(keyIndex)
+        if rng.random() < 0.2:
+            recorder.record(EVENT_REMOVE)
+            mapPos, _ = world.rayMarch(camera.getCameraCenterRay(), PLACE_MINE_DISTANCE)
+            world.removeVoxel(mapPos)
+        if rng.random() < 0.2:
+            recorder.record(EVENT_PLACE)
+            mapPos, normal = world.rayMarch(camera.getCameraCenterRay(), PLACE_MINE_DISTANCE)
+            world.placeVoxel(mapPos, normal)
+
+        camera.dirX, camera.dirY, camera.dirZ = rng.integers(-1, 2, 3).tolist()
+        camera.movingDown = 1 if camera.dirY else 0
+        frameTime = recorder.recordFrame(rng.uniform(0.005, 0.04), camera)
+        camera.render(frameTime)
+        recorder.recordCamera(camera)
+        world.updateStreaming()
+        camera.assignPrevRenderValues()
+        cameraPath.append(getCameraState(camera))
+
+    recorder.close()
+    worldArray = world.worldArray.toDense() if isColumnRLE(world.worldArray) else np.array(world.worldArray)
+    return np.array(cameraPath, np.float32), worldArray
+
+def checkInputReplay(numFrames = 600, worldChunks = 4, seed = CHECK_SEED):
+    '''
+    Record a synthetic session and replay it headless: replaying the recorded frame times retraces the recorded camera path and world exactly, and replays at a fixed timestep give the same camera path and world every run
+    '''
+    def replay(recording, timestep):
+        app = types.SimpleNamespace(rayTracer = None, window_size = (1280, 720), renderSize = (1280, 720))
+        camera = Camera(app, glm.vec3(0), 1, 1, 1)
+        world = World(None, None, camera, recording.seed, recording.worldSize, persistent = False)
+        cameraPath, frameTimes, player = replayHeadless(recording, world, camera, timestep)
+        worldArray = world.worldArray.toDense() if isColumnRLE(world.worldArray) else np.array(world.worldArray)
+        return cameraPath, worldArray, frameTimes, player
+
+    workingDirectory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            filePath = os.path.join(directory, 'Session.vxin')
+            liveCameraPath, liveWorld = recordSession(filePath, numFrames, worldChunks, seed)
+            recording = InputRecording(filePath)
+            fileSize = os.path.getsize(filePath)
+
+            cameraPath, worldArray, _, player = replay(recording, None)
+            assert player.frame == numFrames and player.cameraMismatches == 0, player.cameraMismatches
+            assert np.array_equal(cameraPath, liveCameraPath) and np.array_equal(worldArray, liveWorld)
+            freshWorld = World(None, None, types.SimpleNamespace(cameraPosition = glm.vec3(0)), recording.seed, recording.worldSize, persistent = False).worldArray
+            numEdited = int(np.count_nonzero(liveWorld != (freshWorld.toDense() if isColumnRLE(freshWorld) else freshWorld)))
+            assert numEdited > 0
+
+            firstPath, firstWorld, frameTimes, _ = replay(recording, REPLAY_TIMESTEP)
+            secondPath, secondWorld, _, _ = replay(recording, REPLAY_TIMESTEP)
+            assert np.array_equal(firstPath, secondPath) and np.array_equal(firstWorld, secondWorld)
+        finally:
+            os.chdir(workingDirectory)
+
+    print(f'Input replay: {numFrames} frames with {len(recording.events)} events ({numEdited} voxels edited) in {fileSize / 1024:.1f} KiB ({fileSize / numFrames:.0f} bytes per frame)')
+    print(f'Input replay: {frameTimes.mean() * 1000:.3f}ms mean and {np.percentile(frameTimes, 99) * 1000:.3f}ms p99 per headless frame at a fixed {REPLAY_TIMESTEP * 1000:.2f}ms timestep')
+    print('Replays retrace the recorded session and give the same camera path and world every run')
+
+def checkLODPyramid(numRays = 2 ** 16, numEdits = 2000, numSampled = 2000, worldChunks = 16, maxDistances = (128, 512), seed = CHECK_SEED):
+    '''
+    Check the LOD pyramid of a generated world against its definition (a cell is empty exactly when its voxels are, and otherwise holds the most common of its non-empty children) and against a rebuild after voxel and region edits, then trace random rays with the dense DDA and the LOD traversal to count the steps it saves, checking that it matches the dense DDA inside LOD_DISTANCE and never hits further than it
+    '''
+    worldSize = (worldChunks * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, worldChunks * CHUNK_SIZE)
+    camera = types.SimpleNamespace(cameraPosition = glm.vec3(0))
+    world = World(None, None, camera, seed, worldSize, persistent = False)
+    worldArray, pyramid = world.worldArray, world.lodPyramid
+
+    rng = np.random.default_rng(seed)
+    finer = worldArray
+    for level, cells in enumerate(pyramid.levels, 1):
+        numCells = cells.shape
+        occupied = finer.reshape(numCells[X_INDEX], 2, numCells[Y_INDEX], 2, numCells[Z_INDEX], 2).any(axis = (1, 3, 5))
+        assert np.array_equal(cells != EMPTY_VOXEL, occupied)
+        for cellPos in zip(*(rng.integers(0, size, numSampled).tolist() for size in numCells)):
+            children = finer[tuple(slice(2 * cellPos[axis], 2 * cellPos[axis] + 2) for axis in range(3))].ravel().tolist()
+            assert cells[cellPos] == getRepresentative(children)
+        finer = cells
+
+    for mapPos in zip(*(rng.integers(0, size, numEdits).tolist() for size in worldSize)):
+        world.removeVoxel(mapPos)
+        if rng.random() < 0.5:
+            world.voxelPlaceID = int(rng.choice([STONE, DIRT, RED_LIGHT]))
+            world.placeVoxel(glm.ivec3(mapPos), glm.ivec3(0))
+    world.fillBox((5, 40, 9), (77, 101, 60), EMPTY_VOXEL)
+    world.fillSphere((200, 70, 300), 23, STONE)
+    rebuilt = LODPyramid(worldSize)
+    rebuilt.build(worldArray, world.chunkSummary.state)
+    assert all(np.array_equal(cells, rebuiltCells) for cells, rebuiltCells in zip(pyramid.levels, rebuilt.levels))
+    print(f'LOD pyramid: {len(pyramid.levels)} levels match their definition, and incremental updates match a rebuild after {numEdits} voxel edits and two region edits')
+
+    origins = rng.uniform((0, 0, 0), worldSize, (numRays, 3))
+    surfaceHeights = np.argmin(worldArray != EMPTY_VOXEL, axis = Y_INDEX)
+    origins[:, Y_INDEX] = surfaceHeights[origins[:, X_INDEX].astype(int), origins[:, Z_INDEX].astype(int)] + rng.uniform(0, 2 * CHUNK_SIZE, numRays)
+    directions = rng.normal(size = (numRays, 3))
+    directions /= np.linalg.norm(directions, axis = 1)[:, None]
+    levels = pyramid.getLevels(worldArray)
+
+    for maxDistance in maxDistances:
+        maxSteps = 4 * maxDistance # Enough for either traversal to reach maxDistance
+        denseHits, denseDistances, denseSteps, lodHits, lodDistances, lodSteps, lodLevels = compareLODTraversal(levels, origins, directions, maxDistance, maxSteps, LOD_DISTANCE)
+        nearHits = denseHits & (denseDistances < LOD_DISTANCE)
+        assert np.array_equal(lodHits[nearHits], denseHits[nearHits]) and np.array_equal(lodDistances[nearHits], denseDistances[nearHits]) and np.array_equal(lodSteps[nearHits], denseSteps[nearHits])
+        assert np.all(lodHits[denseHits]) and np.all(lodDistances[denseHits] <= denseDistances[denseHits] + 1e-9)
+
+        bothHits = denseHits & lodHits
+        farRays = ~nearHits
+        print(f'LOD traversal to {maxDistance} voxels: {denseSteps.mean():.1f} -> {lodSteps.mean():.1f} mean steps per ray ({(1 - lodSteps.sum() / denseSteps.sum()) * 100:.1f}% saved, {(1 - lodSteps[farRays].sum() / denseSteps[farRays].sum()) * 100:.1f}% on rays that go past {LOD_DISTANCE} voxels)')
+        print(f'LOD traversal to {maxDistance} voxels: {denseHits.mean() * 100:.1f}% dense hits, {(lodHits & ~denseHits).mean() * 100:.1f}% extra LOD hits, hits {np.mean(denseDistances[bothHits] - lodDistances[bothHits]):.2f} voxels nearer on average, levels hit {np.bincount(lodLevels[lodHits], minlength = len(levels)).tolist()}')
+
+CHECKS = [
+    checkDirtyUploads, checkChunkSummary, checkBrickmap, checkDeterminism, checkNoise, checkStreaming, checkSaveFormats, checkSaveService,
+    checkColumnRLE, checkRayCasting, checkLightTable, checkLightGrid, checkShaderPreprocessor, checkTextures, checkRegionEdits, checkEditJournal,
+    checkProfiler, checkRenderScaleController, checkInputReplay, checkLODPyramid
+]
+
+def runChecks(checks):
+    '''
+    Run every check even when one fails (printing its traceback). Returns the names of the checks that failed
+    '''
+    failed = []
+    for check in checks:
+        print(f'{check.__name__}:')
+        startTime = time.perf_counter()
+        try:
+            check()
+        except Exception:
+            traceback.print_exc()
+            failed.append(check.__name__)
+        print(f'{check.__name__} {"failed" if check.__name__ in failed else "passed"} in {time.perf_counter() - startTime:.1f}s\n')
+    return failed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Run the correctness checks (they assert, so the exit code is non-zero if any of them fail)')
+    parser.add_argument('checks', nargs = '*', help = 'Names of the checks to run (every check by default)')
+    args = parser.parse_args()
+    unknown = set(args.checks) - {check.__name__ for check in CHECKS}
+    if unknown:
+        parser.error(f'unknown checks: {", ".join(sorted(unknown))}')
+
+    checks = [check for check in CHECKS if not args.checks or check.__name__ in args.checks]
+    failed = runChecks(checks)
+    print(f'{len(checks) - len(failed)} of {len(checks)} checks passed' + (f', failed: {", ".join(failed)}' if failed else ''))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,25 @@
+from Settings import *
+from World_Utils import *
+import glob
+
+def convertSave(legacyPath):
+    '''
+    Convert a legacy .npz save to a region file next to it (the .npz is kept)
+    '''
+    loadedWorld = np.load(legacyPath)
+    worldArray = loadedWorld['worldArray']
+    seed = int(loadedWorld['seed']) if 'seed' in loadedWorld.files else None
+
+    chunkSummary = ChunkSummary(np.shape(worldArray))
+    chunkSummary.build(worldArray)
+
+    lightArray = loadedWorld['lightArray']
+    lightArray = lightArray[np.isin(lightArray['voxelID'], (RED_LIGHT, GREEN_LIGHT, BLUE_LIGHT))] # Saves without lights hold a placeholder entry
+
+    regionPath = os.path.splitext(legacyPath)[0] + REGION_EXTENSION
+    regionSize = writeRegionFile(regionPath, worldArray, chunkSummary, seed, loadedWorld['cameraPosition'], lightArray)
+    print(f'{legacyPath} ({os.path.getsize(legacyPath) / 2 ** 20:.1f} MiB) -> {regionPath} ({regionSize / 2 ** 20:.1f} MiB)')
+
+if __name__ == '__main__':
+    for legacyPath in sorted(glob.glob('Worlds/*.npz')):
+        convertSave(legacyPath)
@@ -2,6 +2,7 @@ from Settings import *
 from Window_Utils import *
 from World_Utils import *
 from World_Utils.Textures import Texture #Just because Pylance doesn't like working
+from Startup import initialize, waitForWarmUp
 
 class screenNames:
     POSITION = 'vertexPosition'
@@ -19,13 +20,14 @@ class Window(mglw.WindowConfig):
         self.wnd.fullscreen_key = self.wnd.keys.F12
         self.wnd.mouse_exclusivity = True 
 
+        self.initRenderer(**RENDER_QUALITY_PRESETS[RENDER_QUALITY], temporalReuseFactor = 0.01, temporalBlendReduction = 25)
         self.loadTextures()
-        self.rayTracer = self.ctx.compute_shader(loadComputeShader(self.ctx, 'RayTracer', 'RayTracing'))
-        self.initRenderer(10, 1, 0.01, 25, 10, VIEW_RANGE, 1)
 
         self.ctx.gc_mode = 'auto'
         self.ctx.enable(mgl.CULL_FACE)
         self.program = self.ctx.program(*loadVertexAndFrag('Window', 'Window', 'Window'))
+        self.renderScale = 1.0
+        self.renderScaleController = RenderScaleController(1 / TARGET_FPS, MIN_RENDER_SCALE) if DYNAMIC_RENDER_SCALE else None
         self.initScreen()
         self.initRand()
 
@@ -33,112 +35,101 @@ class Window(mglw.WindowConfig):
         #self.camera = Camera(self, glm.vec3(0, 0, -1), 20, 60, 0.2)
         self.camera = Camera(self, glm.vec3(worldSize // 2, WORLD_CENTER_Y * 2, worldSize // 2), 20, 60, 0.2)
         self.screenCoords = mglw.geometry.quad_fs(attr_names = screenNames, normals = False, name = 'Screen Coordinates')
-        self.world = World(self.ctx, self.rayTracer, self.camera)
+        waitForWarmUp()
+        self.createWorld()
 
         self.crosshair = Crosshair(self, 0.03, glm.vec3(1), self.window_size) #type: ignore
         self.cube = Cube(self, glm.vec3(1.2, -0.7, -1.5), 0.5) #type: ignore
         self.numberKeys = list(range(self.wnd.keys.NUMBER_1, self.wnd.keys.NUMBER_9 + 1))
         self.showUI = True 
+        self.showProfiler, self.profilerOverlay = False, None
+        profiler.attachContext(self.ctx)
 
         self.world.setTime(TIME_DAY)
         self.world.assignRender()
 
+    def createWorld(self):
+        '''
+        Create the world and the input recorder or player. Recorded and replayed sessions use a fresh world from the seed that's never saved, so a replay starts from exactly the world its recording started from
+        '''
+        self.inputRecorder, self.inputPlayer = None, None
+        if INPUT_MODE is None:
+            self.world = World(self.ctx, self.rayTracer, self.camera)
+        elif INPUT_MODE == 'record':
+            self.world = World(self.ctx, self.rayTracer, self.camera, persistent = False)
+            self.inputRecorder = InputRecorder(INPUT_RECORDING, self.world, self.camera)
+        elif INPUT_MODE == 'replay':
+            recording = InputRecording(INPUT_RECORDING)
+            self.world = World(self.ctx, self.rayTracer, self.camera, recording.seed, recording.worldSize, persistent = False)
+            recording.resetCamera(self.camera)
+            self.inputPlayer = InputPlayer(recording)
+            self.replayStartTime = time.perf_counter()
+        else:
+            raise ValueError(f"Unknown input mode {INPUT_MODE!r} (expected None, 'record' or 'replay')")
+
     def initRenderer(self, maxBounces, samplesPerPixel, temporalReuseFactor, temporalBlendReduction, badLightSamples, maxRaySteps, neighborhoodSize):
         '''
-        Initialize the quantities necessary for the renderer and pass them in (including the temporal reuse mix factor)
+        Compile the ray tracer with the loop bounds (bounces, samples per pixel, ray steps, and the TAA neighborhood) baked in as constants so the driver can unroll and fold them, and pass in the other quantities necessary for the renderer (including the temporal reuse mix factor)
         '''
-        self.rayTracer['maxBounces'] = maxBounces
-        rootSPP = int(np.sqrt(samplesPerPixel))
-        self.rayTracer['rootSPP'] = rootSPP 
-        self.rayTracer['invRootSPP'] = 1 / rootSPP
+        rendererDefines = {
+            'MAX_BOUNCES': maxBounces,
+            'ROOT_SPP': int(np.sqrt(samplesPerPixel)),
+            'MAX_RAY_STEPS': maxRaySteps,
+            'NEIGHBORHOOD_SIZE': neighborhoodSize,
+            'BRICK_SIZE': BRICK_SIZE,
+            'BRICK_SHIFT': BRICK_SIZE.bit_length() - 1
+        }
+        self.rayTracer = compileComputeShader(self.ctx, 'RayTracer', 'RayTracing', rendererDefines)
         self.rayTracer['temporalReuseFactor'] = temporalReuseFactor
         self.rayTracer['temporalBlendReduction'] = temporalBlendReduction
         self.rayTracer['badLightSamples'] = badLightSamples
-        self.rayTracer['maxRaySteps'] = maxRaySteps
-        self.rayTracer['neighborhoodSize'] = neighborhoodSize
-    
-    def loadTexture(self, name):
-        '''
-        Load a specific texture into the ray tracer
-        '''
-        faces = []
-        for side in ('Side', 'Side', 'Top', 'Bot', 'Side', 'Side'):
-            try: 
-                image = Image.open(f'Textures/{name} {side}.jpg') 
-            except:
-                image = Image.open(f'Textures/{name} {side}.png') 
-            
-            image = image.convert('RGB')
-            faces.append(image)
-
-        imageSize = faces[0].size
-        texture = self.ctx.texture_cube(imageSize, 3, dtype = 'f4')
-
-        for i, img in enumerate(faces):
-            data = np.array(img).astype('f4') / 255
-            texture.write(i, data)
-        
-        texture.build_mipmaps()
-        self.textureHandles = np.append(self.textureHandles, texture.get_handle())   
     
-    def loadSameTexture(self, name):
-        '''
-        load a specific texture into the ray tracer that has the same elements on all sides
-        '''
-        try:
-            image = Image.open(f'Textures/{name}.jpg')
-        except:
-            image = Image.open(f'Textures/{name}.png')
-        image = image.convert('RGB')
-
-        imageSize, faceData = image.size, np.array(image).astype('f4') / 255
-        texture = self.ctx.texture_cube(imageSize, 3, dtype = 'f4')
-
-        for i in range(6):
-            texture.write(i, faceData)
-        
-        texture.build_mipmaps()
-        self.textureHandles = np.append(self.textureHandles, texture.get_handle())
-
-    def uploadTextureHandles(self):
-        '''
-        Upload the texture handles to the GPU 
-        '''
-        self.textureHandles = self.ctx.buffer(self.textureHandles)
-        self.textureHandles.bind_to_storage_buffer(2)
-
     def loadTextures(self):
         '''
-        Register the texture directory to moderngl window and load all the textures
+        Load all the block textures (decoded on a thread pool, or read from the texture cache when the images haven't changed) into one texture array for the ray tracer
         '''
-        self.textureHandles = np.array([], dtype = 'u4')
-
-        self.loadTexture('Grass')
-        self.loadSameTexture('Dirt')
-        self.loadSameTexture('Stone')
-        self.loadSameTexture('Sand')
-        self.loadSameTexture('Snow')
-        self.loadSameTexture('Clay')
-        self.loadSameTexture('Wood')
-        self.uploadTextureHandles()
+        self.blockTextures = BlockTextures().load()
+        self.blockTextures.upload(self.ctx, 2)
+        self.rayTracer['blockTextures'] = 2
            
     def initScreen(self):
         '''
-        Initialize two screen textures so that the renderer can draw to the screen indirectly using the texture. Initialize two textures and cycle between them to enable TAA. Note that I have to do this manually without using a helper function because of OPENGL shenanigans
+        Initialize two screen textures so that the renderer can draw to the screen indirectly using the texture. Initialize two textures and cycle between them to enable TAA. Note that I have to do this manually without using a helper function because of OPENGL shenanigans. The textures are always the window's size and the ray tracer only renders the render size part of them, so changing the render scale never reallocates them (and the TAA history stays valid)
         '''
         self.screen1 = self.ctx.texture(self.window_size, 4, dtype = 'f4')
-        self.screen1.filter = (mgl.NEAREST, mgl.NEAREST)
+        self.screen1.filter = (mgl.LINEAR, mgl.LINEAR) # Bilinear upsampling when the render scale is below 1 (the same as nearest at a scale of 1)
         self.screen1.bind_to_image(0)        
         self.screen1.use(0)       
 
         self.screen2 = self.ctx.texture(self.window_size, 4, dtype = 'f4')
-        self.screen2.filter = (mgl.NEAREST, mgl.NEAREST)
+        self.screen2.filter = (mgl.LINEAR, mgl.LINEAR)
         self.screen2.bind_to_image(1)
         self.screen2.use(1)
 
         self.frameCount = 0
         self.rayTracer['frameCount'] = self.frameCount
         self.program['frameCount'] = self.frameCount
+
+        self.renderSize = getRenderSize(self.window_size, self.renderScale)
+        self.prevRenderSize = self.renderSize
+        self.assignRenderSize()
+
+    def assignRenderSize(self):
+        '''
+        Pass the render size of this frame and the last one to the ray tracer (for the TAA reprojection) and the window's shader (for the upsampling)
+        '''
+        self.rayTracer['renderSize'] = self.renderSize
+        self.rayTracer['prevRenderSize'] = self.prevRenderSize
+        self.program['renderSize'] = self.renderSize
+
+    def updateRenderScale(self, frameTime):
+        '''
+        Let the render scale controller pick this frame's render scale from the last frame's time
+        '''
+        if self.renderScaleController is not None:
+            self.renderScale = self.renderScaleController.update(frameTime)
+        self.prevRenderSize, self.renderSize = self.renderSize, getRenderSize(self.window_size, self.renderScale)
+        self.assignRenderSize()
      
     def initRand(self):
         '''
@@ -180,6 +171,7 @@ class Window(mglw.WindowConfig):
             return 
         
         keyIndex = self.numberKeys.index(key)
+        self.recordInput(EVENT_SELECT, keyIndex)
         self.world.setVoxel(keyIndex)
 
     def on_key_event(self, key, action, modifiers):
@@ -194,22 +186,59 @@ class Window(mglw.WindowConfig):
         if action != self.wnd.keys.ACTION_PRESS:
             return 
         
-        self.blockSelectionKeys(key)
+        if self.inputPlayer is None: # A replay ignores live input
+            self.blockSelectionKeys(key)
         
         if key == self.wnd.keys.F1:
             self.wnd.mouse_exclusivity = not self.wnd.mouse_exclusivity
             self.wnd.cursor = not self.wnd.cursor 
         elif key == self.wnd.keys.F2:
             self.showUI = not self.showUI
+        elif key == self.wnd.keys.F3:
+            self.toggleProfiler()
+        elif key == self.wnd.keys.F4:
+            self.exportProfile()
+
+    def toggleProfiler(self):
+        '''
+        Show or hide the profiler overlay (the profiler runs while it's shown, or always with PROFILER_ENABLED)
+        '''
+        self.showProfiler = not self.showProfiler
+        profiler.setEnabled(self.showProfiler or PROFILER_ENABLED)
+        if self.showProfiler and self.profilerOverlay is None:
+            self.profilerOverlay = ProfilerOverlay(self, profiler)
+
+    def exportProfile(self):
+        '''
+        Write the profiler's statistics to the profile folder as CSV and JSON
+        '''
+        filePath = os.path.join(PROFILE_FOLDER, time.strftime('Profile %Y-%m-%d %H-%M-%S'))
+        profiler.export(f'{filePath}.csv')
+        profiler.export(f'{filePath}.json')
+        print(f'Saved the profile to {filePath}.csv and .json')
         
+    def recordInput(self, eventType, *values):
+        '''
+        Record an input event when input is being recorded
+        '''
+        if self.inputRecorder is not None:
+            self.inputRecorder.record(eventType, *values)
+
     def on_mouse_position_event(self, mouseX, mouseY, dx, dy):
+        if self.inputPlayer is not None:
+            return
+        self.recordInput(EVENT_MOUSE, dx, -dy)
         self.camera.updateMouse(dx, -dy) 
 
     def on_mouse_press_event(self, mouseX, mouseY, button):
+        if self.inputPlayer is not None:
+            return
         if button == LEFT_MOUSE_BUTTON:
+            self.recordInput(EVENT_REMOVE)
             mapPos, _ = self.world.rayMarch(self.camera.getCameraCenterRay(), PLACE_MINE_DISTANCE)
             self.world.removeVoxel(mapPos)
         elif button == RIGHT_MOUSE_BUTTON:
+            self.recordInput(EVENT_PLACE)
             mapPos, normal = self.world.rayMarch(self.camera.getCameraCenterRay(), PLACE_MINE_DISTANCE)
             self.world.placeVoxel(mapPos, normal)
 
@@ -239,35 +268,100 @@ class Window(mglw.WindowConfig):
 
     def on_close(self):
         '''
-        On window close, save the world. DO NOT STOP RUNNING THE CODE BEFORE THIS FUNCTION ENDS OR THE WORLD SAVE WILL BE BAD
+        On window close, save the world (only the chunks edited since the last autosave have to be compressed). The save is written to a temporary file first so stopping the code early loses the latest edits but never corrupts the save
         '''
+        if self.inputRecorder is not None:
+            self.inputRecorder.close()
+            print(f'Recorded {self.inputRecorder.numFrames} frames to {INPUT_RECORDING}')
+        if INPUT_MODE is not None: # Recorded and replayed worlds are never saved (a streamed one deletes its temporary chunk columns)
+            if self.world.streamer is not None:
+                self.world.streamer.close()
+            return
+
         print('Currently Saving World')
         self.world.saveWorld()
+        if self.world.streamer is not None:
+            self.world.streamer.close()
         print('Finished Saving')
 
     def on_render(self, t, frameTime):
         '''
-        Render the screen and display the fps
+        Render the screen and display the fps. Every stage is a profiler scope (the GPU stages are also timed with timer queries)
         '''
-        self.ctx.clear()
+        with profiler.scope('Frame'):
+            finished = self.renderFrame(frameTime) is False
+        if finished:
+            self.finishReplay()
+            return
+
+        if self.showProfiler:
+            self.profilerOverlay.render()
+            self.screen1.use(0)
+
+        self.wnd.title = f'FPS: {self.timer.fps: .2f}  Render Scale: {self.renderScale:.2f}'
+
+    def updateInput(self, frameTime):
+        '''
+        Apply this frame's input: the live movement keys (recorded when recording) or the next frame of the replay. Returns the time the camera moves by (a fixed timestep in a replay), or None once the replay is over
+        '''
+        if self.inputPlayer is not None:
+            return self.inputPlayer.step(self.camera, self.world)
+
         self.cameraMovementKeys()
-        self.camera.render(frameTime)
+        if self.inputRecorder is not None:
+            return self.inputRecorder.recordFrame(frameTime, self.camera)
+        return frameTime
+
+    def finishReplay(self):
+        '''
+        Report the replay's frame rate (and write the profile when the profiler is running) and close the window
+        '''
+        replayTime = time.perf_counter() - self.replayStartTime
+        print(f'Replayed {self.inputPlayer.frame} frames of {INPUT_RECORDING} in {replayTime:.2f}s ({self.inputPlayer.frame / replayTime:.1f} FPS)')
+        if profiler.enabled:
+            self.exportProfile()
+        self.wnd.close()
+
+    def renderFrame(self, frameTime):
+        '''
+        Run the stages of a frame: input, camera, world updates and uploads, the ray tracer, and the screen and UI passes. Returns False once a replay is over
+        '''
+        self.ctx.clear()
+        with profiler.scope('Input'):
+            cameraTime = self.updateInput(frameTime)
+        if cameraTime is None:
+            return False
+        self.updateRenderScale(frameTime)
+        with profiler.scope('Camera'):
+            self.camera.render(cameraTime)
+        if self.inputRecorder is not None:
+            self.inputRecorder.recordCamera(self.camera)
+        with profiler.scope('Streaming'):
+            self.world.updateStreaming()
+        with profiler.scope('Voxel uploads'):
+            self.world.uploadDirtyRegions()
+        with profiler.scope('Autosave'):
+            self.world.autosave()
 
-        workgroupX, workgroupY = math.ceil(self.window_size[X_INDEX] / 8), math.ceil(self.window_size[Y_INDEX] / 4)
-        self.rayTracer.run(workgroupX, workgroupY)
-        self.ctx.memory_barrier(mgl.SHADER_IMAGE_ACCESS_BARRIER_BIT)
+        workgroupX, workgroupY = math.ceil(self.renderSize[X_INDEX] / 8), math.ceil(self.renderSize[Y_INDEX] / 4)
+        with profiler.scope('Ray tracing', gpu = True):
+            self.rayTracer.run(workgroupX, workgroupY)
+        with profiler.scope('Memory barrier'):
+            self.ctx.memory_barrier(mgl.SHADER_IMAGE_ACCESS_BARRIER_BIT)
 
-        self.screenCoords.render(self.program)
+        with profiler.scope('Screen pass', gpu = True):
+            self.screenCoords.render(self.program)
         
         if self.showUI:
-            self.crosshair.render()
-            self.cube.render()
-        
-        self.updateFrameCount()
-        self.camera.assignPrevRenderValues()
-        self.resetRayTracer()
+            with profiler.scope('UI', gpu = True):
+                self.crosshair.render()
+                self.cube.render()
         
-        self.wnd.title = f'FPS: {self.timer.fps: .2f}'
+        with profiler.scope('Uniforms'):
+            self.updateFrameCount()
+            self.camera.assignPrevRenderValues()
+            self.resetRayTracer()
 
 if __name__ == '__main__':  
+    initialize(JIT_WARM_UP)
     Window.run()
\ No newline at end of file
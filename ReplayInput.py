@@ -0,0 +1,51 @@
+from Settings import *
+from World_Utils import *
+from Window_Utils import *
+from Startup import initialize
+import argparse
+import hashlib
+import types
+
+def createHeadlessSession(recording):
+    '''
+    Create a world (never saved) and a camera without a window for a recording
+    '''
+    app = types.SimpleNamespace(rayTracer = None, window_size = (1280, 720), renderSize = (1280, 720))
+    camera = Camera(app, glm.vec3(recording.cameraPosition), recording.cameraSpeed, recording.fov, recording.mouseSensitivity)
+    world = World(None, None, camera, recording.seed, recording.worldSize, persistent = False)
+    return world, camera
+
+def hashArray(array):
+    return hashlib.sha256(np.ascontiguousarray(array).tobytes()).hexdigest()[:16]
+
+def replayRecording(recording, timestep):
+    '''
+    Replay a recording headless once. Returns the hashes of the camera path and the world and the time every frame took
+    '''
+    world, camera = createHeadlessSession(recording)
+    cameraPath, frameTimes, player = replayHeadless(recording, world, camera, timestep)
+    worldArray = world.worldArray.toDense() if isColumnRLE(world.worldArray) else world.worldArray
+    if world.streamer is not None:
+        world.streamer.close() # Deletes the temporary chunk columns
+    return hashArray(cameraPath), hashArray(worldArray), frameTimes, player
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Replay an input recording without a window and check that every run gives the same camera path and world')
+    parser.add_argument('recording', nargs = '?', default = INPUT_RECORDING)
+    parser.add_argument('--runs', type = int, default = 2)
+    parser.add_argument('--timestep', type = float, default = REPLAY_TIMESTEP, help = 'Time the camera moves by every frame (0 replays the recorded frame times)')
+    args = parser.parse_args()
+
+    initialize('blocking')
+    recording = InputRecording(args.recording)
+    timestep = args.timestep or None
+    print(f'{args.recording}: {recording.numFrames} frames, {len(recording.events)} events, seed {recording.seed}, world size {recording.worldSize}')
+
+    results = []
+    for run in range(args.runs):
+        cameraHash, worldHash, frameTimes, player = replayRecording(recording, timestep)
+        results.append((cameraHash, worldHash))
+        frameTimes = frameTimes * 1000
+        print(f'Run {run + 1}: {player.frame} frames, {frameTimes.mean():.3f}ms mean, {np.percentile(frameTimes, 99):.3f}ms p99, {frameTimes.max():.3f}ms max (input and world updates), {player.cameraMismatches} frames off the recorded camera, camera path {cameraHash}, world {worldHash}')
+
+    print(f'Every run gave the same camera path and world: {len(set(results)) == 1}')
@@ -1,24 +1,45 @@
-import moderngl_window as mglw
+import importlib.util
 import math 
-import moderngl as mgl 
 import numpy as np
-import taichi as ti
+import sys
 import time 
 import glm 
 import os 
-from PIL import Image
-from opensimplex import OpenSimplex
-from numba import njit, prange
 from random import randint
 
-SEED = randint(0, 10000000)
-generator = OpenSimplex(SEED)
+def lazyImport(moduleName):
+    '''
+    Import a module the first time one of its attributes is used, so tools that never open a window or read an image don't pay for importing them
+    '''
+    if moduleName in sys.modules:
+        return sys.modules[moduleName]
+
+    spec = importlib.util.find_spec(moduleName)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[moduleName] = module
+    spec.loader.exec_module(module)
+    return module
+
+def njit(*args, **kwargs):
+    '''
+    numba.njit that imports Numba the first time a function is decorated with it (functions that use prange import it from numba themselves). Numba is imported when the decorated function is defined, not when it's first called: jitted functions call each other through their module's globals, so those have to be Numba dispatchers by the time a caller compiles. A module that mustn't load Numba can't define jitted functions, which is why World_Utils only imports its submodules the first time one of its names is used
+    '''
+    import numba
+    return numba.njit(*args, **kwargs)
+
+mglw = lazyImport('moderngl_window')
+mgl = lazyImport('moderngl')
+Image = lazyImport('PIL.Image')
+
+SEED = None #Set this to a number to generate the same world every run (None picks a random seed for every new world)
 
 X_INDEX = 0 
 Y_INDEX = 1
 Z_INDEX = 2
 
 CHUNK_SIZE = 32
+BRICK_SIZE = 8
 
 WORLD_SIZE_XZ = 50
 WORLD_SIZE_Y = 5
@@ -48,8 +69,11 @@ GREEN_GLASS = 2 + MAX_LIGHT
 BLUE_GLASS = 3 + MAX_LIGHT
 REGULAR_GLASS = 4 + MAX_LIGHT
 
+NUM_VOXEL_TYPES = REGULAR_GLASS + 1
+
 EMPTY_CHUNK = 0 
 FILLED_CHUNK = 1
+MIXED_CHUNK = 2
 
 PLACE_MINE_DISTANCE = 5
 
@@ -66,5 +90,50 @@ SAVE_NAME = 'Demo' #Enter the file name you want to save to here (or load from i
 
 VIEW_RANGE = 125 #Change the voxel view range (decrease this if potato pc)
 
-ti.init(ti.cpu)
+RENDER_QUALITY = 'Medium' #Possible render qualities are 'Low', 'Medium', and 'High' (the loop bounds are compiled into the ray tracer, so changing this recompiles it)
+RENDER_QUALITY_PRESETS = {
+    'Low': {'maxBounces': 4, 'samplesPerPixel': 1, 'badLightSamples': 4, 'maxRaySteps': VIEW_RANGE // 2, 'neighborhoodSize': 1},
+    'Medium': {'maxBounces': 10, 'samplesPerPixel': 1, 'badLightSamples': 10, 'maxRaySteps': VIEW_RANGE, 'neighborhoodSize': 1},
+    'High': {'maxBounces': 16, 'samplesPerPixel': 4, 'badLightSamples': 16, 'maxRaySteps': VIEW_RANGE, 'neighborhoodSize': 1}
+}
+
+DYNAMIC_RENDER_SCALE = True #Set this to False to always ray trace at the window's resolution (otherwise the resolution drops when frames take longer than the target and the window upsamples it)
+TARGET_FPS = 60 #Frame rate that the dynamic render scale aims for
+MIN_RENDER_SCALE = 0.5 #Lowest fraction of the window's width and height that the dynamic render scale goes down to
+
+INPUT_MODE = None #Set this to 'record' to record the camera and edits to INPUT_RECORDING, or 'replay' to play that recording back (both use a fresh world from the seed that's never saved, so every replay starts from the same world)
+INPUT_RECORDING = 'Recordings/Session.vxin' #File that input is recorded to and replayed from
+REPLAY_TIMESTEP = 1 / 60 #Seconds the camera moves every replayed frame no matter how long the frame took (None moves by the recorded frame times, retracing the recorded camera path exactly)
+
+GENERATION_WORKERS = 1 #Number of processes that generate the world in parallel regions (1 generates in this process)
+
+JIT_WARM_UP = 'background' #How Startup.initialize prepares the Numba kernels before the world needs them: 'background' loads (or compiles) them on a worker thread while the window opens, 'blocking' waits for them, and None leaves it to the first call
+
+RLE_STORAGE = False #Set this to True to store the world as run-length encoded columns (a fraction of the memory of the dense array for slower voxel access)
+
+USE_WORLD_CACHE = False #Set this to True to keep an uncompressed memory mapped copy of the world next to the save for near-instant startup (uses as much disk space as the world array, ignored with RLE_STORAGE)
+
+AUTOSAVE_INTERVAL = 300 #Seconds between background autosaves (None turns autosaving off)
+
+EDIT_JOURNAL = True #Set this to False to stop logging every edit to a journal next to the save (the journal is replayed on load, so edits since the last save survive a crash)
+JOURNAL_FLUSH_INTERVAL = 1 #Seconds between writes of the buffered journal records (at most this much editing is lost in a crash)
+
+STREAMING = False #Set this to True to stream an unbounded world in chunk columns around the camera instead of generating a fixed size world
+STREAM_WINDOW_XZ = 24 #Number of chunk columns kept resident along x and z in streaming mode (the resident memory stays fixed at this window)
+
+LIGHT_CELL_SIZE = 32 #Size in voxels of the light grid cells that direct lighting picks nearby lights from (a divisor of CHUNK_SIZE so the cells line up with the streaming window)
+LIGHT_CELL_CAPACITY = 16 #Most lights listed by a light grid cell (the brightest lights of the cells around it)
+UNIFORM_LIGHT_FRACTION = 0.5 #Fraction of light candidates that are picked uniformly from all the lights (lights outside a cell's list can still be picked so the estimate stays unbiased)
+
+LOD_LEVELS = 3 #Number of downsampled levels of the world's LOD pyramid (level l has cells of 2^l voxels on a side, so 3 gives 2x, 4x and 8x cells)
+LOD_DISTANCE = 32 #Distance in voxels where LOD traversal switches from voxels to the 2x cells (every following level starts where the distance doubles, so a cell never looks bigger than 2 / LOD_DISTANCE radians from the ray's origin)
+
+PROFILER_ENABLED = False #Set this to True to time every frame stage from the start (F3 shows the stage times on screen and turns the profiler on while they're shown, F4 writes them to the profile folder)
+PROFILER_HISTORY = 600 #Number of recent times kept for every profiled stage
+PROFILER_QUERY_LATENCY = 3 #Frames between timing a stage's GPU work and reading the result (so the timer queries never stall the CPU)
+PROFILE_FOLDER = 'Profiles' #Folder that the F4 key writes the profiler's statistics to (as CSV and JSON)
+
+TEXTURE_SIZE = 512 #Size in texels of every block texture face (a power of two; the images are resized to it so that every face fits in one texture array)
+TEXTURE_CACHE_FOLDER = 'Textures/Cache' #Folder that keeps the decoded textures keyed by the hash of their image files (None decodes them every run)
+
 MAX_ANGLE = 89
\ No newline at end of file
@@ -0,0 +1,201 @@
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+STARTUP_IMPORTS = ('numpy', 'glm', 'Settings', 'numba', 'World_Utils', 'PIL.Image', 'moderngl', 'moderngl_window', 'Window_Utils') # In dependency order, so each time only counts what the earlier imports didn't load
+ISOLATED_IMPORTS = ('Window_Utils', 'World_Utils.Profiler') # Imported on their own in a fresh process too, so the imports before them can't hide what they load
+
+warmUpThread = None
+
+class CompileTimer:
+    '''
+    Record how long Numba spends compiling every function (without the functions it compiles while typing it) from Numba's compile events. Functions loaded from the cache don't compile, so they never show up here
+    '''
+    def __init__(self):
+        self.compileTimes, self.stack = {}, []
+
+    def on_start(self, event):
+        self.stack.append([time.perf_counter(), 0.0])
+
+    def on_end(self, event):
+        startTime, childTime = self.stack.pop()
+        compileTime = time.perf_counter() - startTime
+        if self.stack:
+            self.stack[-1][1] += compileTime
+
+        function = event.data['dispatcher'].py_func
+        name = f'{function.__module__}.{function.__qualname__}'
+        self.compileTimes[name] = self.compileTimes.get(name, 0.0) + compileTime - childTime
+
+    def install(self):
+        '''
+        Start listening to Numba's compile events (Numba has to be imported by now)
+        '''
+        from numba.core import event
+        compileTimer = self
+
+        class CompileListener(event.Listener):
+            def on_start(self, event):
+                compileTimer.on_start(event)
+
+            def on_end(self, event):
+                compileTimer.on_end(event)
+
+        event.register('numba:compile', CompileListener())
+
+def warmUpKernels(seed = 0):
+    '''
+    Run every Numba kernel the world calls before the first frame (height map, terrain, chunk summaries, brickmap, and the picking DDA) on a one chunk world with the argument types the world uses, so they're loaded from the cache (or compiled) ahead of time. Returns the time taken by each step
+    '''
+    from Settings import np, CHUNK_SIZE, WORLD_SIZE_Y, RLE_STORAGE
+    from World_Utils import generateHeightMap, generateTerrain, buildElevationBands, fillBlock, ChunkSummary, Brickmap, ColumnRLE, castRays
+
+    stepTimes = {}
+    def timeStep(name, function, *args):
+        startTime = time.perf_counter()
+        result = function(*args)
+        stepTimes[name] = time.perf_counter() - startTime
+        return result
+
+    worldSize = (CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, CHUNK_SIZE)
+    worldArray = np.zeros(worldSize, 'u1')
+
+    heightMap = timeStep('generateHeightMap', generateHeightMap, seed, worldSize[0])
+    timeStep('generateTerrain', generateTerrain, worldArray, heightMap, seed)
+    timeStep('fillBlock', fillBlock, np.zeros(worldSize, 'u1'), heightMap, *buildElevationBands(worldSize[1]), seed, 0, 0)
+
+    chunkSummary = ChunkSummary(worldSize)
+    timeStep('ChunkSummary.build', chunkSummary.build, worldArray)
+    timeStep('ChunkSummary.buildChunk', chunkSummary.buildChunk, worldArray, (0, 0, 0))
+
+    brickmap = Brickmap(worldSize)
+    timeStep('Brickmap.build', brickmap.build, worldArray, chunkSummary.state)
+
+    origins, directions = np.array([(0.5, worldSize[1] - 0.5, 0.5)], np.float64), np.array([(0.3, -0.9, 0.3)], np.float64)
+    timeStep('castRays', castRays, worldArray, brickmap.brickArray, np.zeros(3, np.int64), origins, directions, 5, 125)
+
+    if RLE_STORAGE:
+        timeStep('ColumnRLE', lambda: ColumnRLE.fromDense(worldArray).toDense())
+    return stepTimes
+
+def launchThreadPool():
+    '''
+    Start Numba's parallel thread pool on the calling thread. Numba has no public call for it, so this uses its internal launcher where it exists and otherwise runs a trivial prange kernel, which launches the pool on its first call
+    '''
+    from numba.np.ufunc import parallel
+    if hasattr(parallel, '_launch_threads'):
+        parallel._launch_threads()
+        return
+
+    import numba
+
+    @numba.njit(parallel = True)
+    def sumIndices(count):
+        total = 0
+        for i in numba.prange(count):
+            total += i
+        return total
+
+    sumIndices(numba.get_num_threads())
+
+def importSubsystem(moduleName):
+    '''
+    Import a module, loading every submodule of World_Utils (the package only imports them the first time one of its names is used)
+    '''
+    module = importlib.import_module(moduleName)
+    if moduleName == 'World_Utils':
+        module.loadSubsystem()
+    return module
+
+def measureIsolatedImport(moduleName):
+    '''
+    Import a module in a fresh process. Returns the time the import took and whether it loaded Numba
+    '''
+    code = f'import sys, time; startTime = time.perf_counter(); import {moduleName}; print(time.perf_counter() - startTime, "numba" in sys.modules)'
+    output = subprocess.run([sys.executable, '-c', code], capture_output = True, text = True, check = True).stdout.split()
+    return float(output[-2]), output[-1] == 'True'
+
+def initialize(warmUp = None):
+    '''
+    Explicit startup: import the world (Numba) and window subsystems and prepare the Numba kernels. warmUp is None (compile on first use), 'blocking' (warm up before returning), or 'background' (warm up on a worker thread; call waitForWarmUp before touching the world)
+    '''
+    global warmUpThread
+    importSubsystem('World_Utils')
+    importSubsystem('Window_Utils')
+
+    if warmUp == 'blocking':
+        warmUpKernels()
+    elif warmUp == 'background':
+        launchThreadPool() # On the main thread (the TBB pool hangs the interpreter at exit when a worker thread starts it)
+        warmUpThread = threading.Thread(target = warmUpKernels, name = 'JIT warm-up', daemon = True)
+        warmUpThread.start()
+    elif warmUp is not None:
+        raise ValueError(f"Unknown warm-up mode {warmUp!r} (expected None, 'blocking' or 'background')")
+
+def waitForWarmUp():
+    '''
+    Wait for a background warm-up to finish (parallel kernels mustn't be launched from two threads at once with Numba's workqueue threading layer)
+    '''
+    if warmUpThread is not None:
+        warmUpThread.join()
+
+def reportStartup():
+    '''
+    Import every subsystem in turn and warm up the kernels in a fresh process, printing the time taken by every import, warm-up step and JIT compile. The window subsystem is also imported on its own in another process to check that it doesn't load Numba
+    '''
+    isolatedImports = {moduleName: measureIsolatedImport(moduleName) for moduleName in ISOLATED_IMPORTS}
+
+    importTimes = {}
+    compileTimer = CompileTimer()
+    for moduleName in STARTUP_IMPORTS:
+        startTime = time.perf_counter()
+        importSubsystem(moduleName)
+        importTimes[moduleName] = time.perf_counter() - startTime
+        if moduleName == 'numba':
+            compileTimer.install()
+
+    stepTimes = warmUpKernels()
+
+    import numba
+    cacheHits = set()
+    for module in list(sys.modules.values()):
+        for value in list(getattr(module, '__dict__', {}).values()):
+            if isinstance(value, numba.core.registry.CPUDispatcher) and sum(value.stats.cache_hits.values()):
+                cacheHits.add(f'{value.py_func.__module__}.{value.py_func.__qualname__}')
+
+    print('Imports:')
+    for moduleName, importTime in importTimes.items():
+        print(f'  {moduleName:<24}{importTime:8.3f}s')
+    print(f'  {"total":<24}{sum(importTimes.values()):8.3f}s')
+
+    print('Imports on their own (fresh process):')
+    for moduleName, (importTime, loadedNumba) in isolatedImports.items():
+        print(f'  {moduleName:<24}{importTime:8.3f}s{"  (loaded Numba)" if loadedNumba else ""}')
+
+    print('JIT warm-up steps (cache loads, compiles and the tiny runs):')
+    for name, stepTime in stepTimes.items():
+        print(f'  {name:<24}{stepTime:8.3f}s')
+    print(f'  {"total":<24}{sum(stepTimes.values()):8.3f}s')
+
+    compileTimes = {name: compileTime for name, compileTime in compileTimer.compileTimes.items() if not name.startswith('numba.')}
+    internalTime = sum(compileTimer.compileTimes.values()) - sum(compileTimes.values()) # Numba's own overloads (compiled once per process, never cached)
+
+    print(f'JIT compiles ({len(compileTimes)} functions compiled, {len(cacheHits)} loaded from the cache):')
+    for name, compileTime in sorted(compileTimes.items(), key = lambda item: -item[1]):
+        print(f'  {name:<48}{compileTime:8.3f}s')
+    print(f'  {"Numba internals":<48}{internalTime:8.3f}s')
+    print(f'  {"total":<48}{sum(compileTimer.compileTimes.values()):8.3f}s')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Report where startup time goes: every import, JIT warm-up step and Numba compile')
+    parser.add_argument('--cold-jit', dest = 'coldJit', action = 'store_true', help = 'compile every Numba function from scratch (an empty cache)')
+    arguments = parser.parse_args()
+    if arguments.coldJit:
+        os.environ['NUMBA_CACHE_DIR'] = tempfile.mkdtemp() # Has to be set before Numba is imported
+
+    reportStartup()
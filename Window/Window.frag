@@ -7,11 +7,13 @@ out vec4 fragColor;
 uniform int frameCount;
 uniform sampler2D screen1;
 uniform sampler2D screen2;
+uniform ivec2 renderSize; // Part of the screen textures that the ray tracer rendered (smaller than the window at render scales below 1)
 
 void main(){
+    vec2 renderCoord = clamp(textureCoord * renderSize, vec2(0.5), renderSize - 0.5) / textureSize(screen1, 0); // Upsample the rendered part bilinearly without filtering in the stale texels around it
     if (frameCount % 2 == 0){ // Render with screen 1 if the frameCount is even
-        fragColor = texture(screen1, textureCoord);
+        fragColor = texture(screen1, renderCoord);
     } else {
-        fragColor = texture(screen2, textureCoord);
+        fragColor = texture(screen2, renderCoord);
     }
 }
\ No newline at end of file
@@ -1,7 +1,6 @@
 from Settings import *
 from World_Utils.Ray import Ray #Just for Pylance : ) 
 
-@ti.data_oriented
 class Camera:
     '''
     Class for a moveable pinhole camera. I implemented all the key movement functions myself because it was pretty obvious how to do those things. However, I didn't know the exact math necessary for camera mouse movement so I used https://learnopengl.com/Getting-started/Camera for a reference on the math necessary for camera mouse movement. Any functions that I referenced the website on are explicitly marked.
@@ -57,25 +56,18 @@ class Camera:
         self.calculateLookAt()
     
     @staticmethod
-    @ti.kernel
-    def scaleWithSensitivity(dx: float, mouseSensitivity: float) -> float:
+    def scaleWithSensitivity(dx, mouseSensitivity):
         '''
         Calculate scaled dx depending on mouse sensitivity (referenced website)
         '''
         return dx * mouseSensitivity
     
     @staticmethod
-    @ti.kernel
-    def constrainPitch(pitch: float, MAX_ANGLE: int) -> float:
+    def constrainPitch(pitch, MAX_ANGLE):
         '''
         Constrain the pitch to be between 89 and -89 to avoid any shenanigans with the camera rotation inverting the view (referenced website) 
         '''
-        newPitch = pitch
-        if newPitch > MAX_ANGLE: 
-            newPitch = MAX_ANGLE 
-        elif newPitch < -MAX_ANGLE:
-            newPitch = -MAX_ANGLE
-        return newPitch
+        return min(max(pitch, -MAX_ANGLE), MAX_ANGLE)
     
     def updateMouse(self, dx, dy):
         '''
@@ -95,8 +87,7 @@ class Camera:
         self.lookAt = self.cameraPosition - self.k
 
     @staticmethod
-    @ti.kernel
-    def taichiCalculateViewportWidth(viewportHeight: float, imageWidth: float, imageHeight: float) -> float:
+    def getViewportWidth(viewportHeight, imageWidth, imageHeight):
         '''
         Calculate the viewport width by multiplying the viewport height by the same ratio of the imageWidth / imageHeight 
         '''
@@ -106,7 +97,7 @@ class Camera:
         '''
         Calculate the viewport width
         '''
-        self.viewportWidth = self.taichiCalculateViewportWidth(self.viewportHeight, self.app.window_size[0], self.app.window_size[1])
+        self.viewportWidth = self.getViewportWidth(self.viewportHeight, self.app.window_size[0], self.app.window_size[1])
 
     def calculateViewportHeight(self):
         '''
@@ -124,10 +115,10 @@ class Camera:
 
     def calculatePixelDelta(self):
         '''
-        Calculate the camera's pixel delta values (or the horizontal / vertical distance between screen pixels on the camera)
+        Calculate the camera's pixel delta values (or the horizontal / vertical distance between screen pixels on the camera). The ray tracer's pixels span the whole viewport at any render scale, so they're bigger than the window's pixels below a scale of 1
         '''
-        self.pixelDX = self.viewportWidthVector / self.app.window_size[0]
-        self.pixelDY = self.viewportHeightVector / self.app.window_size[1]
+        self.pixelDX = self.viewportWidthVector / self.app.renderSize[0]
+        self.pixelDY = self.viewportHeightVector / self.app.renderSize[1]
 
     def calculateFirstPixelPos(self):
         '''
@@ -137,8 +128,7 @@ class Camera:
         self.initPixelPos = viewportBottomLeft + (self.pixelDX + self.pixelDY) / 2
 
     @staticmethod
-    @ti.kernel 
-    def calculateIsMovingHelper(dirX: int, dirY: int, dirZ: int, prevPitch: float, pitch: float, prevYaw: float, yaw: float) -> bool:
+    def calculateIsMovingHelper(dirX, dirY, dirZ, prevPitch, pitch, prevYaw, yaw):
         '''
         Calculates whether the camera is moving
         '''
@@ -162,6 +152,8 @@ class Camera:
         '''
         Assign each of the render values to the uniform input struct in the camera for the ray tracing compute shader
         '''
+        if self.rayTracer is None: # Headless (replays and the CPU path tracer)
+            return
         self.rayTracer['camera.position'] = self.cameraPosition
         self.rayTracer['camera.pixelDX'] = self.pixelDX 
         self.rayTracer['camera.pixelDY'] = self.pixelDY 
@@ -192,7 +184,8 @@ class Camera:
         '''
         Assign each of the render values for the previous camera in the prevCamera struct for the ray tracing compute shader with TAA
         '''
-        self.rayTracer['prevViewProj'].write(self.calculateProjMat() * self.calculateViewMat())
+        if self.rayTracer is not None:
+            self.rayTracer['prevViewProj'].write(self.calculateProjMat() * self.calculateViewMat())
         self.prevYaw, self.prevPitch = self.yaw, self.pitch 
 
     @staticmethod 
@@ -0,0 +1,157 @@
+from Settings import *
+import struct
+
+INPUT_MAGIC = b'VXIN'
+INPUT_VERSION = 1
+INPUT_BATCH_SIZE = 4096 # Records buffered before they're written
+
+# Magic, version, seed, world size (x, y, z), camera position, yaw, pitch, speed, fov, mouse sensitivity (doubles like the camera keeps them, so the replay starts from exactly the same state)
+INPUT_HEADER = struct.Struct('<4sIq3I3f5d')
+
+INPUT_EVENT_DTYPE = np.dtype([
+    ('type', 'u1'),
+    ('padding', 'u1', 3),
+    ('values', '<f4', 7)
+])
+
+EVENT_FRAME = 0 # Frame time, movement directions (x, y, z) and movingDown (the movement keys held during the frame)
+EVENT_CAMERA = 1 # Camera position, yaw and pitch after the frame's camera update (to check a replay against)
+EVENT_MOUSE = 2 # Mouse movement (dx, dy) as passed to Camera.updateMouse
+EVENT_REMOVE = 3 # Left click (remove the voxel the camera looks at)
+EVENT_PLACE = 4 # Right click (place a voxel against the one the camera looks at)
+EVENT_SELECT = 5 # Number key (index of the selected voxel)
+
+def getCameraState(camera):
+    return (*camera.cameraPosition, camera.yaw, camera.pitch)
+
+class InputRecorder:
+    '''
+    Record a session's input (the movement keys and frame time of every frame, mouse movement, clicks and voxel selection) and the camera's state after every frame to a binary file of fixed width records. The header keeps the world's seed and size and the camera's starting state, so a replay can start from the same world
+    '''
+    def __init__(self, filePath, world, camera):
+        os.makedirs(os.path.dirname(filePath) or '.', exist_ok = True)
+        self.file = open(filePath, 'wb')
+        self.file.write(INPUT_HEADER.pack(INPUT_MAGIC, INPUT_VERSION, -1 if world.seed is None else int(world.seed), *world.worldSize, *getCameraState(camera), camera.cameraSpeed, camera.fov, camera.mouseSensitivity))
+        self.buffer = [] # Records as tuples (turned into one array when they're written)
+        self.numFrames = 0
+
+    def record(self, eventType, *values):
+        self.buffer.append((eventType, (0, 0, 0), values + (0,) * (7 - len(values))))
+        if len(self.buffer) == INPUT_BATCH_SIZE:
+            self.flush()
+
+    def recordFrame(self, frameTime, camera):
+        '''
+        Record the frame time and the movement keys of a frame (before the camera moves). Returns the frame time rounded like it's stored, which is what the camera has to move by for a replay at the recorded frame times to retrace it exactly
+        '''
+        frameTime = float(np.float32(frameTime))
+        self.record(EVENT_FRAME, frameTime, camera.dirX, camera.dirY, camera.dirZ, camera.movingDown)
+        self.numFrames += 1
+        return frameTime
+
+    def recordCamera(self, camera):
+        '''
+        Record the camera's state after a frame's camera update
+        '''
+        self.record(EVENT_CAMERA, *getCameraState(camera))
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(np.array(self.buffer, INPUT_EVENT_DTYPE).tobytes())
+            self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+class InputRecording:
+    '''
+    A recorded session read back from its file
+    '''
+    def __init__(self, filePath):
+        with open(filePath, 'rb') as file:
+            magic, version, seed, sizeX, sizeY, sizeZ, *cameraValues = INPUT_HEADER.unpack(file.read(INPUT_HEADER.size))
+            if magic != INPUT_MAGIC or version != INPUT_VERSION:
+                raise RuntimeError(f'{filePath} is not an input recording (or has version {version} instead of {INPUT_VERSION})')
+            data = file.read()
+
+        self.seed, self.worldSize = None if seed < 0 else seed, (sizeX, sizeY, sizeZ)
+        self.cameraPosition, (self.yaw, self.pitch, self.cameraSpeed, self.fov, self.mouseSensitivity) = glm.vec3(*cameraValues[:3]), cameraValues[3:]
+        self.events = np.frombuffer(data[:len(data) // INPUT_EVENT_DTYPE.itemsize * INPUT_EVENT_DTYPE.itemsize], INPUT_EVENT_DTYPE)
+        self.numFrames = int(np.count_nonzero(self.events['type'] == EVENT_FRAME))
+
+    def resetCamera(self, camera):
+        '''
+        Put a camera in the recording's starting state
+        '''
+        camera.cameraPosition = glm.vec3(self.cameraPosition)
+        camera.yaw, camera.pitch = self.yaw, self.pitch
+        camera.prevYaw, camera.prevPitch = self.yaw, self.pitch
+        camera.cameraSpeed, camera.fov, camera.mouseSensitivity = self.cameraSpeed, self.fov, self.mouseSensitivity
+        camera.calculateUnitVectors()
+        camera.calculateLookAt()
+
+class InputPlayer:
+    '''
+    Feed a recording back into a camera and world one frame at a time, independent of the wall clock. Every frame moves the camera by a fixed timestep (or by the recorded frame time when timestep is None, which retraces the recorded camera path exactly), so replaying a recording always gives the same camera path and world
+    '''
+    def __init__(self, recording, timestep = REPLAY_TIMESTEP):
+        self.recording, self.timestep = recording, timestep
+        self.eventIndex, self.frame = 0, 0
+        self.cameraMismatches = 0 # Frames whose camera state differed from the recording (only expected with a fixed timestep)
+
+    def isFinished(self):
+        return self.eventIndex >= len(self.recording.events)
+
+    def applyEvent(self, event, camera, world):
+        eventType, values = int(event['type']), event['values'].tolist()
+        if eventType == EVENT_CAMERA:
+            self.cameraMismatches += not np.array_equal(np.array(getCameraState(camera), np.float32), event['values'][:5])
+        elif eventType == EVENT_MOUSE:
+            camera.updateMouse(values[0], values[1])
+        elif eventType == EVENT_REMOVE:
+            mapPos, _ = world.rayMarch(camera.getCameraCenterRay(), PLACE_MINE_DISTANCE)
+            world.removeVoxel(mapPos)
+        elif eventType == EVENT_PLACE:
+            mapPos, normal = world.rayMarch(camera.getCameraCenterRay(), PLACE_MINE_DISTANCE)
+            world.placeVoxel(mapPos, normal)
+        elif eventType == EVENT_SELECT:
+            world.setVoxel(int(values[0]))
+
+    def step(self, camera, world):
+        '''
+        Apply the events up to and including the next frame's movement keys. Returns the time to move the camera by this frame (None once the recording is over)
+        '''
+        events = self.recording.events
+        while self.eventIndex < len(events):
+            event = events[self.eventIndex]
+            self.eventIndex += 1
+            if event['type'] != EVENT_FRAME:
+                self.applyEvent(event, camera, world)
+                continue
+
+            values = event['values'].tolist()
+            camera.dirX, camera.dirY, camera.dirZ, camera.movingDown = (int(value) for value in values[1:5])
+            self.frame += 1
+            return values[0] if self.timestep is None else self.timestep
+
+        return None
+
+def replayHeadless(recording, world, camera, timestep = REPLAY_TIMESTEP):
+    '''
+    Replay a recording on a world and camera without a window (the camera's app needs no ray tracer). Returns the camera state after every frame (a (frames, 5) array) and the time every frame's input and world updates took
+    '''
+    recording.resetCamera(camera)
+    player = InputPlayer(recording, timestep)
+    cameraPath, frameTimes = [], []
+    while True:
+        startTime = time.perf_counter()
+        cameraTime = player.step(camera, world)
+        if cameraTime is None:
+            break
+        camera.render(cameraTime)
+        world.updateStreaming()
+        camera.assignPrevRenderValues()
+        frameTimes.append(time.perf_counter() - startTime)
+        cameraPath.append(getCameraState(camera))
+    return np.array(cameraPath, np.float32).reshape(-1, 5), np.array(frameTimes), player
@@ -1,4 +1,5 @@
 from Settings import *
+from ShaderPreprocessor import ShaderPreprocessor
 
 def loadVertexAndFrag(folder, vertexFileName, fragmentFileName):
     '''
@@ -10,28 +11,28 @@ def loadVertexAndFrag(folder, vertexFileName, fragmentFileName):
         fragmentShader = file.read()
     return vertexShader, fragmentShader
 
-def addImports(ctx, folder, shader):
-    '''
-    Add the imports from the '#include' statements in the shader into the context for easy use.
-    '''
-    for line in shader.splitlines():
-        if not line.startswith('#include'):
-            continue 
-            
-        importFileName = line[len('#include') + 1:].strip()[1:-1] #Get rid of the quotation marks
-        try: 
-            with open(f'{folder}/{importFileName}.comp', 'r') as file:
-                importShader = file.read().strip() #Text that is the shader that is imported
-            ctx.includes[importFileName] = importShader #Add this text for the shader that is imported to the context
-        except:
-            raise RuntimeError('This file does not exist')
-        
-def loadComputeShader(ctx, folder, shader):
-    '''
-    Load whatever compute shader along with the other compute shaders included in the file statement to allow for cleaner abstractions.
-    '''
-    with open(f'{folder}/{shader}.comp', 'r') as file:
-        rayTracer = file.read().strip()
+shaderPreprocessors = {} # Folder to its preprocessor, so the files and expanded shaders stay cached between loads
 
-    addImports(ctx, folder, rayTracer)
-    return rayTracer 
\ No newline at end of file
+def getShaderPreprocessor(folder):
+    '''
+    Get the shader preprocessor of a folder of compute shaders
+    '''
+    if folder not in shaderPreprocessors:
+        shaderPreprocessors[folder] = ShaderPreprocessor(folder)
+    return shaderPreprocessors[folder]
+
+def loadComputeShader(folder, shader, defines = None):
+    '''
+    Load whatever compute shader with the other compute shaders it includes (through as many levels of '#include' as needed) expanded into it, specialized with the defines
+    '''
+    return getShaderPreprocessor(folder).expand(shader, defines)
+
+def compileComputeShader(ctx, folder, shader, defines = None):
+    '''
+    Compile a compute shader, pointing the errors at the file and line they're in rather than the line of the expanded source
+    '''
+    source = loadComputeShader(folder, shader, defines)
+    try:
+        return ctx.compute_shader(source)
+    except mgl.Error as error:
+        raise RuntimeError(getShaderPreprocessor(folder).mapErrors(str(error))) from None
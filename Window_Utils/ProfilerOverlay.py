@@ -0,0 +1,41 @@
+from Settings import *
+import importlib
+
+class ProfilerOverlay:
+    '''
+    Draw the profiler's statistics (mean, median and 99th percentile of every stage) as text in the top left corner of the window. The text is only rebuilt every refresh interval so the numbers stay readable
+    '''
+    def __init__(self, app, profiler, size = 16, refreshInterval = 0.25):
+        self.app, self.ctx, self.profiler = app, app.ctx, profiler
+        self.size, self.refreshInterval = size, refreshInterval
+
+        self.textWriterClass = importlib.import_module('moderngl_window.text.bitmapped').TextWriter2D # Only loaded (with its font) the first time the overlay is shown
+        self.textWriters = []
+        self.lastRefreshTime = -math.inf
+
+    def refresh(self):
+        '''
+        Write the current statistics into one text writer per line
+        '''
+        lines = self.profiler.formatLines()
+        while len(self.textWriters) < len(lines):
+            self.textWriters.append(self.textWriterClass())
+        for textWriter, line in zip(self.textWriters, lines):
+            textWriter.text = line
+        self.numLines = len(lines)
+        self.lastRefreshTime = time.perf_counter()
+
+    def render(self):
+        '''
+        Render the statistics on top of the screen (the text writer binds its font to texture unit 0, so the screen texture has to be bound again afterwards)
+        '''
+        if time.perf_counter() - self.lastRefreshTime >= self.refreshInterval:
+            self.refresh()
+
+        self.ctx.enable(mgl.BLEND)
+        self.ctx.disable(mgl.CULL_FACE)
+        windowHeight = self.ctx.fbo.viewport[3]
+        for line, textWriter in enumerate(self.textWriters[:self.numLines]):
+            textWriter.draw((self.size / 2, windowHeight - (line + 1) * self.size * 1.25), size = self.size)
+        self.ctx.enable(mgl.CULL_FACE)
+        self.ctx.disable(mgl.BLEND)
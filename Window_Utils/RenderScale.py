@@ -0,0 +1,60 @@
+import math
+
+def getRenderSize(windowSize, renderScale):
+    '''
+    Get the size in pixels of the part of the screen textures that the ray tracer renders at a render scale
+    '''
+    return tuple(max(1, round(size * renderScale)) for size in windowSize)
+
+class RenderScaleController:
+    '''
+    Pick the render scale (fraction of the window's width and height that gets ray traced) that meets a target frame time. It's a PI controller on the log of the scale against the log of the smoothed frame time (the ray tracer's cost goes with the number of pixels, so halving the frame time takes the scale down by a factor of sqrt 2). Errors inside the deadband leave the scale alone and the scale moves in steps, so noisy frame times don't make the resolution wander
+    '''
+    def __init__(self, targetFrameTime, minScale = 0.5, maxScale = 1.0, proportionalGain = 0.1, integralGain = 0.15, deadband = 0.1, smoothing = 0.2, step = 1 / 32, hysteresis = 1.0, warmUpFrames = 10):
+        if not 0 < minScale <= maxScale:
+            raise ValueError(f'The render scale range [{minScale}, {maxScale}] is empty or not positive')
+        self.targetFrameTime, self.minScale, self.maxScale = targetFrameTime, minScale, maxScale
+        self.proportionalGain, self.integralGain, self.deadband = proportionalGain, integralGain, deadband
+        self.smoothing, self.step, self.hysteresis, self.warmUpFrames = smoothing, step, hysteresis, warmUpFrames
+        self.reset()
+
+    def reset(self, scale = None):
+        '''
+        Start over from a scale (the maximum scale by default), forgetting the frame time history
+        '''
+        self.logScale = math.log(self.maxScale if scale is None else min(max(scale, self.minScale), self.maxScale))
+        self.scale = self.quantize(self.logScale)
+        self.smoothedFrameTime, self.prevError, self.numFrames = None, 0.0, 0
+
+    def quantize(self, logScale):
+        '''
+        Round a log scale to the nearest step inside the scale range
+        '''
+        return min(max(round(math.exp(logScale) / self.step) * self.step, self.minScale), self.maxScale)
+
+    def update(self, frameTime):
+        '''
+        Feed in the time the last frame took and get the render scale for the next frame
+        '''
+        self.numFrames += 1
+        if self.numFrames <= self.warmUpFrames or frameTime <= 0: # The first frames include compiling and uploading everything
+            return self.scale
+
+        frameTime = min(frameTime, 4 * self.targetFrameTime) # One hitch (like a save) shouldn't drop the resolution on its own
+        if self.smoothedFrameTime is None:
+            self.smoothedFrameTime = frameTime
+        else:
+            self.smoothedFrameTime += self.smoothing * (frameTime - self.smoothedFrameTime)
+
+        error = math.log(self.targetFrameTime / self.smoothedFrameTime) / 2 # Log scale change that would meet the target if the frame time only depended on the number of pixels
+        if abs(error) < self.deadband / 2:
+            error = 0.0
+
+        self.logScale += self.proportionalGain * (error - self.prevError) + self.integralGain * error
+        self.logScale = min(max(self.logScale, math.log(self.minScale)), math.log(self.maxScale)) # The integral doesn't wind up against the limits
+        self.prevError = error
+
+        scale = self.quantize(self.logScale)
+        if scale in (self.minScale, self.maxScale) or abs(math.exp(self.logScale) - self.scale) > self.hysteresis * self.step: # Only leave the current step once the scale is well into the next one (or reaches a limit)
+            self.scale = scale
+        return self.scale
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import re
+
+INCLUDE_PATTERN = re.compile(r'^\s*#include\s+"([^"]+)"')
+VERSION_PATTERN = re.compile(r'^\s*#version\b')
+DEFINE_NAME_PATTERN = re.compile(r'^[A-Za-z_]\w*$')
+ERROR_LOCATION_PATTERN = re.compile(r'(?<![\w.])(\d+)([:(])(\d+)\)?') # Driver error locations: 0(12) on NVIDIA and 0:12 on Mesa and AMD
+
+class ShaderPreprocessor:
+    '''
+    Expand the '#include "Name"' statements of the shaders in a folder (nested includes too, each file only once per shader and include cycles raise an error), inject '#define's from a specialization dictionary right after '#version', and emit '#line' statements so that the driver's error messages point at the right line of the right file (mapErrors turns them back into file names). Files are only re-read when they change on disk, and the expanded source is cached by a hash of the content of every file in it and the defines. Nothing here needs an OpenGL context
+    '''
+    def __init__(self, folder, extension = '.comp'):
+        self.folder, self.extension = folder, extension
+        self.files = {} # Path to (modification time, size, text, content hash)
+        self.dependencies = {} # (shader name, defines) to the paths of the last expansion
+        self.expansions = {} # Content hash of the files and defines to (expanded source, source names)
+        self.sourceNames = []
+
+    def getPath(self, name):
+        return os.path.join(self.folder, f'{name}{self.extension}')
+
+    def readFile(self, path):
+        '''
+        Get the text and content hash of a file (only read again when its modification time or size changed)
+        '''
+        try:
+            fileStat = os.stat(path)
+        except FileNotFoundError:
+            raise RuntimeError(f'The shader file {path} does not exist') from None
+
+        cached = self.files.get(path)
+        if cached is None or cached[:2] != (fileStat.st_mtime_ns, fileStat.st_size):
+            with open(path, 'r') as file:
+                text = file.read()
+            cached = (fileStat.st_mtime_ns, fileStat.st_size, text, hashlib.sha256(text.encode()).hexdigest())
+            self.files[path] = cached
+        return cached[2], cached[3]
+
+    @staticmethod
+    def formatDefines(defines):
+        '''
+        Turn a specialization dictionary into '#define' lines (bools become true and false, everything else its string form)
+        '''
+        lines = []
+        for name, value in defines.items():
+            if not DEFINE_NAME_PATTERN.match(name):
+                raise ValueError(f'{name!r} is not a valid preprocessor name')
+            if isinstance(value, bool):
+                value = 'true' if value else 'false'
+            lines.append(f'#define {name} {value}')
+        return lines
+
+    def getCacheKey(self, paths, defineLines):
+        contentHash = hashlib.sha256()
+        for path in paths:
+            contentHash.update(path.encode() + b'\0' + self.readFile(path)[1].encode() + b'\0')
+        for line in defineLines:
+            contentHash.update(line.encode() + b'\n')
+        return contentHash.hexdigest()
+
+    def expandFile(self, name, lines, sourceNames, includeStack, included):
+        '''
+        Append a file to the expanded lines with its includes replaced by their expanded files, switching the line numbers (and source string number) around every include
+        '''
+        if name in includeStack:
+            raise RuntimeError(f'Include cycle: {" -> ".join(includeStack + [name])}')
+
+        path = self.getPath(name)
+        text, _ = self.readFile(path)
+        included.append(path)
+        sourceNumber = len(sourceNames)
+        sourceNames.append(f'{name}{self.extension}')
+        if includeStack: # The shader itself starts at line 1 of source string 0 anyway (and '#version' has to come first)
+            lines.append(f'#line 1 {sourceNumber}')
+
+        for lineNumber, line in enumerate(text.splitlines(), 1):
+            includeMatch = INCLUDE_PATTERN.match(line)
+            if includeMatch is None:
+                lines.append(line)
+                continue
+
+            includeName = includeMatch.group(1)
+            if self.getPath(includeName) not in included or includeName in includeStack + [name]: # Files are only included once, but a cycle still has to be caught
+                self.expandFile(includeName, lines, sourceNames, includeStack + [name], included)
+            lines.append(f'#line {lineNumber + 1} {sourceNumber}')
+
+    def expand(self, name, defines = None):
+        '''
+        Get the expanded source of a shader, specialized with the defines. Returns the cached source when none of the files in it changed
+        '''
+        defineLines = self.formatDefines(defines or {})
+        dependencyKey = (name, tuple(defineLines))
+        if dependencyKey in self.dependencies:
+            cached = self.expansions.get(self.getCacheKey(self.dependencies[dependencyKey], defineLines))
+            if cached is not None:
+                self.sourceNames = cached[1]
+                return cached[0]
+
+        lines, sourceNames, included = [], [], []
+        self.expandFile(name, lines, sourceNames, [], included)
+
+        versionIndex = next((i for i, line in enumerate(lines) if VERSION_PATTERN.match(line)), None) # #version has to stay first, so the defines go right after it
+        if versionIndex is None:
+            lines[0:0] = defineLines + ['#line 1 0']
+        else:
+            lines[versionIndex + 1:versionIndex + 1] = defineLines + [f'#line {versionIndex + 2} 0']
+        source = '\n'.join(lines) + '\n'
+
+        self.dependencies[dependencyKey] = included
+        self.expansions[self.getCacheKey(included, defineLines)] = (source, sourceNames)
+        self.sourceNames = sourceNames
+        return source
+
+    def mapErrors(self, message, sourceNames = None):
+        '''
+        Replace the source string numbers in a driver's error message with the file names of the last expanded shader
+        '''
+        sourceNames = self.sourceNames if sourceNames is None else sourceNames
+        def replace(locationMatch):
+            sourceNumber, lineNumber = int(locationMatch.group(1)), locationMatch.group(3)
+            if sourceNumber >= len(sourceNames):
+                return locationMatch.group(0)
+            return f'{sourceNames[sourceNumber]}:{lineNumber}'
+        return ERROR_LOCATION_PATTERN.sub(replace, message)
@@ -7,4 +7,7 @@ sys.path.append(os.path.join(WORKING_DIR, 'Window_Utils'))
 from Camera import *
 from Crosshair import *
 from Loader import *
-from Cube import * 
\ No newline at end of file
+from Cube import *
+from ProfilerOverlay import *
+from RenderScale import *
+from InputRecording import * 
\ No newline at end of file
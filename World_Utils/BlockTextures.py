@@ -0,0 +1,135 @@
+from Settings import *
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+
+TEXTURE_FACES = {'Grass': ('Side', 'Side', 'Top', 'Bot', 'Side', 'Side')} # Textures with a different image per face (the rest use one image for all 6) in OpenGL's cube map face order (+x, -x, +y, -y, +z, -z)
+TEXTURE_NAMES = ('Grass', 'Dirt', 'Stone', 'Sand', 'Snow', 'Clay', 'Wood') # In the order of their texture IDs
+TEXTURE_CACHE_VERSION = 1 # Bump this when the decoding changes so old cache files are ignored
+
+def findTextureFile(fileName, folder = 'Textures'):
+    '''
+    Get the path of a texture image (JPEG or PNG)
+    '''
+    for extension in ('jpg', 'png'):
+        filePath = f'{folder}/{fileName}.{extension}'
+        if os.path.isfile(filePath):
+            return filePath
+    raise RuntimeError(f'The texture {fileName} does not exist!')
+
+def getMipSizes(size):
+    '''
+    Get the sizes of every mip level of a face down to 1 x 1
+    '''
+    sizes = [size]
+    while sizes[-1] > 1:
+        sizes.append(sizes[-1] // 2)
+    return sizes
+
+def buildMipLevels(image):
+    '''
+    Build the mip chain of an 8 bit (size, size, 3) image by averaging every 2 x 2 block of texels (rounded), which is what the driver does for 8 bit textures
+    '''
+    levels = [image]
+    while levels[-1].shape[0] > 1:
+        level = levels[-1].astype(np.uint16)
+        level = (level[0::2, 0::2] + level[1::2, 0::2] + level[0::2, 1::2] + level[1::2, 1::2] + 2) // 4
+        levels.append(level.astype(np.uint8))
+    return levels
+
+def hashFile(filePath):
+    with open(filePath, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def decodeTexture(filePath, fileHash, size, cacheFolder = None):
+    '''
+    Decode a texture image into its 8 bit mip chain at size x size. The chain is kept in the cache folder under the hash of the image file, so an image is only decoded again when it changes
+    '''
+    cachePath = None if cacheFolder is None else f'{cacheFolder}/{fileHash}-{size}-v{TEXTURE_CACHE_VERSION}.npy'
+    mipSizes = getMipSizes(size)
+    if cachePath is not None and os.path.isfile(cachePath):
+        texels = np.load(cachePath)
+        levels, start = [], 0
+        for mipSize in mipSizes:
+            levels.append(texels[start:start + mipSize * mipSize * 3].reshape(mipSize, mipSize, 3))
+            start += mipSize * mipSize * 3
+        return levels
+
+    image = Image.open(filePath).convert('RGB')
+    if image.size != (size, size):
+        image = image.resize((size, size), Image.LANCZOS)
+    levels = buildMipLevels(np.asarray(image, np.uint8))
+
+    if cachePath is not None:
+        os.makedirs(cacheFolder, exist_ok = True)
+        temporaryPath = f'{cachePath}.{os.getpid()}.tmp.npy' # Written next to the cache file first so an interrupted write never leaves a broken cache file
+        np.save(temporaryPath, np.concatenate([level.ravel() for level in levels]))
+        os.replace(temporaryPath, cachePath)
+    return levels
+
+class BlockTextures:
+    '''
+    Every block texture as one contiguous array of 8 bit sRGB faces (layer textureIndex * 6 + face) with its mip chain. The images are decoded on a thread pool (every distinct image only once, even when several faces or files share it) and the decoded chains are cached on disk by the hash of the image files. The GPU copy is one texture array, so the ray tracer samples any block texture through one sampler
+    '''
+    def __init__(self, names = TEXTURE_NAMES, size = TEXTURE_SIZE, folder = 'Textures', cacheFolder = TEXTURE_CACHE_FOLDER):
+        if size & (size - 1):
+            raise ValueError(f'The texture size {size} is not a power of two')
+        self.names, self.size, self.folder, self.cacheFolder = tuple(names), size, folder, cacheFolder
+        self.levels = None # (layers, mip size, mip size, 3) uint8 per mip level
+        self.texture = None
+
+    def getFaceFiles(self):
+        '''
+        Get the image file of every face in layer order
+        '''
+        faceFiles = []
+        for name in self.names:
+            if name in TEXTURE_FACES:
+                faceFiles += [findTextureFile(f'{name} {side}', self.folder) for side in TEXTURE_FACES[name]]
+            else:
+                faceFiles += [findTextureFile(name, self.folder)] * 6
+        return faceFiles
+
+    def load(self, workers = None):
+        '''
+        Decode every image file (in parallel) and lay the faces out in one array per mip level. Returns self
+        '''
+        faceFiles = self.getFaceFiles()
+        fileHashes = {filePath: hashFile(filePath) for filePath in dict.fromkeys(faceFiles)}
+        uniqueImages = {fileHash: filePath for filePath, fileHash in fileHashes.items()} # Files with the same content (like Dirt and Grass Bot) are decoded once
+
+        Image.init() # Finish the lazy import of Pillow and register its image plugins before the threads decode with it
+        with ThreadPoolExecutor(workers) as executor: # Pillow releases the GIL while it decodes and resizes
+            decodedImages = dict(zip(uniqueImages, executor.map(lambda item: decodeTexture(item[1], item[0], self.size, self.cacheFolder), uniqueImages.items())))
+
+        self.levels = []
+        for level, mipSize in enumerate(getMipSizes(self.size)):
+            levelArray = np.empty((len(faceFiles), mipSize, mipSize, 3), np.uint8)
+            for layer, filePath in enumerate(faceFiles):
+                levelArray[layer] = decodedImages[fileHashes[filePath]][level]
+            self.levels.append(levelArray)
+        return self
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels)
+
+    def getFaces(self, size):
+        '''
+        Get the faces at a mip level size as floats from 0 to 1 in a (textures, 6, size, size, 3) array for the CPU path tracer
+        '''
+        mipSizes = getMipSizes(self.size)
+        if size not in mipSizes:
+            raise ValueError(f'{size} is not a mip level size of {self.size} x {self.size} textures')
+        return (self.levels[mipSizes.index(size)].astype('f4') / 255).reshape(len(self.names), 6, size, size, 3)
+
+    def upload(self, ctx, location = 2):
+        '''
+        Upload the faces to one texture array and bind it to a texture unit. moderngl can't write single mip levels of texture arrays, so the driver builds the chain from the 8 bit base level (with the same 2 x 2 average)
+        '''
+        if self.texture is not None:
+            self.texture.release()
+        self.texture = ctx.texture_array((self.size, self.size, len(self.levels[0])), 3, self.levels[0], dtype = 'f1')
+        self.texture.repeat_x, self.texture.repeat_y = False, False # Faces are separate images, so never filter across their edges
+        self.texture.build_mipmaps()
+        self.texture.use(location)
+        return self.texture
@@ -0,0 +1,112 @@
+from Settings import *
+from numba import prange
+from DDA import *
+from DirtyRegions import *
+from ColumnRLE import *
+
+@njit(parallel = True, cache = True)
+def buildBrickmap(worldArray, chunkState, brickArray):
+    '''
+    Mark every brick that holds at least one solid voxel (bricks in empty chunks are skipped without reading the world array)
+    '''
+    bricksPerChunk = CHUNK_SIZE // BRICK_SIZE
+    for brickX in prange(brickArray.shape[X_INDEX]):
+        for brickY in range(brickArray.shape[Y_INDEX]):
+            for brickZ in range(brickArray.shape[Z_INDEX]):
+                brickArray[brickX, brickY, brickZ] = EMPTY_VOXEL
+                if chunkState[brickX // bricksPerChunk, brickY // bricksPerChunk, brickZ // bricksPerChunk] == EMPTY_CHUNK:
+                    continue
+
+                initX, initY, initZ = brickX * BRICK_SIZE, brickY * BRICK_SIZE, brickZ * BRICK_SIZE
+                brickArray[brickX, brickY, brickZ] = np.any(worldArray[initX:initX + BRICK_SIZE, initY:initY + BRICK_SIZE, initZ:initZ + BRICK_SIZE] != EMPTY_VOXEL)
+
+@njit(parallel = True, cache = True)
+def findTraversalMismatches(worldArray, brickArray, origins, directions, maxDistance, maxSteps):
+    '''
+    Trace every ray with both the dense DDA and the brick DDA and return a flag per ray for whether they disagree (hit, map position, normal, or distance) along with the steps each of them took. This allows the brickmap traversal to be verified without a GPU
+    '''
+    numRays = origins.shape[0]
+    mismatches = np.zeros(numRays, np.bool_)
+    denseSteps, brickSteps = np.zeros(numRays, np.int64), np.zeros(numRays, np.int64)
+
+    for i in prange(numRays):
+        denseHit, denseMapPos, denseNormal, denseT, denseSteps[i] = denseTraversal(worldArray, origins[i], directions[i], maxDistance, maxSteps)
+        brickHit, brickMapPos, brickNormal, brickT, brickSteps[i] = brickTraversal(worldArray, brickArray, origins[i], directions[i], maxDistance, maxSteps)
+
+        if denseHit != brickHit:
+            mismatches[i] = True
+        elif denseHit:
+            mismatches[i] = np.any(denseMapPos != brickMapPos) or np.any(denseNormal != brickNormal) or denseT != brickT
+
+    return mismatches, denseSteps, brickSteps
+
+class Brickmap:
+    '''
+    Coarse occupancy grid of BRICK_SIZE^3 bricks over the world so that the DDA can skip empty bricks in one step. It's bound next to the world image for the ray tracing compute shader
+    '''
+    def __init__(self, worldSize):
+        self.numBricks = tuple(int(size) // BRICK_SIZE for size in worldSize)
+        self.brickArray = np.zeros(self.numBricks, 'u1')
+        self.dirtyBricks = DirtyRegions(self.numBricks, 1)
+        self.texture = None
+
+    def build(self, worldArray, chunkState):
+        '''
+        Build the brick occupancy from the world array (a column RLE world is built one decoded slab of chunks at a time)
+        '''
+        if isColumnRLE(worldArray):
+            bricksPerChunk = CHUNK_SIZE // BRICK_SIZE
+            for xStart, slab in worldArray.iterSlabs():
+                chunkX = xStart // CHUNK_SIZE
+                buildBrickmap(slab, chunkState[chunkX:chunkX + 1], self.brickArray[chunkX * bricksPerChunk:(chunkX + 1) * bricksPerChunk])
+        else:
+            buildBrickmap(worldArray, chunkState, self.brickArray)
+        if self.texture is not None:
+            self.texture.write(self.brickArray)
+
+    def update(self, worldArray, mapPos, voxelID):
+        '''
+        Update the brick holding a map position after a voxel is written (only an emptied voxel needs to rescan its brick)
+        '''
+        brickPos = tuple(int(mapPos[axis]) // BRICK_SIZE for axis in range(3))
+        if voxelID != EMPTY_VOXEL:
+            isFilled = True
+        else:
+            initX, initY, initZ = (brickPos[axis] * BRICK_SIZE for axis in range(3))
+            isFilled = np.any(worldArray[initX:initX + BRICK_SIZE, initY:initY + BRICK_SIZE, initZ:initZ + BRICK_SIZE] != EMPTY_VOXEL)
+
+        if bool(self.brickArray[brickPos]) == isFilled:
+            return
+
+        self.brickArray[brickPos] = isFilled
+        self.dirtyBricks.markVoxel(brickPos)
+
+    def rebuildRegion(self, worldArray, minPos, maxPos):
+        '''
+        Rebuild the bricks of a brick aligned box [minPos, maxPos) of the world array (used when a whole region is replaced at once)
+        '''
+        minBrick = tuple(int(minPos[axis]) // BRICK_SIZE for axis in range(3))
+        maxBrick = tuple(int(maxPos[axis]) // BRICK_SIZE for axis in range(3))
+        numBricks = tuple(maxBrick[axis] - minBrick[axis] for axis in range(3))
+
+        region = worldArray[minPos[X_INDEX]:maxPos[X_INDEX], minPos[Y_INDEX]:maxPos[Y_INDEX], minPos[Z_INDEX]:maxPos[Z_INDEX]]
+        occupied = region.reshape(numBricks[X_INDEX], BRICK_SIZE, numBricks[Y_INDEX], BRICK_SIZE, numBricks[Z_INDEX], BRICK_SIZE).any(axis = (1, 3, 5))
+
+        self.brickArray[minBrick[X_INDEX]:maxBrick[X_INDEX], minBrick[Y_INDEX]:maxBrick[Y_INDEX], minBrick[Z_INDEX]:maxBrick[Z_INDEX]] = occupied
+        self.dirtyBricks.markBox(minBrick, maxBrick)
+
+    def assignTexture(self, ctx):
+        '''
+        Assign the brickmap image texture (sizes are reversed like the world texture because the z axis is contiguous)
+        '''
+        self.texture = ctx.texture3d(self.numBricks[::-1], 1, self.brickArray, dtype = 'u1')
+        self.texture.bind_to_image(4)
+        self.dirtyBricks.popBoxes()
+
+    def uploadDirty(self):
+        '''
+        Upload the bricks whose occupancy changed since the last upload
+        '''
+        if self.texture is None or not self.dirtyBricks:
+            return 0
+        return writeRegions(self.texture, self.brickArray, self.dirtyBricks.popBoxes())
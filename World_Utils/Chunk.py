@@ -1,4 +1,5 @@
 from Settings import *
+from numba import prange
 from Noise import *
 
 @njit(cache = True)
@@ -47,13 +48,93 @@ def decideVoxel(elevation, rand):
         return DIRT 
     return SNOW
 
+GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+MIX_MULTIPLIER_1 = np.uint64(0xBF58476D1CE4E5B9)
+MIX_MULTIPLIER_2 = np.uint64(0x94D049BB133111EB)
+SHIFT_11, SHIFT_27, SHIFT_30, SHIFT_31, SHIFT_32 = np.uint64(11), np.uint64(27), np.uint64(30), np.uint64(31), np.uint64(32)
+
+@njit(cache = True)
+def mixBits(value):
+    '''
+    SplitMix64 finalizer to scramble the bits of a 64 bit state (https://prng.di.unimi.it/splitmix64.c)
+    '''
+    value = (value ^ (value >> SHIFT_30)) * MIX_MULTIPLIER_1
+    value = (value ^ (value >> SHIFT_27)) * MIX_MULTIPLIER_2
+    return value ^ (value >> SHIFT_31)
+
+@njit(cache = True)
+def columnHash(seed, x, z):
+    '''
+    Hash the seed and a column's coordinates into the column's random state
+    '''
+    return mixBits(np.uint64(seed) * GOLDEN_GAMMA + (np.uint64(x) << SHIFT_32) + np.uint64(z))
+
+@njit(cache = True)
+def voxelRandom(columnState, y):
+    '''
+    Hash a column's random state and a voxel's y into a random number in [0, 1). Every voxel's material jitter is fixed by the seed and its coordinates no matter which thread or process generates it
+    '''
+    return (mixBits(columnState + np.uint64(y + 1) * GOLDEN_GAMMA) >> SHIFT_11) * (1.0 / 9007199254740992.0)
+
+def buildElevationBands(worldHeight):
+    '''
+    Build a lookup table over world y of the two voxels an elevation band can choose between and the threshold it compares the elevation times a random number against (the same bands as decideVoxel but without branching per voxel)
+    '''
+    elevation = convertToNormalized(np.arange(worldHeight), worldHeight)
+
+    #                  upper  lower  threshold (a threshold of -1 always picks the upper voxel)
+    bands = np.array([(STONE, STONE, -1), (STONE, CLAY, 0.05), (CLAY, SAND, 0.12), (DIRT, GRASS, 0.35), (SNOW, DIRT, 0.45), (SNOW, SNOW, -1)])
+    bandIndex = np.searchsorted(np.array([0.1, 0.15, 0.25, 0.55, 0.7]), elevation, side = 'right')
+
+    upperVoxel, lowerVoxel = bands[bandIndex, 0].astype('i8'), bands[bandIndex, 1].astype('i8')
+    return elevation, bands[bandIndex, 2], upperVoxel, lowerVoxel
+
+@njit(nogil = True, cache = True)
+def fillColumn(worldArray, arrayX, arrayZ, columnHeight, columnState, bandElevation, bandThreshold, upperVoxel, lowerVoxel):
+    '''
+    Fill a single column of the world array up to its height, choosing each voxel from the elevation band lookup table
+    '''
+    for y in range(columnHeight):
+        isUpper = bandElevation[y] * voxelRandom(columnState, y) > bandThreshold[y]
+        worldArray[arrayX, y, arrayZ] = lowerVoxel[y] + (upperVoxel[y] - lowerVoxel[y]) * isUpper
+
+@njit(parallel = True, nogil = True, cache = True)
+def fillColumns(worldArray, heightMap, bandElevation, bandThreshold, upperVoxel, lowerVoxel, seed, xStart, zStart):
+    '''
+    Fill every (x, z) column of the region of the world array covered by the height map (starting at xStart and zStart) in a single pass up to its height
+    '''
+    worldHeight = worldArray.shape[Y_INDEX]
+    for localX in prange(heightMap.shape[0]):
+        for localZ in range(heightMap.shape[1]):
+            x, z = xStart + localX, zStart + localZ
+            columnHeight = min(int(heightMap[localX, localZ] * worldHeight), worldHeight)
+            fillColumn(worldArray, x, z, columnHeight, columnHash(seed, x, z), bandElevation, bandThreshold, upperVoxel, lowerVoxel)
+
+@njit(nogil = True, cache = True)
+def fillBlock(blockArray, heightMap, bandElevation, bandThreshold, upperVoxel, lowerVoxel, seed, xStart, zStart):
+    '''
+    Fill a block array that is indexed locally but sits at (xStart, zStart) in the world (which may be negative). Runs serially so that background threads can call it without going through Numba's parallel threading layer
+    '''
+    worldHeight = blockArray.shape[Y_INDEX]
+    for localX in range(heightMap.shape[0]):
+        for localZ in range(heightMap.shape[1]):
+            columnHeight = min(int(heightMap[localX, localZ] * worldHeight), worldHeight)
+            fillColumn(blockArray, localX, localZ, columnHeight, columnHash(seed, xStart + localX, zStart + localZ), bandElevation, bandThreshold, upperVoxel, lowerVoxel)
+
+def generateTerrain(worldArray, heightMap, seed):
+    '''
+    Generate the terrain of the whole world array with a single column fill kernel
+    '''
+    bandElevation, bandThreshold, upperVoxel, lowerVoxel = buildElevationBands(worldArray.shape[Y_INDEX])
+    fillColumns(worldArray, heightMap, bandElevation, bandThreshold, upperVoxel, lowerVoxel, seed, 0, 0)
+
 class Chunk:
     '''
-    Create and render a chunk of blocks
+    Create and render a chunk of blocks (the original per chunk generation path, kept as the reference for benchmarking generateTerrain)
     '''
-    def __init__(self, worldArray, heightMap, brickmapPosition, initChunkPosition):
+    def __init__(self, worldArray, heightMap, chunkIndex, initChunkPosition):
         self.worldArray, self.heightMap = worldArray, heightMap
-        self.brickmapPosition, self.initChunkPosition = brickmapPosition, initChunkPosition
+        self.chunkIndex, self.initChunkPosition = chunkIndex, initChunkPosition
 
     @staticmethod 
     @njit(parallel = True, nogil = True, cache = True)
@@ -0,0 +1,201 @@
+from Settings import *
+from numba import prange
+from ColumnRLE import *
+
+@njit(cache = True)
+def summarizeChunk(worldArray, histogram, layerCounts, chunkX, chunkY, chunkZ):
+    '''
+    Count the voxel types and the solid voxels per layer of a single chunk
+    '''
+    histogram[chunkX, chunkY, chunkZ, :] = 0
+    layerCounts[chunkX, chunkY, chunkZ, :] = 0
+
+    initX, initY, initZ = chunkX * CHUNK_SIZE, chunkY * CHUNK_SIZE, chunkZ * CHUNK_SIZE
+    for x in range(initX, initX + CHUNK_SIZE):
+        for y in range(initY, initY + CHUNK_SIZE):
+            for z in range(initZ, initZ + CHUNK_SIZE):
+                voxelID = worldArray[x, y, z]
+                histogram[chunkX, chunkY, chunkZ, voxelID] += 1
+
+                if voxelID != EMPTY_VOXEL:
+                    layerCounts[chunkX, chunkY, chunkZ, y - initY] += 1
+
+@njit(parallel = True, cache = True)
+def summarizeChunks(worldArray, histogram, layerCounts):
+    '''
+    Summarize every chunk of the world array in parallel
+    '''
+    numChunksX, numChunksY, numChunksZ = histogram.shape[X_INDEX], histogram.shape[Y_INDEX], histogram.shape[Z_INDEX]
+    for chunkX in prange(numChunksX):
+        for chunkY in range(numChunksY):
+            for chunkZ in range(numChunksZ):
+                summarizeChunk(worldArray, histogram, layerCounts, chunkX, chunkY, chunkZ)
+
+class ChunkSummary:
+    '''
+    Per-chunk summary of the world (occupancy state, solid count, voxel type histogram and min / max solid y) that is kept in sync with every edit so that empty chunks can be skipped cheaply
+    '''
+    def __init__(self, worldSize):
+        self.numChunks = tuple(int(size) // CHUNK_SIZE for size in worldSize)
+
+        self.state = np.full(self.numChunks, EMPTY_CHUNK, 'u1')
+        self.solidCount = np.zeros(self.numChunks, 'i4')
+        self.histogram = np.zeros((*self.numChunks, NUM_VOXEL_TYPES), 'i4')
+        self.histogram[..., EMPTY_VOXEL] = CHUNK_SIZE ** 3
+        self.layerCounts = np.zeros((*self.numChunks, CHUNK_SIZE), 'i2')
+        self.minY = np.full(self.numChunks, -1, 'i2')
+        self.maxY = np.full(self.numChunks, -1, 'i2')
+
+    @staticmethod
+    def getChunkIndex(mapPos):
+        '''
+        Get the chunk index holding a map position
+        '''
+        return (int(mapPos[X_INDEX]) // CHUNK_SIZE, int(mapPos[Y_INDEX]) // CHUNK_SIZE, int(mapPos[Z_INDEX]) // CHUNK_SIZE)
+
+    def build(self, worldArray):
+        '''
+        Build the summary of every chunk from the world array (a column RLE world is summarized one decoded slab of chunks at a time)
+        '''
+        if isColumnRLE(worldArray):
+            for xStart, slab in worldArray.iterSlabs():
+                chunkX = xStart // CHUNK_SIZE
+                summarizeChunks(slab, self.histogram[chunkX:chunkX + 1], self.layerCounts[chunkX:chunkX + 1])
+        else:
+            summarizeChunks(worldArray, self.histogram, self.layerCounts)
+
+        self.solidCount[:] = CHUNK_SIZE ** 3 - self.histogram[..., EMPTY_VOXEL]
+        self.state[:] = np.where(self.solidCount == 0, EMPTY_CHUNK, np.where(self.solidCount == CHUNK_SIZE ** 3, FILLED_CHUNK, MIXED_CHUNK))
+
+        filledLayers = self.layerCounts > 0
+        initY = (np.arange(self.numChunks[Y_INDEX]) * CHUNK_SIZE)[None, :, None]
+        lowestLayer = np.argmax(filledLayers, axis = -1)
+        highestLayer = CHUNK_SIZE - 1 - np.argmax(filledLayers[..., ::-1], axis = -1)
+        
+        self.minY[:] = np.where(self.solidCount > 0, initY + lowestLayer, -1)
+        self.maxY[:] = np.where(self.solidCount > 0, initY + highestLayer, -1)
+
+    def buildChunk(self, worldArray, chunkIndex):
+        '''
+        Build the summary of a single chunk from the world array
+        '''
+        summarizeChunk(worldArray, self.histogram, self.layerCounts, *chunkIndex)
+        self.updateChunk(chunkIndex)
+
+    def updateChunk(self, chunkIndex):
+        '''
+        Update the solid count, state, and min / max solid y of a chunk from its histogram and layer counts (O(CHUNK_SIZE))
+        '''
+        solidCount = CHUNK_SIZE ** 3 - int(self.histogram[chunkIndex][EMPTY_VOXEL])
+        self.solidCount[chunkIndex] = solidCount
+
+        if solidCount == 0:
+            self.state[chunkIndex] = EMPTY_CHUNK
+            self.minY[chunkIndex] = self.maxY[chunkIndex] = -1
+            return
+        
+        self.state[chunkIndex] = FILLED_CHUNK if solidCount == CHUNK_SIZE ** 3 else MIXED_CHUNK
+        self.updateBounds(chunkIndex)
+
+    def updateBounds(self, chunkIndex):
+        '''
+        Find the min / max solid y of a non-empty chunk from its layer counts (O(CHUNK_SIZE))
+        '''
+        filledLayers = np.flatnonzero(self.layerCounts[chunkIndex])
+        initY = chunkIndex[Y_INDEX] * CHUNK_SIZE
+        self.minY[chunkIndex], self.maxY[chunkIndex] = initY + filledLayers[0], initY + filledLayers[-1]
+
+    def update(self, mapPos, oldID, newID):
+        '''
+        Update the summary of the chunk holding a map position after a voxel changes from oldID to newID. The histogram, solid count, state and layer count are updated in O(1) and so are the min / max solid y, except when the edit empties the chunk's lowest or highest solid layer, which rescans its CHUNK_SIZE layer counts
+        '''
+        oldID, newID = int(oldID), int(newID)
+        if oldID == newID:
+            return
+
+        chunkIndex = self.getChunkIndex(mapPos)
+        self.histogram[chunkIndex][oldID] -= 1
+        self.histogram[chunkIndex][newID] += 1
+        if oldID != EMPTY_VOXEL and newID != EMPTY_VOXEL: # One solid voxel swapped for another
+            return
+
+        y = int(mapPos[Y_INDEX])
+        layer = y % CHUNK_SIZE
+        solidChange = 1 if oldID == EMPTY_VOXEL else -1
+        self.layerCounts[chunkIndex][layer] += solidChange
+        self.solidCount[chunkIndex] += solidChange
+        solidCount = int(self.solidCount[chunkIndex])
+
+        if solidCount == 0:
+            self.state[chunkIndex] = EMPTY_CHUNK
+            self.minY[chunkIndex] = self.maxY[chunkIndex] = -1
+            return
+
+        self.state[chunkIndex] = FILLED_CHUNK if solidCount == CHUNK_SIZE ** 3 else MIXED_CHUNK
+        if solidChange > 0:
+            self.minY[chunkIndex] = y if solidCount == 1 else min(int(self.minY[chunkIndex]), y)
+            self.maxY[chunkIndex] = y if solidCount == 1 else max(int(self.maxY[chunkIndex]), y)
+        elif self.layerCounts[chunkIndex][layer] == 0 and y in (self.minY[chunkIndex], self.maxY[chunkIndex]):
+            self.updateBounds(chunkIndex)
+
+    def updateVoxels(self, positions, oldIDs, newIDs):
+        '''
+        Update the summary after the voxels at positions (a tuple of x, y and z arrays) change from oldIDs to newIDs, counting the histogram and layer count changes of every chunk they're in at once
+        '''
+        oldIDs, newIDs = np.asarray(oldIDs).astype(np.intp), np.asarray(newIDs).astype(np.intp)
+        changed = oldIDs != newIDs
+        if not changed.all():
+            positions, oldIDs, newIDs = tuple(np.asarray(position)[changed] for position in positions), oldIDs[changed], newIDs[changed]
+        if len(oldIDs) == 0:
+            return
+
+        chunkPositions = tuple(position // CHUNK_SIZE for position in positions)
+        minChunk = tuple(int(chunkPosition.min()) for chunkPosition in chunkPositions)
+        numChunks = tuple(int(chunkPositions[axis].max()) - minChunk[axis] + 1 for axis in range(3))
+        chunkSlices = tuple(slice(minChunk[axis], minChunk[axis] + numChunks[axis]) for axis in range(3))
+        localChunks = np.ravel_multi_index(tuple(chunkPositions[axis] - minChunk[axis] for axis in range(3)), numChunks) # Index of every voxel's chunk within the chunks they span
+
+        histogramSize = int(np.prod(numChunks)) * NUM_VOXEL_TYPES
+        histogramChange = np.bincount(localChunks * NUM_VOXEL_TYPES + newIDs, minlength = histogramSize) - np.bincount(localChunks * NUM_VOXEL_TYPES + oldIDs, minlength = histogramSize)
+        self.histogram[chunkSlices] += histogramChange.reshape(*numChunks, NUM_VOXEL_TYPES).astype('i4')
+
+        layers = localChunks * CHUNK_SIZE + positions[Y_INDEX] % CHUNK_SIZE
+        layersSize = int(np.prod(numChunks)) * CHUNK_SIZE
+        layerChange = np.bincount(layers[oldIDs == EMPTY_VOXEL], minlength = layersSize) - np.bincount(layers[newIDs == EMPTY_VOXEL], minlength = layersSize)
+        self.layerCounts[chunkSlices] += layerChange.reshape(*numChunks, CHUNK_SIZE).astype('i2')
+
+        for localChunk in np.flatnonzero(np.bincount(localChunks, minlength = int(np.prod(numChunks)))).tolist():
+            self.updateChunk(tuple(minChunk[axis] + int(index) for axis, index in enumerate(np.unravel_index(localChunk, numChunks))))
+
+    def updateBox(self, minPos, oldBox, newBox):
+        '''
+        Update the summary of the chunks overlapping a box (starting at minPos) after its voxels change from oldBox to newBox
+        '''
+        changed = np.nonzero(oldBox != newBox)
+        self.updateVoxels(tuple(changed[axis] + int(minPos[axis]) for axis in range(3)), oldBox[changed], newBox[changed])
+
+    def isEmpty(self, mapPos):
+        '''
+        Check whether the chunk holding a map position is entirely empty
+        '''
+        return self.state[self.getChunkIndex(mapPos)] == EMPTY_CHUNK
+
+    def nonEmptyChunks(self):
+        '''
+        Return the indices of every chunk that holds at least one solid voxel
+        '''
+        return np.argwhere(self.state != EMPTY_CHUNK)
+
+    def getStats(self):
+        '''
+        Return cheap world statistics computed from the summary
+        '''
+        return {
+            'emptyChunks': int(np.count_nonzero(self.state == EMPTY_CHUNK)),
+            'filledChunks': int(np.count_nonzero(self.state == FILLED_CHUNK)),
+            'mixedChunks': int(np.count_nonzero(self.state == MIXED_CHUNK)),
+            'solidVoxels': int(self.solidCount.sum(dtype = 'i8')),
+            'voxelCounts': self.histogram.sum(axis = (0, 1, 2), dtype = 'i8')[1:].tolist(), # Solid voxel counts indexed by voxelID - 1
+            'minSolidY': int(self.minY[self.state != EMPTY_CHUNK].min(initial = self.numChunks[Y_INDEX] * CHUNK_SIZE)),
+            'maxSolidY': int(self.maxY.max(initial = -1))
+        }
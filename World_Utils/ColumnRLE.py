@@ -0,0 +1,333 @@
+from Settings import *
+
+RUN_SLACK = 2 # Spare runs given to every column so that most edits don't have to move the column
+MAX_EDIT_RUNS = 5 # An edit replaces at most 3 runs (the edited run and its neighbours) with at most 5
+
+@njit(cache = True)
+def countRuns(slab):
+    '''
+    Count the runs of every (x, z) column of a dense slab
+    '''
+    numRuns = np.ones((slab.shape[X_INDEX], slab.shape[Z_INDEX]), np.int32)
+    for x in range(slab.shape[X_INDEX]):
+        for z in range(slab.shape[Z_INDEX]):
+            for y in range(1, slab.shape[Y_INDEX]):
+                numRuns[x, z] += slab[x, y, z] != slab[x, y - 1, z]
+    return numRuns
+
+@njit(cache = True)
+def encodeColumns(slab, runEnds, runVoxels, columnStart, columnRuns, columnCapacity, firstColumn, worldSizeZ, offset, slack):
+    '''
+    Run-length encode every column of a dense block of full height columns into the run buffers starting at offset (each run is stored as the y it ends at and its voxel). firstColumn is the column of the block's first (x, z) and worldSizeZ the number of columns between two x's. Returns the new end of the used buffer
+    '''
+    height = slab.shape[Y_INDEX]
+    for x in range(slab.shape[X_INDEX]):
+        for z in range(slab.shape[Z_INDEX]):
+            column = firstColumn + x * worldSizeZ + z
+            columnStart[column] = offset
+
+            numRuns = 0
+            for y in range(1, height + 1):
+                if y == height or slab[x, y, z] != slab[x, y - 1, z]:
+                    runEnds[offset + numRuns] = y
+                    runVoxels[offset + numRuns] = slab[x, y - 1, z]
+                    numRuns += 1
+
+            columnRuns[column], columnCapacity[column] = numRuns, numRuns + slack
+            offset += numRuns + slack
+    return offset
+
+@njit(cache = True)
+def findRun(runEnds, start, numRuns, y):
+    '''
+    Binary search for the run of a column that holds y (the first run that ends after y)
+    '''
+    return np.searchsorted(runEnds[start:start + numRuns], y, side = 'right')
+
+@njit(cache = True)
+def getVoxelRLE(runEnds, runVoxels, columnStart, columnRuns, column, y):
+    '''
+    Get the voxel at height y of a column in O(log runs)
+    '''
+    start = columnStart[column]
+    return runVoxels[start + findRun(runEnds, start, columnRuns[column], y)]
+
+@njit(cache = True)
+def appendPiece(ends, voxels, numPieces, pieceEnd, pieceVoxel):
+    '''
+    Append a run to the replacement runs of an edit (extending the last one if it holds the same voxel). Returns the new number of runs
+    '''
+    if numPieces > 0 and voxels[numPieces - 1] == pieceVoxel:
+        ends[numPieces - 1] = pieceEnd
+        return numPieces
+
+    ends[numPieces], voxels[numPieces] = pieceEnd, pieceVoxel
+    return numPieces + 1
+
+@njit(cache = True)
+def setVoxelRLE(runEnds, runVoxels, columnStart, columnRuns, columnCapacity, column, y, voxelID):
+    '''
+    Set the voxel at height y of a column. The run holding y is found with a binary search and replaced (along with its neighbours) by at most 5 runs that are merged where they hold the same voxel, then the rest of the column is shifted. Returns -1 when done or the number of runs the column needs when it has to be moved to a bigger spot first
+    '''
+    start, numRuns = columnStart[column], columnRuns[column]
+    run = findRun(runEnds, start, numRuns, y)
+    oldID = runVoxels[start + run]
+    if oldID == voxelID:
+        return -1
+
+    firstRun, lastRun = max(run - 1, 0), min(run + 1, numRuns - 1)
+    ends, voxels = np.empty(MAX_EDIT_RUNS, np.int64), np.empty(MAX_EDIT_RUNS, np.int64)
+    numPieces = 0
+
+    for i in range(firstRun, lastRun + 1):
+        runEnd = runEnds[start + i]
+        if i != run:
+            numPieces = appendPiece(ends, voxels, numPieces, runEnd, runVoxels[start + i])
+            continue
+
+        runStart = 0 if i == 0 else runEnds[start + i - 1]
+        if y > runStart:
+            numPieces = appendPiece(ends, voxels, numPieces, y, oldID)
+        numPieces = appendPiece(ends, voxels, numPieces, y + 1, voxelID)
+        if y + 1 < runEnd:
+            numPieces = appendPiece(ends, voxels, numPieces, runEnd, oldID)
+
+    newRuns = numRuns - (lastRun - firstRun + 1) + numPieces
+    if newRuns > columnCapacity[column]:
+        return newRuns
+
+    shift = numPieces - (lastRun - firstRun + 1)
+    if shift > 0:
+        for i in range(numRuns - 1, lastRun, -1):
+            runEnds[start + i + shift], runVoxels[start + i + shift] = runEnds[start + i], runVoxels[start + i]
+    elif shift < 0:
+        for i in range(lastRun + 1, numRuns):
+            runEnds[start + i + shift], runVoxels[start + i + shift] = runEnds[start + i], runVoxels[start + i]
+
+    for i in range(numPieces):
+        runEnds[start + firstRun + i], runVoxels[start + firstRun + i] = ends[i], voxels[i]
+
+    columnRuns[column] = newRuns
+    return -1
+
+@njit(cache = True)
+def decodeColumns(runEnds, runVoxels, columnStart, columnRuns, sizeZ, minPos, maxPos, dense):
+    '''
+    Decode the box [minPos, maxPos) into a dense block (only the runs that overlap the box are visited)
+    '''
+    for x in range(minPos[X_INDEX], maxPos[X_INDEX]):
+        for z in range(minPos[Z_INDEX], maxPos[Z_INDEX]):
+            column = x * sizeZ + z
+            start, numRuns = columnStart[column], columnRuns[column]
+
+            for run in range(findRun(runEnds, start, numRuns, minPos[Y_INDEX]), numRuns):
+                runStart = 0 if run == 0 else runEnds[start + run - 1]
+                if runStart >= maxPos[Y_INDEX]:
+                    break
+
+                fromY, toY = max(runStart, minPos[Y_INDEX]), min(runEnds[start + run], maxPos[Y_INDEX])
+                dense[x - minPos[X_INDEX], fromY - minPos[Y_INDEX]:toY - minPos[Y_INDEX], z - minPos[Z_INDEX]] = runVoxels[start + run]
+
+class ColumnRLE:
+    '''
+    World storage that run-length encodes every (x, z) column (a column of terrain is a few runs of material under one run of air). Runs live in flat array buffers rather than Python objects: every column has a start, a run count and a capacity into the shared run end and run voxel buffers. It can be indexed like the dense world array (world[x, y, z] for a voxel and slices for a dense block, which can be written too) so World can use it unchanged
+    '''
+    def __init__(self, worldSize):
+        self.shape = tuple(int(size) for size in worldSize)
+        self.dtype = np.dtype('u1')
+        self.numColumns = self.shape[X_INDEX] * self.shape[Z_INDEX]
+
+        self.columnStart = np.zeros(self.numColumns, 'u4')
+        self.columnRuns = np.zeros(self.numColumns, 'u2')
+        self.columnCapacity = np.zeros(self.numColumns, 'u2')
+
+        self.endDType = np.dtype('u1' if self.shape[Y_INDEX] < 256 else 'u2') # Run ends go up to the world height
+        self.runEnds, self.runVoxels = np.empty(0, self.endDType), np.empty(0, 'u1')
+        self.usedRuns = 0
+        self.holeRuns = 0 # Runs of the buffers left behind by moved columns
+
+    @classmethod
+    def fromDense(cls, worldArray, slabSize = CHUNK_SIZE):
+        '''
+        Encode a dense world array slab by slab
+        '''
+        world = cls(np.shape(worldArray))
+        for xStart in range(0, world.shape[X_INDEX], slabSize):
+            world.encodeSlab(xStart, worldArray[xStart:xStart + slabSize])
+
+        world.trim()
+        return world
+
+    def reserve(self, numRuns):
+        '''
+        Make sure the run buffers have room for numRuns more runs (growing them by an eighth at a time because doubling a big world's buffers would undo most of the memory saved)
+        '''
+        required = self.usedRuns + numRuns
+        if required <= self.runEnds.size:
+            return
+
+        capacity = max(required, self.runEnds.size + max(self.runEnds.size // 8, 2 ** 20))
+        self.runEnds = np.concatenate((self.runEnds[:self.usedRuns], np.empty(capacity - self.usedRuns, self.endDType)))
+        self.runVoxels = np.concatenate((self.runVoxels[:self.usedRuns], np.empty(capacity - self.usedRuns, 'u1')))
+
+    def trim(self):
+        '''
+        Release the spare capacity at the end of the run buffers (after the whole world has been encoded)
+        '''
+        self.runEnds, self.runVoxels = self.runEnds[:self.usedRuns].copy(), self.runVoxels[:self.usedRuns].copy()
+
+    def encodeSlab(self, xStart, slab):
+        '''
+        Encode a dense slab holding the columns from xStart (the full height and z range of the world)
+        '''
+        self.encodeColumnBox(xStart, 0, slab)
+
+    def encodeColumnBox(self, xStart, zStart, block):
+        '''
+        Encode a dense block of full height columns whose first column is at (xStart, zStart)
+        '''
+        numRuns = countRuns(block)
+        self.reserve(int(numRuns.sum()) + RUN_SLACK * numRuns.size)
+        xStop, zStop = xStart + block.shape[X_INDEX], zStart + block.shape[Z_INDEX]
+        self.holeRuns += int(self.columnCapacity.reshape(self.shape[X_INDEX], self.shape[Z_INDEX])[xStart:xStop, zStart:zStop].sum()) # The block's columns move to the end
+        self.usedRuns = encodeColumns(block, self.runEnds, self.runVoxels, self.columnStart, self.columnRuns, self.columnCapacity, self.getColumn(xStart, zStart), self.shape[Z_INDEX], self.usedRuns, RUN_SLACK)
+
+    def getColumn(self, x, z):
+        '''
+        Get the column index of (x, z)
+        '''
+        return int(x) * self.shape[Z_INDEX] + int(z)
+
+    def moveColumn(self, column, numRuns):
+        '''
+        Move a column to the end of the run buffers with room for numRuns runs (plus the slack) so that an edit fits
+        '''
+        capacity = numRuns + RUN_SLACK
+        self.reserve(capacity)
+
+        start, oldRuns = int(self.columnStart[column]), int(self.columnRuns[column])
+        self.holeRuns += int(self.columnCapacity[column])
+        self.runEnds[self.usedRuns:self.usedRuns + oldRuns] = self.runEnds[start:start + oldRuns]
+        self.runVoxels[self.usedRuns:self.usedRuns + oldRuns] = self.runVoxels[start:start + oldRuns]
+
+        self.columnStart[column], self.columnCapacity[column] = self.usedRuns, capacity
+        self.usedRuns += capacity
+
+    def compact(self):
+        '''
+        Pack every column back to back (moved columns leave holes in the run buffers)
+        '''
+        numRuns = self.columnRuns.astype('i8')
+        newStart = np.concatenate(([0], np.cumsum(numRuns + RUN_SLACK)[:-1]))
+        runOffset = np.arange(numRuns.sum()) - np.repeat(np.cumsum(numRuns) - numRuns, numRuns) # Index of every run within its column
+        oldIndex, newIndex = np.repeat(self.columnStart, numRuns) + runOffset, np.repeat(newStart, numRuns) + runOffset
+
+        self.usedRuns = int(newStart[-1] + numRuns[-1] + RUN_SLACK)
+        runEnds, runVoxels = np.zeros(self.usedRuns, self.endDType), np.zeros(self.usedRuns, 'u1')
+        runEnds[newIndex], runVoxels[newIndex] = self.runEnds[oldIndex], self.runVoxels[oldIndex]
+
+        self.runEnds, self.runVoxels = runEnds, runVoxels
+        self.columnStart, self.columnCapacity = newStart.astype('u4'), (numRuns + RUN_SLACK).astype('u2')
+        self.holeRuns = 0
+
+    def compactIfSparse(self):
+        '''
+        Compact the run buffers once the holes left by moved columns outnumber the runs the columns hold (so edits never grow the buffers without bound)
+        '''
+        if self.holeRuns > self.usedRuns - self.holeRuns:
+            self.compact()
+
+    def getVoxel(self, x, y, z):
+        '''
+        Get a voxel in O(log runs) of its column
+        '''
+        return getVoxelRLE(self.runEnds, self.runVoxels, self.columnStart, self.columnRuns, self.getColumn(x, z), int(y))
+
+    def setVoxel(self, x, y, z, voxelID):
+        '''
+        Set a voxel (the column is moved to a bigger spot first if the edit adds more runs than its capacity)
+        '''
+        column = self.getColumn(x, z)
+        requiredRuns = setVoxelRLE(self.runEnds, self.runVoxels, self.columnStart, self.columnRuns, self.columnCapacity, column, int(y), int(voxelID))
+        if requiredRuns >= 0:
+            self.moveColumn(column, requiredRuns)
+            setVoxelRLE(self.runEnds, self.runVoxels, self.columnStart, self.columnRuns, self.columnCapacity, column, int(y), int(voxelID))
+            self.compactIfSparse()
+
+    def toDense(self, minPos = (0, 0, 0), maxPos = None):
+        '''
+        Decode the box [minPos, maxPos) into a dense block (used for GPU uploads and saving)
+        '''
+        maxPos = self.shape if maxPos is None else maxPos
+        minPos, maxPos = np.array(minPos, np.int64), np.array(maxPos, np.int64)
+
+        dense = np.empty(tuple(maxPos - minPos), 'u1')
+        decodeColumns(self.runEnds, self.runVoxels, self.columnStart, self.columnRuns, self.shape[Z_INDEX], minPos, maxPos, dense)
+        return dense
+
+    def getBox(self, key):
+        '''
+        Convert an index of integers and slices (with steps of 1) into the box [minPos, maxPos) it covers
+        '''
+        key = key if isinstance(key, tuple) else (key,)
+        key = key + (slice(None),) * (3 - len(key))
+
+        minPos, maxPos = [], []
+        for axis, index in enumerate(key):
+            if isinstance(index, slice):
+                start, stop, step = index.indices(self.shape[axis])
+                if step != 1:
+                    raise IndexError('Column RLE worlds only support slices with a step of 1')
+                minPos.append(start)
+                maxPos.append(max(stop, start))
+            else:
+                minPos.append(int(index))
+                maxPos.append(int(index) + 1)
+        return minPos, maxPos
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple) and len(key) == 3 and not any(isinstance(index, slice) for index in key):
+            return self.getVoxel(*key)
+
+        minPos, maxPos = self.getBox(key)
+        key = key if isinstance(key, tuple) else (key,)
+        return self.toDense(minPos, maxPos)[tuple(slice(None) if isinstance(index, slice) else 0 for index in key)]
+
+    def writeBox(self, key, voxels):
+        '''
+        Write a block of voxels (or one voxel ID) to an index of integers and slices by decoding the full height columns under it, writing them, and encoding them again (only the x and z range the index covers). The old runs of the columns become holes in the run buffers, so they're compacted once the holes outnumber the runs in use
+        '''
+        minPos, maxPos = self.getBox(key)
+        key = key if isinstance(key, tuple) else (key,)
+        key = key + (slice(None),) * (3 - len(key))
+
+        columns = self.toDense((minPos[X_INDEX], 0, minPos[Z_INDEX]), (maxPos[X_INDEX], self.shape[Y_INDEX], maxPos[Z_INDEX]))
+        columns[slice(None) if isinstance(key[X_INDEX], slice) else 0, key[Y_INDEX], slice(None) if isinstance(key[Z_INDEX], slice) else 0] = voxels
+        self.encodeColumnBox(minPos[X_INDEX], minPos[Z_INDEX], columns)
+        self.compactIfSparse()
+
+    def __setitem__(self, key, voxelID):
+        if isinstance(key, tuple) and len(key) == 3 and not any(isinstance(index, slice) for index in key):
+            self.setVoxel(*key, voxelID)
+        else:
+            self.writeBox(key, voxelID)
+
+    def iterSlabs(self, slabSize = CHUNK_SIZE):
+        '''
+        Iterate over the world as dense slabs of slabSize x columns (so whole world passes never decode the whole world at once)
+        '''
+        for xStart in range(0, self.shape[X_INDEX], slabSize):
+            yield xStart, self.toDense((xStart, 0, 0), (min(xStart + slabSize, self.shape[X_INDEX]), self.shape[Y_INDEX], self.shape[Z_INDEX]))
+
+    @property
+    def nbytes(self):
+        '''
+        Memory used by the run buffers and the column arrays
+        '''
+        return self.runEnds.nbytes + self.runVoxels.nbytes + self.columnStart.nbytes + self.columnRuns.nbytes + self.columnCapacity.nbytes
+
+def isColumnRLE(worldArray):
+    '''
+    Check whether a world is stored as run-length encoded columns rather than a dense array
+    '''
+    return isinstance(worldArray, ColumnRLE)
@@ -0,0 +1,258 @@
+from Settings import *
+from numba import prange
+
+RAY_EPSILON = 1e-5
+
+@njit(cache = True)
+def clampDirection(direction):
+    '''
+    Clamp the ray direction so that no component is 0 (avoids division by 0 in the DDA)
+    '''
+    clamped = direction.astype(np.float64)
+    for axis in range(3):
+        if abs(clamped[axis]) < RAY_EPSILON:
+            clamped[axis] = RAY_EPSILON
+    return clamped
+
+@njit(cache = True)
+def initDDA(origin, direction):
+    '''
+    Initialize the DDA variables (the same as initDDAVars in World.comp). Side distances are kept as the initial side distance plus a step count times the delta distance so that any traversal that skips steps lands on exactly the same values
+    '''
+    direction = clampDirection(direction)
+    rayDirSign = np.sign(direction)
+    deltaDist = np.abs(np.sqrt(np.sum(direction ** 2)) / direction)
+
+    mapPos = np.floor(origin).astype(np.int64)
+    rayStep = rayDirSign.astype(np.int64)
+    initSideDist = (rayDirSign * (mapPos - origin) + (rayDirSign * 0.5 + 0.5)) * deltaDist
+
+    return rayDirSign, mapPos, deltaDist, rayStep, initSideDist
+
+@njit(cache = True)
+def voxelInWorld(worldArray, mapPos):
+    '''
+    Check whether a map position is within the world array
+    '''
+    return 0 <= mapPos[X_INDEX] < worldArray.shape[X_INDEX] and 0 <= mapPos[Y_INDEX] < worldArray.shape[Y_INDEX] and 0 <= mapPos[Z_INDEX] < worldArray.shape[Z_INDEX]
+
+@njit(cache = True)
+def getVoxel(worldArray, mapPos):
+    '''
+    Get the voxel at a map position (voxels outside the world are empty)
+    '''
+    if not voxelInWorld(worldArray, mapPos):
+        return EMPTY_VOXEL
+    return worldArray[mapPos[X_INDEX], mapPos[Y_INDEX], mapPos[Z_INDEX]]
+
+@njit(cache = True)
+def ddaStep(mapPos, stepCounts, initSideDist, deltaDist, rayStep, mask):
+    '''
+    Perform a branchless DDA step (every axis whose side distance is the smallest steps) and return the time the ray enters the new voxel
+    '''
+    tEntry = np.inf
+    for axis in range(3):
+        tEntry = min(tEntry, initSideDist[axis] + stepCounts[axis] * deltaDist[axis])
+
+    for axis in range(3):
+        mask[axis] = initSideDist[axis] + stepCounts[axis] * deltaDist[axis] <= tEntry
+        stepCounts[axis] += mask[axis]
+        mapPos[axis] += mask[axis] * rayStep[axis]
+    return tEntry
+
+@njit(cache = True)
+def denseTraversal(worldArray, origin, direction, maxDistance, maxSteps):
+    '''
+    Reference voxel by voxel DDA (the CPU equivalent of rayMarch in World.comp). Returns whether a voxel was hit, its map position, the normal vector, the distance the ray entered it at, and the number of steps taken
+    '''
+    rayDirSign, mapPos, deltaDist, rayStep, initSideDist = initDDA(origin, direction)
+    stepCounts, mask = np.zeros(3, np.int64), np.zeros(3, np.int64)
+    tEntry, steps = 0.0, 0
+
+    while steps < maxSteps and tEntry <= maxDistance:
+        if getVoxel(worldArray, mapPos) != EMPTY_VOXEL:
+            return True, mapPos, (-rayDirSign * mask).astype(np.int64), tEntry, steps
+
+        tEntry = ddaStep(mapPos, stepCounts, initSideDist, deltaDist, rayStep, mask)
+        steps += 1
+
+    return False, mapPos, np.zeros(3, np.int64), tEntry, steps
+
+@njit(cache = True)
+def brickEmpty(brickArray, mapPos):
+    '''
+    Check whether the brick holding a map position is empty (bricks outside the world are empty)
+    '''
+    brickPos = mapPos // BRICK_SIZE
+    if not voxelInWorld(brickArray, brickPos):
+        return True
+    return brickArray[brickPos[X_INDEX], brickPos[Y_INDEX], brickPos[Z_INDEX]] == EMPTY_VOXEL
+
+@njit(cache = True)
+def countCrossings(initSideDist, deltaDist, minCount, maxCount, tMax):
+    '''
+    Count the axis crossings (initSideDist + n * deltaDist) that happen at or before tMax, starting from minCount and never exceeding maxCount. The estimate is corrected with the exact expression so that it matches stepping one voxel at a time
+    '''
+    count = minCount
+    if initSideDist + minCount * deltaDist <= tMax:
+        count = max(minCount, min(maxCount, int(np.floor((tMax - initSideDist) / deltaDist)) + 1))
+
+    while count < maxCount and initSideDist + count * deltaDist <= tMax:
+        count += 1
+    while count > minCount and initSideDist + (count - 1) * deltaDist > tMax:
+        count -= 1
+    return count
+
+@njit(cache = True)
+def getBrickRemaining(mapPos, rayStep, axis):
+    '''
+    Get the number of voxels left along an axis before the ray leaves the brick holding a map position (including the one it's in)
+    '''
+    brickMin = (mapPos[axis] // BRICK_SIZE) * BRICK_SIZE
+    if rayStep[axis] > 0:
+        return brickMin + BRICK_SIZE - mapPos[axis]
+    return mapPos[axis] - brickMin + 1
+
+@njit(cache = True)
+def brickStep(mapPos, stepCounts, initSideDist, deltaDist, rayStep, mask):
+    '''
+    Skip over an empty brick in one step by advancing every axis to where it would be after the DDA leaves the brick. Returns the time the ray enters the first voxel outside the brick
+    '''
+    tExit = np.inf
+    for axis in range(3):
+        tExit = min(tExit, initSideDist[axis] + (stepCounts[axis] + getBrickRemaining(mapPos, rayStep, axis) - 1) * deltaDist[axis])
+
+    for axis in range(3):
+        newCount = countCrossings(initSideDist[axis], deltaDist[axis], stepCounts[axis], stepCounts[axis] + getBrickRemaining(mapPos, rayStep, axis), tExit)
+        mask[axis] = newCount > stepCounts[axis] and initSideDist[axis] + (newCount - 1) * deltaDist[axis] == tExit
+
+        mapPos[axis] += (newCount - stepCounts[axis]) * rayStep[axis]
+        stepCounts[axis] = newCount
+    return tExit
+
+@njit(cache = True)
+def brickTraversal(worldArray, brickArray, origin, direction, maxDistance, maxSteps):
+    '''
+    Two-level DDA that skips empty bricks in a single step and only walks voxel by voxel inside occupied bricks. Returns the same values as denseTraversal (with fewer steps)
+    '''
+    rayDirSign, mapPos, deltaDist, rayStep, initSideDist = initDDA(origin, direction)
+    stepCounts, mask = np.zeros(3, np.int64), np.zeros(3, np.int64)
+    tEntry, steps = 0.0, 0
+
+    while steps < maxSteps and tEntry <= maxDistance:
+        if brickEmpty(brickArray, mapPos):
+            tEntry = brickStep(mapPos, stepCounts, initSideDist, deltaDist, rayStep, mask)
+        elif getVoxel(worldArray, mapPos) != EMPTY_VOXEL:
+            return True, mapPos, (-rayDirSign * mask).astype(np.int64), tEntry, steps
+        else:
+            tEntry = ddaStep(mapPos, stepCounts, initSideDist, deltaDist, rayStep, mask)
+        steps += 1
+
+    return False, mapPos, np.zeros(3, np.int64), tEntry, steps
+
+@njit(cache = True)
+def voxelInWindow(worldArray, worldOrigin, mapPos):
+    '''
+    Check whether a map position is within the window of the world array that starts at worldOrigin (the same as inWorld in World.comp, where worldOrigin is only non-zero in streaming mode)
+    '''
+    for axis in range(3):
+        localPos = mapPos[axis] - worldOrigin[axis]
+        if localPos < 0 or localPos >= worldArray.shape[axis]:
+            return False
+    return True
+
+@njit(cache = True)
+def getWindowVoxel(worldArray, worldOrigin, mapPos):
+    '''
+    Get the voxel at a map position with its position wrapped into the world array (voxels outside the window are empty)
+    '''
+    if not voxelInWindow(worldArray, worldOrigin, mapPos):
+        return EMPTY_VOXEL
+    return worldArray[mapPos[X_INDEX] % worldArray.shape[X_INDEX], mapPos[Y_INDEX] % worldArray.shape[Y_INDEX], mapPos[Z_INDEX] % worldArray.shape[Z_INDEX]]
+
+@njit(cache = True)
+def windowBrickEmpty(worldArray, brickArray, worldOrigin, mapPos):
+    '''
+    Check whether the brick holding a map position is empty with its position wrapped into the brickmap (bricks outside the window are empty)
+    '''
+    if not voxelInWindow(worldArray, worldOrigin, mapPos):
+        return True
+
+    return brickArray[(mapPos[X_INDEX] // BRICK_SIZE) % brickArray.shape[X_INDEX], (mapPos[Y_INDEX] // BRICK_SIZE) % brickArray.shape[Y_INDEX], (mapPos[Z_INDEX] // BRICK_SIZE) % brickArray.shape[Z_INDEX]] == EMPTY_VOXEL
+
+@njit(cache = True)
+def leavingWindow(worldArray, worldOrigin, mapPos, rayStep):
+    '''
+    Check whether the ray is outside the window on an axis and stepping away from it (it can never hit anything again so the shader's remaining steps can be skipped)
+    '''
+    for axis in range(3):
+        localPos = mapPos[axis] - worldOrigin[axis]
+        if (localPos < 0 and rayStep[axis] < 0) or (localPos >= worldArray.shape[axis] and rayStep[axis] > 0):
+            return True
+    return False
+
+@njit(cache = True)
+def getHitDistance(origin, direction, mapPos, normal):
+    '''
+    Get the ray's t value where it hits the face of a voxel (the same as setCommonRecordValues in World.comp). Rays that start inside a voxel have no face so their t value is 0
+    '''
+    numerator, denominator = 0.0, 0.0
+    for axis in range(3):
+        numerator += normal[axis] * (mapPos[axis] + max(0, normal[axis]) - origin[axis])
+        denominator += normal[axis] * direction[axis]
+
+    if denominator == 0:
+        return 0.0
+    return numerator / denominator
+
+@njit(cache = True)
+def getCenterDistance(origin, mapPos):
+    '''
+    Get the distance from a ray's origin to the center of a voxel
+    '''
+    distanceSquared = 0.0
+    for axis in range(3):
+        distanceSquared += (mapPos[axis] + 0.5 - origin[axis]) ** 2
+    return np.sqrt(distanceSquared)
+
+@njit(cache = True)
+def castRay(worldArray, brickArray, worldOrigin, origin, direction, maxRange, maxSteps):
+    '''
+    Cast a ray the way rayMarch in World.comp does (clamped direction, empty bricks skipped in one step, at most maxSteps steps, and positions wrapped into the world window) and stop at the first voxel whose center is maxRange or more from the origin (np.inf for no limit). Returns whether a voxel was hit, its map position, the normal vector, the t value, and the voxel ID
+    '''
+    direction = clampDirection(direction)
+    rayDirSign, mapPos, deltaDist, rayStep, initSideDist = initDDA(origin, direction)
+    stepCounts, mask = np.zeros(3, np.int64), np.zeros(3, np.int64)
+
+    for _ in range(maxSteps):
+        if getCenterDistance(origin, mapPos) >= maxRange or leavingWindow(worldArray, worldOrigin, mapPos, rayStep):
+            break
+
+        if windowBrickEmpty(worldArray, brickArray, worldOrigin, mapPos):
+            brickStep(mapPos, stepCounts, initSideDist, deltaDist, rayStep, mask)
+            continue
+
+        voxelID = getWindowVoxel(worldArray, worldOrigin, mapPos)
+        if voxelID == EMPTY_VOXEL:
+            ddaStep(mapPos, stepCounts, initSideDist, deltaDist, rayStep, mask)
+            continue
+
+        normal = (-rayDirSign * mask).astype(np.int64)
+        return True, mapPos, normal, getHitDistance(origin, direction, mapPos, normal), voxelID
+
+    return False, mapPos, np.zeros(3, np.int64), 0.0, EMPTY_VOXEL
+
+@njit(parallel = True, cache = True)
+def castRays(worldArray, brickArray, worldOrigin, origins, directions, maxRange, maxSteps):
+    '''
+    Cast a batch of rays (an (N, 3) array each of origins and directions) in parallel with castRay. Returns whether each ray hit a voxel and the map position, normal vector, t value (the hit point is origin + t * direction), and voxel ID of its hit
+    '''
+    numRays = origins.shape[0]
+    hits = np.zeros(numRays, np.bool_)
+    mapPositions, normals = np.zeros((numRays, 3), np.int64), np.zeros((numRays, 3), np.int64)
+    distances, voxelIDs = np.zeros(numRays, np.float64), np.zeros(numRays, np.uint8)
+
+    for i in prange(numRays):
+        hits[i], mapPositions[i], normals[i], distances[i], voxelIDs[i] = castRay(worldArray, brickArray, worldOrigin, origins[i], directions[i], maxRange, maxSteps)
+
+    return hits, mapPositions, normals, distances, voxelIDs
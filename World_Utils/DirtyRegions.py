@@ -0,0 +1,104 @@
+from Settings import *
+
+class DirtyRegions:
+    '''
+    Keep track of which cells (chunks or bricks) of the world have been edited since the last upload and merge them into as few boxes as possible so that only those sub-volumes get sent to the GPU
+    '''
+    def __init__(self, worldSize, cellSize = CHUNK_SIZE):
+        self.worldSize, self.cellSize = tuple(int(size) for size in worldSize), cellSize
+        self.cells = set()
+
+    def __bool__(self):
+        return len(self.cells) > 0
+
+    def markVoxel(self, mapPos):
+        '''
+        Mark the cell holding a map position as dirty
+        '''
+        self.cells.add((int(mapPos[X_INDEX]) // self.cellSize, int(mapPos[Y_INDEX]) // self.cellSize, int(mapPos[Z_INDEX]) // self.cellSize))
+
+    def markVoxels(self, positions):
+        '''
+        Mark the cells holding many map positions (a tuple of x, y and z arrays) as dirty
+        '''
+        cells = np.unique(np.stack([np.asarray(position) // self.cellSize for position in positions], axis = 1), axis = 0)
+        self.cells.update(map(tuple, cells.tolist()))
+
+    def markBox(self, minPos, maxPos):
+        '''
+        Mark every cell overlapping the box [minPos, maxPos) as dirty
+        '''
+        minCell = [max(int(minPos[axis]), 0) // self.cellSize for axis in range(3)]
+        maxCell = [(min(int(maxPos[axis]), self.worldSize[axis]) - 1) // self.cellSize for axis in range(3)]
+
+        for cellX in range(minCell[X_INDEX], maxCell[X_INDEX] + 1):
+            for cellY in range(minCell[Y_INDEX], maxCell[Y_INDEX] + 1):
+                for cellZ in range(minCell[Z_INDEX], maxCell[Z_INDEX] + 1):
+                    self.cells.add((cellX, cellY, cellZ))
+
+    def markAll(self):
+        '''
+        Mark the whole world as dirty
+        '''
+        self.markBox((0, 0, 0), self.worldSize)
+
+    def popCells(self):
+        '''
+        Return the dirty cells and clear them
+        '''
+        cells, self.cells = self.cells, set()
+        return cells
+
+    @staticmethod
+    def mergeRuns(boxes, axis):
+        '''
+        Merge boxes that touch along an axis and share the same extent on the other two axes. Boxes are (minCell, maxCell) pairs with an exclusive maxCell
+        '''
+        otherAxes = [otherAxis for otherAxis in range(3) if otherAxis != axis]
+        key = lambda box: tuple(box[0][i] for i in otherAxes) + tuple(box[1][i] for i in otherAxes) + (box[0][axis],)
+
+        merged = []
+        for box in sorted(boxes, key = key):
+            if merged and key(merged[-1])[:-1] == key(box)[:-1] and merged[-1][1][axis] == box[0][axis]:
+                prevMin, prevMax = merged[-1]
+                prevMax = list(prevMax)
+                prevMax[axis] = box[1][axis]
+                merged[-1] = (prevMin, tuple(prevMax))
+            else:
+                merged.append(box)
+        return merged
+
+    def mergeCells(self):
+        '''
+        Merge the dirty cells into boxes (first into runs along z because that is the contiguous axis of the world array, then along y, then along x)
+        '''
+        boxes = [(cell, (cell[X_INDEX] + 1, cell[Y_INDEX] + 1, cell[Z_INDEX] + 1)) for cell in self.cells]
+        for axis in (Z_INDEX, Y_INDEX, X_INDEX):
+            boxes = self.mergeRuns(boxes, axis)
+        return boxes
+
+    def popBoxes(self):
+        '''
+        Return the merged dirty boxes in map positions (clipped to the world) and clear the dirty cells
+        '''
+        boxes = []
+        for minCell, maxCell in self.mergeCells():
+            minPos = tuple(minCell[axis] * self.cellSize for axis in range(3))
+            maxPos = tuple(min(maxCell[axis] * self.cellSize, self.worldSize[axis]) for axis in range(3))
+            boxes.append((minPos, maxPos))
+
+        self.cells.clear()
+        return boxes
+
+def writeRegions(texture, array, boxes):
+    '''
+    Write the boxes of a 3D array to the matching sub-volumes of a 3D texture and return the number of bytes written. The texture's x and z axes are swapped relative to the array because the z axis is contiguous (see convertToImagePos in World.comp)
+    '''
+    writtenBytes = 0
+    for minPos, maxPos in boxes:
+        region = np.ascontiguousarray(array[minPos[X_INDEX]:maxPos[X_INDEX], minPos[Y_INDEX]:maxPos[Y_INDEX], minPos[Z_INDEX]:maxPos[Z_INDEX]])
+
+        sizeX, sizeY, sizeZ = np.shape(region)
+        texture.write(region, viewport = (minPos[Z_INDEX], minPos[Y_INDEX], minPos[X_INDEX], sizeZ, sizeY, sizeX))
+        writtenBytes += region.nbytes
+    return writtenBytes
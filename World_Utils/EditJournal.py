@@ -0,0 +1,188 @@
+from Settings import *
+import glob
+import struct
+
+JOURNAL_MAGIC = b'VXJL'
+JOURNAL_VERSION = 2
+JOURNAL_EXTENSION = '.journal'
+JOURNAL_ORPHAN_EXTENSION = '.orphaned' # Journal files of another world are renamed to this instead of being replayed
+JOURNAL_BATCH_SIZE = 4096 # Records buffered before they're written without waiting for the flush interval
+
+# Magic, version, world size (x, y, z), seed (-1 when unknown), whether the records are edits on top of a save (0 when they're on top of the generated world)
+JOURNAL_HEADER = struct.Struct('<4sI3IqI')
+
+JOURNAL_RECORD_DTYPE = np.dtype([
+    ('mapPos', '<i4', 3),
+    ('oldID', 'u1'),
+    ('newID', 'u1'),
+    ('padding', 'u1', 2),
+    ('sequence', '<u8')
+])
+
+def readJournalHeader(filePath):
+    '''
+    Read the header of a journal file (None if it's missing or isn't a journal file)
+    '''
+    if not os.path.isfile(filePath) or os.path.getsize(filePath) < JOURNAL_HEADER.size:
+        return None
+
+    with open(filePath, 'rb') as file:
+        magic, version, sizeX, sizeY, sizeZ, seed, onSave = JOURNAL_HEADER.unpack(file.read(JOURNAL_HEADER.size))
+    if magic != JOURNAL_MAGIC or version != JOURNAL_VERSION:
+        return None
+    return {'worldSize': (sizeX, sizeY, sizeZ), 'seed': None if seed < 0 else seed, 'onSave': bool(onSave)}
+
+def getSegmentPaths(filePath):
+    '''
+    Get the paths of the rotated segments of a journal in the order they were written
+    '''
+    segmentPaths = [path for path in glob.glob(f'{glob.escape(filePath)}.*') if path.rsplit('.', 1)[1].isdigit()]
+    return sorted(segmentPaths, key = lambda path: int(path.rsplit('.', 1)[1]))
+
+def readGeneratedJournalHeader(filePath):
+    '''
+    Read the header of the oldest file of a journal if its records are edits on top of the generated world, which means the world crashed before its first save was written and has to be generated again from the header's seed (None otherwise, for example when the save was deleted)
+    '''
+    headers = [header for header in map(readJournalHeader, getSegmentPaths(filePath) + [filePath]) if header is not None]
+    if not headers or headers[0]['onSave']:
+        return None
+    return headers[0]
+
+def readJournalRecords(filePath):
+    '''
+    Read the records of a journal file. A record that was only partly written when the process died is ignored
+    '''
+    with open(filePath, 'rb') as file:
+        file.seek(JOURNAL_HEADER.size)
+        data = file.read()
+    numRecords = len(data) // JOURNAL_RECORD_DTYPE.itemsize
+    return np.frombuffer(data[:numRecords * JOURNAL_RECORD_DTYPE.itemsize], JOURNAL_RECORD_DTYPE)
+
+class EditJournal:
+    '''
+    Append-only write-ahead log of voxel edits next to the save. Every edit is a fixed width record (map position, old voxel ID, new voxel ID, sequence number) buffered in memory and written to the file in batches, so a crash loses at most the edits since the last flush instead of everything since the last save. A save rotates the active file into a numbered segment before it snapshots the world and deletes the segments once it's written, so the journal only ever holds the edits the save doesn't have yet (replaying a record the save already has writes the same voxel again, so a crash between the two steps is harmless). onSave tells whether the world the journal is opened on was loaded from a save or generated
+    '''
+    def __init__(self, filePath, worldSize, seed, onSave = True, flushInterval = JOURNAL_FLUSH_INTERVAL, batchSize = JOURNAL_BATCH_SIZE):
+        self.filePath, self.worldSize, self.seed = filePath, tuple(int(size) for size in worldSize), seed
+        self.onSave = onSave
+        self.flushInterval, self.batchSize = flushInterval, batchSize
+
+        self.buffer = [] # Records as tuples (turned into one array when they're written, which is much faster than filling an array one record at a time)
+        self.sequence = 0
+        self.lastFlushTime = time.perf_counter()
+        self.file = None
+
+        segmentPaths = self.getSegmentPaths()
+        self.nextSegment = int(segmentPaths[-1].rsplit('.', 1)[1]) + 1 if segmentPaths else 0 # Counted here because the save worker deletes segments while play continues
+
+    def getSegmentPaths(self):
+        '''
+        Get the paths of the rotated segments in the order they were written
+        '''
+        return getSegmentPaths(self.filePath)
+
+    def read(self):
+        '''
+        Read every record of the segments and the active file (oldest first) that belongs to this world. Files of another world (a different size or seed, or edits on top of a save when the world was generated and no file before them started from the generated world) are renamed out of the way instead. The sequence numbers of new records continue after the last one read
+        '''
+        records, afterGenerated = [], False
+        for path in self.getSegmentPaths() + [self.filePath]:
+            header = readJournalHeader(path)
+            if header is None:
+                continue
+            if header['worldSize'] != self.worldSize or header['seed'] != self.seed or (header['onSave'] and not self.onSave and not afterGenerated):
+                os.replace(path, path + JOURNAL_ORPHAN_EXTENSION)
+                continue
+            afterGenerated = afterGenerated or not header['onSave']
+            records.append(readJournalRecords(path))
+
+        records = np.concatenate(records) if records else np.zeros(0, JOURNAL_RECORD_DTYPE)
+        if len(records):
+            self.sequence = max(self.sequence, int(records['sequence'].max()) + 1)
+        return records
+
+    def open(self):
+        '''
+        Open the active file for appending (a missing or foreign file is started over with a new header)
+        '''
+        header = readJournalHeader(self.filePath)
+        if header is None or header['worldSize'] != self.worldSize or header['seed'] != self.seed:
+            with open(self.filePath, 'wb') as file:
+                file.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, *self.worldSize, -1 if self.seed is None else int(self.seed), self.onSave))
+        elif (os.path.getsize(self.filePath) - JOURNAL_HEADER.size) % JOURNAL_RECORD_DTYPE.itemsize:
+            with open(self.filePath, 'r+b') as file: # Cut off a partly written record so the next records line up
+                file.truncate(os.path.getsize(self.filePath) - (os.path.getsize(self.filePath) - JOURNAL_HEADER.size) % JOURNAL_RECORD_DTYPE.itemsize)
+        self.file = open(self.filePath, 'ab')
+
+    def append(self, mapPos, oldID, newID):
+        '''
+        Buffer the record of one edit (written once the batch is full or the flush interval passed)
+        '''
+        self.buffer.append(((int(mapPos[X_INDEX]), int(mapPos[Y_INDEX]), int(mapPos[Z_INDEX])), oldID, newID, (0, 0), self.sequence))
+        self.sequence += 1
+        if len(self.buffer) == self.batchSize:
+            self.flush()
+
+    def appendMany(self, positions, oldIDs, newIDs):
+        '''
+        Write the records of many edits at once (positions is a tuple of x, y and z arrays, like np.nonzero gives)
+        '''
+        records = np.zeros(len(oldIDs), JOURNAL_RECORD_DTYPE)
+        for axis in range(3):
+            records['mapPos'][:, axis] = positions[axis]
+        records['oldID'], records['newID'] = oldIDs, newIDs
+        records['sequence'] = np.arange(self.sequence, self.sequence + len(records), dtype = 'u8')
+        self.sequence += len(records)
+
+        self.flush()
+        self.file.write(records.tobytes())
+        self.file.flush()
+
+    def flush(self):
+        '''
+        Write the buffered records to the file (handed to the operating system, so they survive the process being killed)
+        '''
+        self.lastFlushTime = time.perf_counter()
+        if not self.buffer:
+            return
+        self.file.write(np.array(self.buffer, JOURNAL_RECORD_DTYPE).tobytes())
+        self.file.flush()
+        self.buffer = []
+
+    def flushDue(self):
+        '''
+        Flush the buffered records if the flush interval has passed (once per frame)
+        '''
+        if self.buffer and time.perf_counter() - self.lastFlushTime >= self.flushInterval:
+            self.flush()
+
+    def rotate(self):
+        '''
+        Move the records so far into a new numbered segment and start an empty active file (right before a save snapshots the world). Returns the number of the segment
+        '''
+        self.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+        segment, self.nextSegment = self.nextSegment, self.nextSegment + 1
+        os.replace(self.filePath, f'{self.filePath}.{segment}')
+        self.onSave = True # The records from here on are edits on top of the save being snapshotted
+        self.open()
+        return segment
+
+    def removeSegments(self, lastSegment):
+        '''
+        Delete the segments up to and including a segment once a save holding their edits has been written
+        '''
+        for path in self.getSegmentPaths():
+            if int(path.rsplit('.', 1)[1]) <= lastSegment:
+                try:
+                    os.remove(path)
+                except FileNotFoundError: # Already removed by the save callback
+                    pass
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
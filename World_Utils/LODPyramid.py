@@ -0,0 +1,152 @@
+from Settings import *
+from numba import prange
+from DDA import *
+from ColumnRLE import *
+
+def downsample(voxels):
+    '''
+    Downsample a box of voxels (with even sizes) by 2 on every axis. A cell is empty if its 8 children are and otherwise holds its most common non-empty child (the first one in x, y, z order on ties). The minimum and maximum of every cell's children are reduced one axis at a time, and only the cells where they differ (a small part of a generated world) gather and count their children
+    '''
+    numCells = tuple(size // 2 for size in voxels.shape)
+    lowest, highest = voxels, voxels
+    for axis in range(3):
+        evenSlices, oddSlices = (tuple(slice(start, None, 2) if index == axis else slice(None) for index in range(3)) for start in (0, 1))
+        lowest, highest = np.minimum(lowest[evenSlices], lowest[oddSlices]), np.maximum(highest[evenSlices], highest[oddSlices])
+
+    cells = np.ascontiguousarray(highest)
+    mixed = np.nonzero(lowest != highest)
+    children = voxels.reshape(numCells[X_INDEX], 2, numCells[Y_INDEX], 2, numCells[Z_INDEX], 2)[mixed[X_INDEX], :, mixed[Y_INDEX], :, mixed[Z_INDEX], :].reshape(-1, 8)
+
+    counts = np.zeros(children.shape, np.int8)
+    for child in range(8):
+        counts += children == children[:, child:child + 1]
+    counts[children == EMPTY_VOXEL] = -1
+    cells[mixed] = children[np.arange(len(children)), np.argmax(counts, axis = -1)]
+    return cells
+
+def getRepresentative(children):
+    '''
+    Get the cell value of a list of 8 children (the same rule as downsample for one cell)
+    '''
+    solidChildren = [child for child in children if child != EMPTY_VOXEL]
+    if not solidChildren:
+        return EMPTY_VOXEL
+    return max(solidChildren, key = children.count)
+
+@njit(cache = True)
+def lodTraversal(levels, origin, direction, maxDistance, maxSteps, lodDistance):
+    '''
+    Reference DDA over the LOD pyramid (levels is the world array followed by the downsampled levels). Inside lodDistance it walks voxel by voxel exactly like denseTraversal, and every time the distance doubles after that it restarts the DDA one level coarser from the point the ray reached, so a far ray crosses 2x, 4x and then 8x cells per step. A non-empty cell counts as a hit with its representative voxel, so a hit is never further than the dense hit (every cell the ray passes through is checked at some level). Returns whether a cell was hit, its level, the map position of its first voxel, its voxel ID, the distance the ray entered it at, and the number of steps taken
+    '''
+    direction = clampDirection(direction)
+    unitDirection = direction / np.sqrt(np.sum(direction ** 2))
+    numLevels = len(levels)
+    tStart, steps = 0.0, 0
+
+    for level in range(numLevels):
+        tEnd = lodDistance * 2 ** level if level < numLevels - 1 else np.inf
+        scale = 2 ** level
+        cells = levels[level]
+
+        rayDirSign, mapPos, deltaDist, rayStep, initSideDist = initDDA((origin + unitDirection * tStart) / scale, direction)
+        stepCounts, mask = np.zeros(3, np.int64), np.zeros(3, np.int64)
+        tEntry = 0.0
+
+        while steps < maxSteps:
+            t = tStart + tEntry * scale
+            if t > maxDistance:
+                return False, level, mapPos * scale, EMPTY_VOXEL, t, steps
+            if t >= tEnd:
+                break
+
+            voxelID = getVoxel(cells, mapPos)
+            if voxelID != EMPTY_VOXEL:
+                return True, level, mapPos * scale, voxelID, t, steps
+
+            tEntry = ddaStep(mapPos, stepCounts, initSideDist, deltaDist, rayStep, mask)
+            steps += 1
+
+        if steps >= maxSteps:
+            return False, level, mapPos * scale, EMPTY_VOXEL, tStart + tEntry * scale, steps
+        tStart = tEnd
+
+    return False, numLevels - 1, np.zeros(3, np.int64), EMPTY_VOXEL, np.inf, steps
+
+@njit(parallel = True, cache = True)
+def compareLODTraversal(levels, origins, directions, maxDistance, maxSteps, lodDistance):
+    '''
+    Trace every ray with both the dense DDA and the LOD traversal. Returns whether each of them hit, the distances of their hits, their step counts, and the level of every LOD hit
+    '''
+    numRays = origins.shape[0]
+    denseHits, lodHits = np.zeros(numRays, np.bool_), np.zeros(numRays, np.bool_)
+    denseDistances, lodDistances = np.zeros(numRays, np.float64), np.zeros(numRays, np.float64)
+    denseSteps, lodSteps, lodLevels = np.zeros(numRays, np.int64), np.zeros(numRays, np.int64), np.zeros(numRays, np.int64)
+
+    for i in prange(numRays):
+        denseHits[i], _, _, denseDistances[i], denseSteps[i] = denseTraversal(levels[0], origins[i], directions[i], maxDistance, maxSteps)
+        lodHits[i], lodLevels[i], _, _, lodDistances[i], lodSteps[i] = lodTraversal(levels, origins[i], directions[i], maxDistance, maxSteps, lodDistance)
+
+    return denseHits, denseDistances, denseSteps, lodHits, lodDistances, lodSteps, lodLevels
+
+class LODPyramid:
+    '''
+    Mip pyramid of the voxel grid for far-field traversal: level l has one cell per 2^l voxels on a side that's empty if all of its voxels are and otherwise holds a representative voxel ID (the most common one of its non-empty children). It's built from slabs of the world with NumPy reductions and kept up to date on edits by recomputing only the ancestors of the changed voxels
+    '''
+    def __init__(self, worldSize, numLevels = LOD_LEVELS):
+        self.worldSize = tuple(int(size) for size in worldSize)
+        self.cellSize = 2 ** numLevels # Boxes are rebuilt aligned to the coarsest cells
+        self.levels = [np.zeros(tuple(size >> level for size in self.worldSize), 'u1') for level in range(1, numLevels + 1)]
+
+    def writeBox(self, minPos, voxels):
+        '''
+        Downsample a box of voxels whose corner and sizes are multiples of the coarsest cell size into every level
+        '''
+        for level, cells in enumerate(self.levels, 1):
+            voxels = downsample(voxels)
+            cellMin = tuple(int(minPos[axis]) >> level for axis in range(3))
+            cells[cellMin[X_INDEX]:cellMin[X_INDEX] + voxels.shape[X_INDEX], cellMin[Y_INDEX]:cellMin[Y_INDEX] + voxels.shape[Y_INDEX], cellMin[Z_INDEX]:cellMin[Z_INDEX] + voxels.shape[Z_INDEX]] = voxels
+
+    def build(self, worldArray, chunkState):
+        '''
+        Build every level from the world array one slab of chunks at a time, only reading the heights that hold non-empty chunks (a column RLE world is decoded one slab at a time)
+        '''
+        for cells in self.levels:
+            cells[:] = EMPTY_VOXEL
+
+        slabs = worldArray.iterSlabs() if isColumnRLE(worldArray) else ((xStart, worldArray[xStart:xStart + CHUNK_SIZE]) for xStart in range(0, self.worldSize[X_INDEX], CHUNK_SIZE))
+        for xStart, slab in slabs:
+            filledChunksY = np.flatnonzero(np.any(chunkState[xStart // CHUNK_SIZE] != EMPTY_CHUNK, axis = -1))
+            if len(filledChunksY) == 0:
+                continue
+
+            minY, maxY = filledChunksY[0] * CHUNK_SIZE, (filledChunksY[-1] + 1) * CHUNK_SIZE
+            self.writeBox((xStart, minY, 0), np.asarray(slab[:, minY:maxY]))
+
+    def rebuildRegion(self, worldArray, minPos, maxPos):
+        '''
+        Rebuild the cells over the box [minPos, maxPos) of the world array (grown to the coarsest cells, whose voxels are all its ancestors depend on)
+        '''
+        minPos = tuple(int(minPos[axis]) // self.cellSize * self.cellSize for axis in range(3))
+        maxPos = tuple(min(-(-int(maxPos[axis]) // self.cellSize) * self.cellSize, self.worldSize[axis]) for axis in range(3))
+        self.writeBox(minPos, np.asarray(worldArray[minPos[X_INDEX]:maxPos[X_INDEX], minPos[Y_INDEX]:maxPos[Y_INDEX], minPos[Z_INDEX]:maxPos[Z_INDEX]]))
+
+    def update(self, worldArray, mapPos):
+        '''
+        Recompute the ancestors of a voxel after it's written, from the finest level up (the ancestors above a cell that didn't change can't change either)
+        '''
+        finer = worldArray
+        for level, cells in enumerate(self.levels, 1):
+            cellPos = tuple(int(mapPos[axis]) >> level for axis in range(3))
+            initX, initY, initZ = (cellPos[axis] * 2 for axis in range(3))
+            cellID = getRepresentative(np.asarray(finer[initX:initX + 2, initY:initY + 2, initZ:initZ + 2]).ravel().tolist())
+            if cells[cellPos] == cellID:
+                return
+
+            cells[cellPos] = cellID
+            finer = cells
+
+    def getLevels(self, worldArray):
+        '''
+        Get the world array and the levels as one tuple for lodTraversal
+        '''
+        return (np.ascontiguousarray(worldArray), *self.levels)
@@ -0,0 +1,141 @@
+from Settings import *
+import itertools
+
+LIGHT_GRID_RADIUS = 1 # Cells along every axis around a light's cell that can list the light
+
+GRID_LIGHT_DTYPE = np.dtype([
+    ('mapPos', 'i4', 3),
+    ('voxelID', 'i4'),
+    ('weight', 'f4'),
+    ('padding', 'f4', 3)
+])
+
+@njit(cache = True)
+def getLightCell(point, cellSize, gridSize):
+    '''
+    Get the index of the light grid cell that a point is in (the grid wraps around like the world image does in streaming mode)
+    '''
+    cellX = int(np.floor(point[X_INDEX] / cellSize)) % gridSize[X_INDEX]
+    cellY = int(np.floor(point[Y_INDEX] / cellSize)) % gridSize[Y_INDEX]
+    cellZ = int(np.floor(point[Z_INDEX] / cellSize)) % gridSize[Z_INDEX]
+    return (cellX * gridSize[Y_INDEX] + cellY) * gridSize[Z_INDEX] + cellZ
+
+class LightGrid:
+    '''
+    Coarse grid over the world where every cell lists the brightest lights of the cells around it (up to a capacity), weighted by the intensity of the light's colour times its falloff over the cell, the mean of the inverse squared distances from the light to the nearest and furthest points of the cell. The weights are stored as running sums so direct lighting can pick a light in proportion to its weight and look up the probability of any light it picked. A light edit only rebuilds the cells around the light, and only those cells are written to the buffer
+    '''
+    def __init__(self, worldSize, colors, lights = None, cellSize = LIGHT_CELL_SIZE, capacity = LIGHT_CELL_CAPACITY):
+        self.cellSize, self.capacity = cellSize, capacity
+        self.gridSize = tuple(-(-int(size) // cellSize) for size in worldSize)
+        self.intensities = np.linalg.norm(np.asarray(colors, np.float64), axis = 1) # Indexed by voxel ID - 1 like the materials
+        self.array = np.zeros((int(np.prod(self.gridSize)), capacity), GRID_LIGHT_DTYPE)
+
+        self.cellLights = {} # Map cell to the lights (map position to voxel ID) in it
+        self.dirtyCells = set()
+        self.buffer = None
+
+        if lights is not None:
+            for mapPos, voxelID in lights.items():
+                self.addLight(mapPos, voxelID)
+
+    def getMapCell(self, mapPos):
+        return tuple(int(axis) // self.cellSize for axis in mapPos)
+
+    def markNeighbours(self, mapCell):
+        '''
+        Mark the cells that can list the lights of a cell for rebuilding
+        '''
+        for offset in itertools.product(range(-LIGHT_GRID_RADIUS, LIGHT_GRID_RADIUS + 1), repeat = 3):
+            self.dirtyCells.add((mapCell[X_INDEX] + offset[X_INDEX], mapCell[Y_INDEX] + offset[Y_INDEX], mapCell[Z_INDEX] + offset[Z_INDEX]))
+
+    def markRegion(self, startPos, endPos):
+        '''
+        Mark every cell that overlaps a box of map positions (end exclusive) for rebuilding, such as a chunk column that was streamed into cells that held other columns
+        '''
+        startCell, endCell = self.getMapCell(startPos), self.getMapCell(np.subtract(endPos, 1))
+        self.dirtyCells.update(itertools.product(*(range(startCell[i], endCell[i] + 1) for i in range(3))))
+
+    def addLight(self, mapPos, voxelID):
+        '''
+        Add a light or change the voxel ID of an existing one
+        '''
+        mapPos = tuple(int(axis) for axis in mapPos)
+        mapCell = self.getMapCell(mapPos)
+        self.cellLights.setdefault(mapCell, {})[mapPos] = int(voxelID)
+        self.markNeighbours(mapCell)
+
+    def removeLight(self, mapPos):
+        mapPos = tuple(int(axis) for axis in mapPos)
+        mapCell = self.getMapCell(mapPos)
+        self.cellLights[mapCell].pop(mapPos)
+        if not self.cellLights[mapCell]:
+            del self.cellLights[mapCell]
+        self.markNeighbours(mapCell)
+
+    def getCellIndex(self, mapCell):
+        return int(np.ravel_multi_index(tuple(np.mod(mapCell, self.gridSize)), self.gridSize))
+
+    def rebuildCell(self, mapCell):
+        '''
+        List the brightest lights (by weight, ties broken by position so the order never depends on the edit history) of the cells around a cell
+        '''
+        cellEntries = self.array[self.getCellIndex(mapCell)]
+        cellEntries[:] = 0
+
+        candidates = []
+        for offset in itertools.product(range(-LIGHT_GRID_RADIUS, LIGHT_GRID_RADIUS + 1), repeat = 3):
+            candidates += self.cellLights.get((mapCell[X_INDEX] + offset[X_INDEX], mapCell[Y_INDEX] + offset[Y_INDEX], mapCell[Z_INDEX] + offset[Z_INDEX]), {}).items()
+        if not candidates:
+            return
+
+        positions = np.array([mapPos for mapPos, _ in candidates], np.int64)
+        voxelIDs = np.array([voxelID for _, voxelID in candidates], np.int64)
+
+        cellMin = np.array(mapCell) * self.cellSize
+        lightCenters = positions + 0.5
+        nearDistanceSquared = np.sum((lightCenters - np.clip(lightCenters, cellMin, cellMin + self.cellSize)) ** 2, axis = 1)
+        farDistanceSquared = np.sum(np.maximum(np.abs(lightCenters - cellMin), np.abs(lightCenters - cellMin - self.cellSize)) ** 2, axis = 1)
+        weights = self.intensities[voxelIDs - 1] * (1 / np.maximum(nearDistanceSquared, 1) + 1 / farDistanceSquared) / 2 # The near bound is clamped so a light inside the cell doesn't get an infinite weight
+
+        order = np.lexsort((positions[:, Z_INDEX], positions[:, Y_INDEX], positions[:, X_INDEX], -weights))[:self.capacity]
+        numEntries = len(order)
+        cellEntries['mapPos'][:numEntries] = positions[order]
+        cellEntries['voxelID'][:numEntries] = voxelIDs[order]
+        cellEntries['weight'][:numEntries] = np.cumsum(weights[order])
+        cellEntries['weight'][numEntries:] = cellEntries['weight'][numEntries - 1] # Empty entries repeat the total so they can never be picked
+
+    def update(self, worldOrigin = (0, 0, 0)):
+        '''
+        Rebuild the marked cells that are inside the world (the streaming window in streaming mode, starting at worldOrigin). Returns the indices of the rebuilt cells
+        '''
+        originCell = self.getMapCell(worldOrigin)
+        cellIndices = []
+        for mapCell in self.dirtyCells:
+            if all(0 <= mapCell[i] - originCell[i] < self.gridSize[i] for i in range(3)):
+                self.rebuildCell(mapCell)
+                cellIndices.append(self.getCellIndex(mapCell))
+
+        self.dirtyCells.clear()
+        return cellIndices
+
+    def upload(self, ctx, worldOrigin = (0, 0, 0), binding = 3):
+        '''
+        Rebuild the marked cells and write them to the SSBO (all of the cells the first time), merging neighbouring cells into one write. Returns the number of bytes written
+        '''
+        cellIndices = sorted(self.update(worldOrigin))
+        if self.buffer is None:
+            self.buffer = ctx.buffer(self.array)
+            self.buffer.bind_to_storage_buffer(binding)
+            return self.array.nbytes
+
+        cellBytes = self.capacity * GRID_LIGHT_DTYPE.itemsize
+        uploadedBytes, runStart = 0, 0
+        for i in range(1, len(cellIndices) + 1):
+            if i < len(cellIndices) and cellIndices[i] == cellIndices[i - 1] + 1:
+                continue
+
+            startCell, stopCell = cellIndices[runStart], cellIndices[i - 1] + 1
+            self.buffer.write(self.array[startCell:stopCell].tobytes(), offset = startCell * cellBytes)
+            uploadedBytes += (stopCell - startCell) * cellBytes
+            runStart = i
+        return uploadedBytes
@@ -0,0 +1,122 @@
+from Settings import *
+from Materials import *
+
+class LightTable:
+    '''
+    Array backed table of lights (map position to voxel ID) laid out like the light SSBO. A map position to slot index makes adding, changing and removing a light O(1): removing a light moves the last light into its slot so the lights stay packed at the front of the array. The array doubles when it's full, and only the slots that changed since the last upload are written to the buffer
+    '''
+    def __init__(self, capacity = 64):
+        self.array = np.zeros(max(int(capacity), 1), LIGHT_DTYPE)
+        self.numLights = 0
+        self.slots = {}
+        self.dirtySlots = set()
+        self.buffer, self.bufferCapacity = None, 0
+
+    @classmethod
+    def fromArray(cls, lightArray, lightIDs):
+        '''
+        Create a light table from a saved light array, keeping only the entries that are lights (legacy saves without lights hold a placeholder entry)
+        '''
+        lightArray = np.asarray(lightArray, LIGHT_DTYPE)
+        lightArray = lightArray[np.isin(lightArray['voxelID'], list(lightIDs))]
+
+        lightTable = cls(max(64, 2 * len(lightArray)))
+        lightTable.array[:len(lightArray)] = lightArray
+        lightTable.numLights = len(lightArray)
+        lightTable.slots = {tuple(mapPos): slot for slot, mapPos in enumerate(lightArray['mapPos'].tolist())}
+        return lightTable
+
+    def __len__(self):
+        return self.numLights
+
+    def __contains__(self, mapPos):
+        return tuple(mapPos) in self.slots
+
+    def __iter__(self):
+        return iter(list(self.slots))
+
+    def __getitem__(self, mapPos):
+        return int(self.array[self.slots[tuple(mapPos)]]['voxelID'])
+
+    def __setitem__(self, mapPos, voxelID):
+        '''
+        Add a light or change the voxel ID of an existing one
+        '''
+        mapPos = tuple(int(axis) for axis in mapPos)
+        slot = self.slots.get(mapPos)
+        if slot is None:
+            if self.numLights == len(self.array):
+                self.grow()
+            slot = self.numLights
+            self.slots[mapPos] = slot
+            self.numLights += 1
+            self.array[slot]['mapPos'] = mapPos
+
+        self.array[slot]['voxelID'] = voxelID
+        self.dirtySlots.add(slot)
+
+    def pop(self, mapPos):
+        '''
+        Remove a light and return its voxel ID (the last light moves into its slot)
+        '''
+        slot = self.slots.pop(tuple(mapPos))
+        voxelID = int(self.array[slot]['voxelID'])
+
+        lastSlot = self.numLights - 1
+        if slot != lastSlot:
+            self.array[slot] = self.array[lastSlot]
+            self.slots[tuple(self.array[slot]['mapPos'].tolist())] = slot
+            self.dirtySlots.add(slot)
+
+        self.numLights -= 1
+        return voxelID
+
+    def keys(self):
+        return self.slots.keys()
+
+    def items(self):
+        '''
+        Return every (map position, voxel ID) pair in slot order
+        '''
+        return [(tuple(mapPos), voxelID) for mapPos, voxelID in zip(self.array['mapPos'][:self.numLights].tolist(), self.array['voxelID'][:self.numLights].tolist())]
+
+    def grow(self):
+        '''
+        Double the capacity of the array (the buffer is reallocated on the next upload)
+        '''
+        array = np.zeros(2 * len(self.array), LIGHT_DTYPE)
+        array[:self.numLights] = self.array[:self.numLights]
+        self.array = array
+
+    def getArray(self):
+        '''
+        Get the view of the array that holds the lights
+        '''
+        return self.array[:self.numLights]
+
+    def upload(self, ctx, binding = 1):
+        '''
+        Write the slots that changed since the last upload to the SSBO, merging neighbouring slots into one write. The whole array is written when the buffer doesn't exist yet or the array grew. Returns the number of bytes written
+        '''
+        if self.buffer is None or self.bufferCapacity != len(self.array):
+            if self.buffer is not None:
+                self.buffer.release()
+            self.buffer, self.bufferCapacity = ctx.buffer(self.array), len(self.array)
+            self.buffer.bind_to_storage_buffer(binding)
+            self.dirtySlots.clear()
+            return self.array.nbytes
+
+        uploadedBytes = 0
+        dirtySlots = sorted(slot for slot in self.dirtySlots if slot < self.numLights) # Slots past the last light are never read
+        self.dirtySlots.clear()
+
+        runStart = 0
+        for i in range(1, len(dirtySlots) + 1):
+            if i < len(dirtySlots) and dirtySlots[i] == dirtySlots[i - 1] + 1:
+                continue
+
+            startSlot, stopSlot = dirtySlots[runStart], dirtySlots[i - 1] + 1
+            self.buffer.write(self.array[startSlot:stopSlot].tobytes(), offset = startSlot * LIGHT_DTYPE.itemsize)
+            uploadedBytes += (stopSlot - startSlot) * LIGHT_DTYPE.itemsize
+            runStart = i
+        return uploadedBytes
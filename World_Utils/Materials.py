@@ -1,4 +1,19 @@
 from Settings import *
+from World_Utils.Textures import Texture
+
+# Layouts of the material and light SSBOs (std430) that the CPU path tracer reads too
+MATERIAL_DTYPE = np.dtype([
+    ('color', 'f4', 3),
+    ('materialID', 'i4'),
+    ('materialParameter', 'f4'),
+    ('textureID', 'i4'),
+    ('padding', 'f4', 2)
+])
+
+LIGHT_DTYPE = np.dtype([
+    ('mapPos', 'i4', 3),
+    ('voxelID', 'i4')
+])
 
 class LambertianMaterial:
     '''
@@ -45,4 +60,46 @@ class PointLight:
     def record(self, renderArray, i):
         renderArray[i]['color'] = self.lightColor
         renderArray[i]['textureID'] = 0
-        renderArray[i]['materialID'] = 3
\ No newline at end of file
+        renderArray[i]['materialID'] = 3
+
+def createMaterialList():
+    '''
+    Create the list of materials (the voxel ID of a material is its index plus 1)
+    '''
+    materialList = []
+
+    materialList.append(LambertianMaterial(Texture('Grass')))
+    materialList.append(LambertianMaterial(Texture('Dirt')))
+    materialList.append(LambertianMaterial(Texture('Stone')))
+    materialList.append(LambertianMaterial(Texture('Sand')))
+    materialList.append(ReflectiveMaterial(Texture('Snow'), 0.5))
+    materialList.append(LambertianMaterial(Texture('Clay')))
+    materialList.append(LambertianMaterial(Texture('Wood')))
+    materialList.append(ReflectiveMaterial(Texture(glm.vec3(0.5)), 0))
+
+    materialList.append(PointLight(glm.vec3(15, 0.9, 0.9)))
+    materialList.append(PointLight(glm.vec3(0.9, 15, 0.9)))
+    materialList.append(PointLight(glm.vec3(0.9, 0.9, 15)))
+
+    materialList.append(DielectricMaterial(Texture(glm.vec3(1, 0.8, 0.8)), 1.52))
+    materialList.append(DielectricMaterial(Texture(glm.vec3(0.8, 1, 0.8)), 1.52))
+    materialList.append(DielectricMaterial(Texture(glm.vec3(0.8, 0.8, 1)), 1.52))
+    materialList.append(DielectricMaterial(Texture(glm.vec3(1)), 1.52))
+    return materialList
+
+def buildMaterialArray(materialList):
+    '''
+    Record every material into a numpy array with the layout of the material SSBO
+    '''
+    materialArray = np.empty(len(materialList), MATERIAL_DTYPE)
+    for i, material in enumerate(materialList):
+        material.record(materialArray, i)
+    return materialArray
+
+def buildLightArray(lights):
+    '''
+    Convert the lights (a dictionary or light table of map position to voxel ID) into a numpy array with the layout of the light SSBO. No lights give a single placeholder light because a buffer can't be empty (numLights stays 0 so it's never read)
+    '''
+    if len(lights) == 0:
+        return np.ones(1, LIGHT_DTYPE)
+    return np.array(list(lights.items()), LIGHT_DTYPE)
@@ -1,4 +1,103 @@
 from Settings import *
+from concurrent.futures import ThreadPoolExecutor
+from math import floor
+
+# 2D OpenSimplex noise (https://gist.github.com/KdotJPG/b1270127455a94ac5d19), kept here rather than imported from opensimplex's private internals so that the octaves can be fused into one Numba kernel. It gives exactly the values of OpenSimplex(seed).noise2
+STRETCH_CONSTANT, SQUISH_CONSTANT, NORM_CONSTANT = -0.211324865405187, 0.366025403784439, 47 # (1 / sqrt(3) - 1) / 2, (sqrt(3) - 1) / 2
+GRADIENTS = np.array([5, 2, 2, 5, -5, 2, -2, 5, 5, -2, 2, -5, -5, -2, -2, -5], np.int64) # Directions to the vertices of an octagon from its center
+
+def wrapInt64(value):
+    '''
+    Wrap a Python integer to a signed 64 bit integer (how the permutation seed overflows)
+    '''
+    return (value + 2 ** 63) % 2 ** 64 - 2 ** 63
+
+def buildPermutation(seed):
+    '''
+    Build the permutation table of a seed (the same one as OpenSimplex(seed))
+    '''
+    perm, source = np.zeros(256, np.int64), np.arange(256)
+    for _ in range(3):
+        seed = wrapInt64(seed * 6364136223846793005 + 1442695040888963407)
+    for i in range(255, -1, -1):
+        seed = wrapInt64(seed * 6364136223846793005 + 1442695040888963407)
+        r = (seed + 31) % (i + 1)
+        perm[i] = source[r]
+        source[r] = source[i]
+    return perm
+
+@njit(cache = True)
+def extrapolate(perm, xsb, ysb, dx, dy):
+    '''
+    Dot the offset from a lattice vertex with the vertex's gradient
+    '''
+    index = perm[(perm[xsb & 0xFF] + ysb) & 0xFF] & 0x0E
+    return GRADIENTS[index] * dx + GRADIENTS[index + 1] * dy
+
+@njit(cache = True)
+def noise2(x, y, perm):
+    '''
+    2D OpenSimplex noise at (x, y) in [-1, 1]
+    '''
+    # Place the position on the stretched grid and find the origin of its rhombus (stretched square) super-cell
+    stretchOffset = (x + y) * STRETCH_CONSTANT
+    xs, ys = x + stretchOffset, y + stretchOffset
+    xsb, ysb = floor(xs), floor(ys)
+
+    squishOffset = (xsb + ysb) * SQUISH_CONSTANT
+    xins, yins = xs - xsb, ys - ysb
+    inSum = xins + yins
+    dx0, dy0 = x - (xsb + squishOffset), y - (ysb + squishOffset) # Position relative to the origin
+
+    value = 0.0
+
+    # Contributions of (1, 0) and (0, 1)
+    dx1, dy1 = dx0 - 1 - SQUISH_CONSTANT, dy0 - SQUISH_CONSTANT
+    attn1 = 2 - dx1 * dx1 - dy1 * dy1
+    if attn1 > 0:
+        attn1 *= attn1
+        value += attn1 * attn1 * extrapolate(perm, xsb + 1, ysb, dx1, dy1)
+
+    dx2, dy2 = dx0 - SQUISH_CONSTANT, dy0 - 1 - SQUISH_CONSTANT
+    attn2 = 2 - dx2 * dx2 - dy2 * dy2
+    if attn2 > 0:
+        attn2 *= attn2
+        value += attn2 * attn2 * extrapolate(perm, xsb, ysb + 1, dx2, dy2)
+
+    # Pick the extra vertex from the triangle the position is in
+    if inSum <= 1: # Triangle at (0, 0)
+        zins = 1 - inSum
+        if zins > xins or zins > yins: # (0, 0) is one of the closest two vertices
+            if xins > yins:
+                xsvExt, ysvExt, dxExt, dyExt = xsb + 1, ysb - 1, dx0 - 1, dy0 + 1
+            else:
+                xsvExt, ysvExt, dxExt, dyExt = xsb - 1, ysb + 1, dx0 + 1, dy0 - 1
+        else: # (1, 0) and (0, 1) are the closest two vertices
+            xsvExt, ysvExt, dxExt, dyExt = xsb + 1, ysb + 1, dx0 - 1 - 2 * SQUISH_CONSTANT, dy0 - 1 - 2 * SQUISH_CONSTANT
+    else: # Triangle at (1, 1)
+        zins = 2 - inSum
+        if zins < xins or zins < yins: # (1, 1) is one of the closest two vertices
+            if xins > yins:
+                xsvExt, ysvExt, dxExt, dyExt = xsb + 2, ysb, dx0 - 2 - 2 * SQUISH_CONSTANT, dy0 - 2 * SQUISH_CONSTANT
+            else:
+                xsvExt, ysvExt, dxExt, dyExt = xsb, ysb + 2, dx0 - 2 * SQUISH_CONSTANT, dy0 - 2 - 2 * SQUISH_CONSTANT
+        else: # (1, 0) and (0, 1) are the closest two vertices
+            xsvExt, ysvExt, dxExt, dyExt = xsb, ysb, dx0, dy0
+        xsb, ysb = xsb + 1, ysb + 1
+        dx0, dy0 = dx0 - 1 - 2 * SQUISH_CONSTANT, dy0 - 1 - 2 * SQUISH_CONSTANT
+
+    # Contributions of (0, 0) or (1, 1) and the extra vertex
+    attn0 = 2 - dx0 * dx0 - dy0 * dy0
+    if attn0 > 0:
+        attn0 *= attn0
+        value += attn0 * attn0 * extrapolate(perm, xsb, ysb, dx0, dy0)
+
+    attnExt = 2 - dxExt * dxExt - dyExt * dyExt
+    if attnExt > 0:
+        attnExt *= attnExt
+        value += attnExt * attnExt * extrapolate(perm, xsvExt, ysvExt, dxExt, dyExt)
+
+    return value / NORM_CONSTANT
 
 @njit(cache = True)
 def shift(value):
@@ -21,25 +120,84 @@ def applyHeightRedistribution(elevation, fudgeFactor, redistribution):
     '''
     return (elevation * fudgeFactor) ** redistribution
 
-def generateHeightMap():
+NUM_OCTAVES, FUDGE_FACTOR, REDISTRIBUTION = 15, 1.2, 2.1
+NYQUIST_LIMIT = 0.5 # Octaves whose noise frequency per sample is at least this are aliased at the sampled resolution
+
+@njit(nogil = True, cache = True)
+def evaluateOctaves(perm, xCoords, zCoords, frequencies, amplitudes):
     '''
-    Generate a height map given all the possible x coordinates and z coordinates. Terrain generation with help from https://www.redblobgames.com/maps/terrain-from-noise/
+    Sum every octave of the noise at each (x, z) of a tile in one pass (heightMap[x, z] samples the noise at (z, x) like noise2array does). Releases the GIL so that tiles can be evaluated on separate threads
     '''
-    worldSize = CHUNK_SIZE * WORLD_SIZE_XZ
-    xCoords = zCoords = convertToNormalized(np.arange(worldSize), worldSize)
+    elevation = np.empty((xCoords.size, zCoords.size))
+    for i in range(xCoords.size):
+        for j in range(zCoords.size):
+            value = 0.0
+            for octave in range(frequencies.size):
+                value += amplitudes[octave] * shift(noise2(zCoords[j] * frequencies[octave], xCoords[i] * frequencies[octave], perm))
+            elevation[i, j] = value
+    return elevation
 
-    NUM_OCTAVES, FUDGE_FACTOR, REDISTRIBUTION = 15, 1.2, 2.1
+class HeightMapEngine:
+    '''
+    Height map generator that sums the noise octaves in one fused pass, drops octaves that are too fine for the sampled resolution, evaluates tiles on a thread pool, and can generate any sub-rectangle of the height map on its own. Terrain generation with help from https://www.redblobgames.com/maps/terrain-from-noise/
+    '''
+    def __init__(self, seed, worldSize = CHUNK_SIZE * WORLD_SIZE_XZ, numOctaves = NUM_OCTAVES, cullOctaves = True):
+        self.seed, self.worldSize = seed, worldSize
+        self.perm = buildPermutation(seed)
 
-    elevation = np.zeros((worldSize, worldSize))
-    amplitude, frequency, sumAmplitude = 1, 3, 0
-    for _ in range(NUM_OCTAVES):
-        elevation += amplitude * shift(generator.noise2array(xCoords * frequency, zCoords * frequency))
-        sumAmplitude += amplitude 
+        self.frequencies = 3 * 2.0 ** np.arange(numOctaves)
+        self.amplitudes = 0.5 ** np.arange(numOctaves)
+        self.sumAmplitude = np.sum(self.amplitudes)
 
-        amplitude *= 0.5
-        frequency *= 2
-    
-    elevation /= sumAmplitude
-    elevation = applyHeightRedistribution(elevation, FUDGE_FACTOR, REDISTRIBUTION)
+        samplesPerUnit = self.frequencies / (worldSize - 1)
+        self.activeOctaves = samplesPerUnit < NYQUIST_LIMIT if cullOctaves else np.ones(numOctaves, np.bool_)
+        self.culledConstant = np.sum(self.amplitudes[~self.activeOctaves]) / 2 # A culled octave is replaced by its mean (noise shifted to [0, 1] averages 0.5)
 
-    return elevation
\ No newline at end of file
+    def evaluate(self, xStart, xEnd, zStart, zEnd, octaves = None):
+        '''
+        Evaluate the raw (un-normalized) sum of the octaves over a sub-rectangle of the height map
+        '''
+        octaves = self.activeOctaves if octaves is None else octaves
+        xCoords = convertToNormalized(np.arange(xStart, xEnd), self.worldSize)
+        zCoords = convertToNormalized(np.arange(zStart, zEnd), self.worldSize)
+        return evaluateOctaves(self.perm, xCoords, zCoords, self.frequencies[octaves], self.amplitudes[octaves])
+
+    def finalize(self, elevation):
+        '''
+        Normalize the summed octaves and apply the height redistribution
+        '''
+        elevation = (elevation + self.culledConstant) / self.sumAmplitude
+        return applyHeightRedistribution(elevation, FUDGE_FACTOR, REDISTRIBUTION)
+
+    def generateRegion(self, xStart, xEnd, zStart, zEnd, tileSize = 256, numThreads = None):
+        '''
+        Generate the sub-rectangle [xStart, xEnd) x [zStart, zEnd) of the height map by splitting it into tiles that are evaluated in parallel
+        '''
+        elevation = np.empty((xEnd - xStart, zEnd - zStart))
+        tiles = [(x, min(x + tileSize, xEnd), z, min(z + tileSize, zEnd)) for x in range(xStart, xEnd, tileSize) for z in range(zStart, zEnd, tileSize)]
+        
+        def evaluateTile(tile):
+            tileXStart, tileXEnd, tileZStart, tileZEnd = tile
+            elevation[tileXStart - xStart:tileXEnd - xStart, tileZStart - zStart:tileZEnd - zStart] = self.evaluate(*tile)
+
+        numThreads = os.cpu_count() if numThreads is None else numThreads
+        if numThreads <= 1 or len(tiles) == 1:
+            for tile in tiles:
+                evaluateTile(tile)
+        else:
+            with ThreadPoolExecutor(numThreads) as executor:
+                list(executor.map(evaluateTile, tiles))
+
+        return self.finalize(elevation)
+
+    def generate(self, tileSize = 256, numThreads = None):
+        '''
+        Generate the whole height map
+        '''
+        return self.generateRegion(0, self.worldSize, 0, self.worldSize, tileSize, numThreads)
+
+def generateHeightMap(seed, worldSize = CHUNK_SIZE * WORLD_SIZE_XZ):
+    '''
+    Generate a height map given all the possible x coordinates and z coordinates (the same seed always gives the same height map)
+    '''
+    return HeightMapEngine(seed, worldSize).generate()
@@ -0,0 +1,455 @@
+from Settings import *
+from numba import prange
+from DDA import *
+from Materials import *
+from ColumnRLE import *
+from LightGrid import *
+from BlockTextures import *
+
+LAMBERTIAN, REFLECTIVE, DIELECTRIC, LIGHT = 0, 1, 2, 3 # Material IDs (the same as Materials.comp)
+RAY_ERROR_BOUND = 0.001
+TIME_ERROR_BOUND = 0.001
+TILE_SIZE = 16 # Pixels along each side of a tile (the unit of work handed to a thread)
+CPU_TEXTURE_SIZE = 64 # Mip level of the block texture faces that the CPU samples (a power of two up to TEXTURE_SIZE)
+
+def loadTextureFaces(size = CPU_TEXTURE_SIZE):
+    '''
+    Load the 6 cube map faces of every texture (in the order of their texture IDs) into one array for the CPU path tracer, from the mip level of the block textures that is size x size
+    '''
+    return BlockTextures().load().getFaces(size)
+
+def getBackgroundColors(time):
+    '''
+    Get the top and bottom colors of the background gradient for a time of day (the same as World.setTime)
+    '''
+    if time == 'Night':
+        return (0.01, 0.01, 0.01), (0.02, 0.02, 0.02)
+    elif time == 'Day':
+        return (1.0, 1.0, 1.0), (0.5, 0.7, 1.0)
+    elif time == 'Dawn':
+        return (0.3, 0.3, 0.3), (0.98, 0.48, 0.38)
+    raise RuntimeError('This day-night time does not exist!')
+
+def getCameraState(camera):
+    '''
+    Get the camera uniforms of the ray tracing compute shader (position, pixel deltas, and the first pixel's position) from a camera
+    '''
+    camera.calculateRenderValues()
+    return tuple(np.array(tuple(vector), np.float64) for vector in (camera.cameraPosition, camera.pixelDX, camera.pixelDY, camera.initPixelPos))
+
+@njit(cache = True)
+def tausStep(z, s1, s2, s3, m):
+    '''
+    Tausworthe step of the random number generator in Random.comp (on 32 bit values kept in int64s)
+    '''
+    b = (((z << s1) & 0xFFFFFFFF) ^ z) >> s2
+    return (((z & m) << s3) & 0xFFFFFFFF) ^ b
+
+@njit(cache = True)
+def rand(state):
+    '''
+    Random float from 0 to 1 that advances the state the same way as rand in Random.comp
+    '''
+    state[0] = tausStep(state[0], 13, 19, 12, 4294967294)
+    state[1] = tausStep(state[1], 2, 25, 4, 4294967288)
+    state[2] = tausStep(state[2], 3, 11, 17, 4294967280)
+    state[3] = (1664525 * state[3] + 1013904223) & 0xFFFFFFFF
+    return 2.3283064365387e-10 * (state[0] ^ state[1] ^ state[2] ^ state[3])
+
+@njit(cache = True)
+def boxMuller(state):
+    '''
+    Two normally distributed random numbers
+    '''
+    u0, u1 = rand(state), rand(state)
+    r, theta = np.sqrt(-2 * np.log(u0)), 2 * np.pi * u1
+    return r * np.sin(theta), r * np.cos(theta)
+
+@njit(cache = True)
+def randInt(state, minValue, maxValue):
+    '''
+    Random integer in [minValue, maxValue)
+    '''
+    return minValue + int((maxValue - minValue) * rand(state))
+
+@njit(cache = True)
+def dot(a, b):
+    '''
+    Dot product of two vectors (np.dot needs SciPy's BLAS in Numba)
+    '''
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+@njit(cache = True, error_model = 'numpy')
+def normalize(v):
+    '''
+    Normalize a vector
+    '''
+    return v / np.sqrt(dot(v, v))
+
+@njit(cache = True)
+def reflect(direction, normal):
+    '''
+    Reflect a direction about a normal vector (the same as GLSL's reflect)
+    '''
+    return direction - 2 * dot(normal, direction) * normal
+
+@njit(cache = True)
+def refract(direction, normal, etaRatio):
+    '''
+    Refract a unit direction through a surface (the same as GLSL's refract, which returns the zero vector on total internal reflection)
+    '''
+    cosTheta = dot(normal, direction)
+    k = 1 - etaRatio ** 2 * (1 - cosTheta ** 2)
+    if k < 0:
+        return np.zeros(3)
+    return etaRatio * direction - (etaRatio * cosTheta + np.sqrt(k)) * normal
+
+@njit(cache = True)
+def randomVectorOnUnitSphere(state):
+    '''
+    Random vector on the unit sphere from normally distributed components
+    '''
+    randVec = np.zeros(3)
+    while np.sqrt(dot(randVec, randVec)) < 0.001:
+        randVec[0], randVec[1] = boxMuller(state)
+        randVec[2], _ = boxMuller(state)
+    return normalize(randVec)
+
+@njit(cache = True)
+def randomCosineSample(state):
+    '''
+    Random cosine weighted direction on the hemisphere around the z axis
+    '''
+    r1, r2 = rand(state), rand(state)
+    phi = 2 * np.pi * r1
+    return np.array((np.cos(phi) * np.sqrt(r2), np.sin(phi) * np.sqrt(r2), np.sqrt(1 - r2)))
+
+@njit(cache = True)
+def transformONB(normal, v):
+    '''
+    Transform a vector from the orthonormal basis around a normal vector (along its z axis) to world coordinates
+    '''
+    a = np.array((0.0, 1.0, 0.0)) if abs(normal[0]) > 0.9 else np.array((1.0, 0.0, 0.0))
+    axis2 = normalize(np.cross(normal, a))
+    axis1 = np.cross(normal, axis2)
+    return v[0] * axis1 + v[1] * axis2 + v[2] * normal
+
+@njit(cache = True)
+def reflectance(cosTheta, etaRatio):
+    '''
+    Schlick's approximation of the reflectance
+    '''
+    r0 = ((1 - etaRatio) / (1 + etaRatio)) ** 2
+    return r0 + (1 - r0) * (1 - cosTheta) ** 5
+
+@njit(cache = True, error_model = 'numpy')
+def slabDistances(mapPos, origin, direction):
+    '''
+    Get the t values where a ray crosses the near and far planes of a voxel on each axis (commonAABB in AABB.comp)
+    '''
+    t0 = (mapPos.astype(np.float64) - origin) / direction
+    t1 = (mapPos + 1.0 - origin) / direction
+    return t0, t1
+
+@njit(cache = True)
+def intersectDielectric(mapPos, origin, direction):
+    '''
+    Get the point where a ray leaves a voxel (slightly past it)
+    '''
+    t0, t1 = slabDistances(mapPos, origin, direction)
+    return origin + direction * (np.min(np.maximum(t0, t1)) + TIME_ERROR_BOUND)
+
+@njit(cache = True)
+def normalVoxel(mapPos, origin, direction):
+    '''
+    Get the normal of a voxel where a ray enters it (pointing from the voxel's center to the entry point)
+    '''
+    t0, t1 = slabDistances(mapPos, origin, direction)
+    return normalize(origin + direction * np.max(np.minimum(t0, t1)) - (mapPos + 0.5))
+
+@njit(cache = True)
+def sampleCubeMap(textureFaces, textureIndex, direction):
+    '''
+    Sample a cube map texture in a direction with OpenGL's face selection (nearest texel of the base level)
+    '''
+    x, y, z = direction
+    ax, ay, az = abs(x), abs(y), abs(z)
+    if ax >= ay and ax >= az:
+        face, sc, tc, ma = (0, -z, -y, ax) if x > 0 else (1, z, -y, ax)
+    elif ay >= az:
+        face, sc, tc, ma = (2, x, z, ay) if y > 0 else (3, x, -z, ay)
+    else:
+        face, sc, tc, ma = (4, x, -y, az) if z > 0 else (5, -x, -y, az)
+
+    size = textureFaces.shape[2]
+    column = min(max(int((sc / ma + 1) * 0.5 * size), 0), size - 1)
+    row = min(max(int((tc / ma + 1) * 0.5 * size), 0), size - 1)
+    return textureFaces[textureIndex, face, row, column].astype(np.float64)
+
+@njit(cache = True, error_model = 'numpy')
+def marchRay(worldArray, brickArray, worldOrigin, colors, materialIDs, materialParameters, textureIDs, textureFaces, origin, direction, maxSteps, state):
+    '''
+    rayMarch and setRecordValues from World.comp: find the first voxel the ray hits and scatter off its material. Returns whether it hit and the hit record (point hit, normal vector, object color, material ID, whether it's a light, whether it scattered, and the scattered ray)
+    '''
+    direction = clampDirection(direction)
+    hit, mapPos, normal, t, voxelID = castRay(worldArray, brickArray, worldOrigin, origin, direction, np.inf, maxSteps)
+    if not hit:
+        return False, origin, np.zeros(3), np.zeros(3), LAMBERTIAN, False, False, origin, direction
+
+    materialIndex = int(voxelID) - 1
+    color, materialID, materialParameter, textureID = np.zeros(3), LAMBERTIAN, 0.0, 0
+    if 0 <= materialIndex < len(materialIDs):
+        color, materialID = colors[materialIndex].astype(np.float64), materialIDs[materialIndex]
+        materialParameter, textureID = np.float64(materialParameters[materialIndex]), textureIDs[materialIndex]
+
+    center = mapPos + 0.5
+    frontFace = np.sqrt(np.sum((origin - center) ** 2)) > 0.5
+    normalVector = normal.astype(np.float64)
+    pointHit = origin + direction * t
+
+    didScatter, didRefract, isLight = False, False, False
+    scatteredDir = direction
+    if materialID == LAMBERTIAN:
+        scatteredDir, didScatter = normalize(transformONB(normalVector, randomCosineSample(state))), True
+    elif materialID == REFLECTIVE:
+        scatteredDir = normalize(reflect(direction, normalVector)) + materialParameter * randomVectorOnUnitSphere(state)
+        didScatter = dot(scatteredDir, normalVector) > 0
+    elif materialID == DIELECTRIC:
+        etaRatio = 1 / materialParameter if frontFace else materialParameter
+        unitDirection = normalize(direction)
+        cosTheta = min(dot(-unitDirection, normalVector), 1.0)
+        sinTheta = np.sqrt(1 - cosTheta ** 2)
+
+        if etaRatio * sinTheta > 1 or reflectance(cosTheta, etaRatio) > rand(state):
+            scatteredDir = reflect(unitDirection, normalVector)
+        else:
+            scatteredDir, didRefract = refract(unitDirection, normalVector, etaRatio), True
+        didScatter = True
+    elif materialID == LIGHT:
+        isLight = True
+
+    objectColor = color # The texture is applied after scattering in World.comp too (so a light's back face isn't darkened)
+    if textureID != CONST_COLOR:
+        objectColor = sampleCubeMap(textureFaces, textureID - 1, pointHit - center)
+
+    scatteredOrigin = pointHit + scatteredDir * RAY_ERROR_BOUND
+    if didRefract:
+        scatteredOrigin = intersectDielectric(mapPos, scatteredOrigin, scatteredDir)
+    return True, pointHit, normalVector, objectColor, materialID, isLight, didScatter, scatteredOrigin, scatteredDir
+
+@njit(cache = True)
+def lightBlocked(worldArray, brickArray, worldOrigin, origin, direction, lightPos, maxSteps):
+    '''
+    lightRayMarch from World.comp: check whether a voxel blocks the ray before it reaches the light (a ray that runs out of steps isn't blocked)
+    '''
+    direction = clampDirection(direction)
+    rayDirSign, mapPos, deltaDist, rayStep, initSideDist = initDDA(origin, direction)
+    stepCounts, mask = np.zeros(3, np.int64), np.zeros(3, np.int64)
+
+    for _ in range(maxSteps):
+        if leavingWindow(worldArray, worldOrigin, mapPos, rayStep):
+            return False
+
+        if windowBrickEmpty(worldArray, brickArray, worldOrigin, mapPos):
+            brickStep(mapPos, stepCounts, initSideDist, deltaDist, rayStep, mask)
+            continue
+
+        atLight = mapPos[X_INDEX] == lightPos[X_INDEX] and mapPos[Y_INDEX] == lightPos[Y_INDEX] and mapPos[Z_INDEX] == lightPos[Z_INDEX]
+        if atLight:
+            return False
+        if getWindowVoxel(worldArray, worldOrigin, mapPos) != EMPTY_VOXEL:
+            return True
+        ddaStep(mapPos, stepCounts, initSideDist, deltaDist, rayStep, mask)
+    return False
+
+@njit(cache = True, error_model = 'numpy')
+def getLightSample(lightPos, lightVoxelID, colors, pointHit, normalVector, objectColor):
+    '''
+    getLightPDF and getLightRadiance from RayTracing.comp: the direction to a light and its radiance at the point hit
+    '''
+    toLight = lightPos + 0.5 - pointHit
+    lightDir = normalize(toLight)
+    lightPDF = dot(toLight, toLight) / abs(dot(lightDir, normalVoxel(lightPos, pointHit, lightDir)))
+
+    radiance = objectColor / np.pi * dot(normalVector, lightDir) * colors[lightVoxelID - 1] / lightPDF
+    return lightDir, radiance
+
+@njit(cache = True)
+def getLightProbability(gridPositions, gridVoxelIDs, gridWeights, cellIndex, lightPos, numLights, uniformFraction):
+    '''
+    getLightProbability from RayTracing.comp: the probability that sampleLight picks a light (the uniform fraction over all the lights plus the light's share of the cell's weights)
+    '''
+    cellWeight = gridWeights[cellIndex, -1]
+    if cellWeight <= 0:
+        uniformFraction = 1.0
+    probability = uniformFraction / numLights
+
+    prevWeight = 0.0
+    for i in range(gridWeights.shape[1]):
+        gridPos = gridPositions[cellIndex, i]
+        if gridVoxelIDs[cellIndex, i] != EMPTY_VOXEL and gridPos[X_INDEX] == lightPos[X_INDEX] and gridPos[Y_INDEX] == lightPos[Y_INDEX] and gridPos[Z_INDEX] == lightPos[Z_INDEX]:
+            return probability + (1 - uniformFraction) * (gridWeights[cellIndex, i] - prevWeight) / cellWeight
+        prevWeight = gridWeights[cellIndex, i]
+    return probability
+
+@njit(cache = True)
+def sampleLight(lightPositions, lightVoxelIDs, numLights, gridPositions, gridVoxelIDs, gridWeights, cellIndex, uniformFraction, state):
+    '''
+    sampleLight from RayTracing.comp: pick a light candidate uniformly from all the lights (always when the cell lists none) or from the cell's lights in proportion to their weights. Returns its map position and voxel ID
+    '''
+    cellWeight = gridWeights[cellIndex, -1]
+    if cellWeight <= 0 or rand(state) < uniformFraction:
+        lightIndex = randInt(state, 0, numLights)
+        return lightPositions[lightIndex], lightVoxelIDs[lightIndex]
+
+    targetWeight = rand(state) * cellWeight
+    for i in range(gridWeights.shape[1]):
+        if gridWeights[cellIndex, i] > targetWeight:
+            return gridPositions[cellIndex, i], gridVoxelIDs[cellIndex, i]
+    return gridPositions[cellIndex, 0], gridVoxelIDs[cellIndex, 0]
+
+@njit(cache = True, error_model = 'numpy')
+def directLighting(worldArray, brickArray, worldOrigin, colors, lightPositions, lightVoxelIDs, numLights, gridPositions, gridVoxelIDs, gridWeights, gridSize, cellSize, uniformFraction, badLightSamples, maxSteps, pointHit, normalVector, objectColor, state):
+    '''
+    Direct lighting with reservoir sampling of light candidates picked from the light grid (directLighting in RayTracing.comp). Returns the light's contribution before the throughput
+    '''
+    cellIndex = getLightCell(pointHit, cellSize, gridSize)
+    reservoirPos, reservoirVoxelID, weightSum = lightPositions[0], EMPTY_VOXEL, 0.0
+    for _ in range(badLightSamples):
+        lightPos, lightVoxelID = sampleLight(lightPositions, lightVoxelIDs, numLights, gridPositions, gridVoxelIDs, gridWeights, cellIndex, uniformFraction, state)
+        _, radiance = getLightSample(lightPos, lightVoxelID, colors, pointHit, normalVector, objectColor)
+
+        lightWeight = np.sqrt(dot(radiance, radiance)) / (getLightProbability(gridPositions, gridVoxelIDs, gridWeights, cellIndex, lightPos, numLights, uniformFraction) * badLightSamples)
+        weightSum += lightWeight
+        if rand(state) < lightWeight / weightSum:
+            reservoirPos, reservoirVoxelID = lightPos, lightVoxelID
+
+    if reservoirVoxelID == EMPTY_VOXEL or weightSum <= 0:
+        return np.zeros(3)
+
+    lightDir, radiance = getLightSample(reservoirPos, reservoirVoxelID, colors, pointHit, normalVector, objectColor)
+    if dot(normalVector, lightDir) <= 0 or lightBlocked(worldArray, brickArray, worldOrigin, pointHit, lightDir, reservoirPos, maxSteps):
+        return np.zeros(3)
+
+    return weightSum / np.sqrt(dot(radiance, radiance)) * radiance
+
+@njit(cache = True, error_model = 'numpy')
+def pixelColor(worldArray, brickArray, worldOrigin, colors, materialIDs, materialParameters, textureIDs, textureFaces, lightPositions, lightVoxelIDs, numLights, gridPositions, gridVoxelIDs, gridWeights, gridSize, cellSize, uniformFraction, topColor, botColor, maxBounces, badLightSamples, maxSteps, origin, direction, state):
+    '''
+    Trace a path from a camera ray (pixelColor in RayTracing.comp, with the same bounce limit, light double counting rules and Russian roulette)
+    '''
+    accumulatedColor, throughput = np.zeros(3), np.ones(3)
+    prevMaterialID = LAMBERTIAN
+
+    for bounce in range(maxBounces):
+        hit, pointHit, normalVector, objectColor, materialID, isLight, didScatter, scatteredOrigin, scatteredDir = marchRay(worldArray, brickArray, worldOrigin, colors, materialIDs, materialParameters, textureIDs, textureFaces, origin, direction, maxSteps, state)
+
+        if not hit:
+            t = 0.5 * (normalize(direction)[Y_INDEX] + 1)
+            accumulatedColor += throughput * (botColor * (1 - t) + topColor * t)
+            break
+
+        if not np.any(normalVector):
+            break # The ray started inside a voxel (grazing scattered rays can clip the corner of a neighbour), which has no face to hit and gives NaN on the GPU
+
+        if isLight:
+            if bounce == 0 or prevMaterialID != LAMBERTIAN:
+                accumulatedColor += throughput * objectColor
+            break
+
+        prevMaterialID = materialID
+        if materialID == LAMBERTIAN and numLights > 0:
+            accumulatedColor += throughput * directLighting(worldArray, brickArray, worldOrigin, colors, lightPositions, lightVoxelIDs, numLights, gridPositions, gridVoxelIDs, gridWeights, gridSize, cellSize, uniformFraction, badLightSamples, maxSteps, pointHit, normalVector, objectColor, state)
+
+        throughput *= objectColor
+        if not didScatter:
+            accumulatedColor += throughput
+            break
+        origin, direction = scatteredOrigin, scatteredDir
+
+        if bounce <= 3:
+            continue
+
+        p = np.max(throughput)
+        if rand(state) > p:
+            break
+        throughput *= 1 / p
+
+    return accumulatedColor
+
+@njit(parallel = True, cache = True, error_model = 'numpy')
+def renderTiles(worldArray, brickArray, worldOrigin, colors, materialIDs, materialParameters, textureIDs, textureFaces, lightPositions, lightVoxelIDs, numLights, gridPositions, gridVoxelIDs, gridWeights, gridSize, cellSize, uniformFraction, topColor, botColor, maxBounces, rootSPP, badLightSamples, maxSteps, cameraPosition, pixelDX, pixelDY, initPixelPos, seeds, accumulation):
+    '''
+    Add one frame of rootSPP^2 stratified samples per pixel to the accumulated radiance. The image is split into TILE_SIZE^2 tiles that threads take one at a time so that cheap sky tiles and expensive terrain tiles even out across threads. Pixel (x, y) counts from the bottom left like pixelCoord in the shader
+    '''
+    imageHeight, imageWidth = accumulation.shape[0], accumulation.shape[1]
+    tilesX, tilesY = (imageWidth + TILE_SIZE - 1) // TILE_SIZE, (imageHeight + TILE_SIZE - 1) // TILE_SIZE
+    invRootSPP = 1 / rootSPP
+
+    for tile in prange(tilesX * tilesY):
+        tileX, tileY = (tile % tilesX) * TILE_SIZE, (tile // tilesX) * TILE_SIZE
+        for y in range(tileY, min(tileY + TILE_SIZE, imageHeight)):
+            for x in range(tileX, min(tileX + TILE_SIZE, imageWidth)):
+                state = seeds[y, x]
+                pixel = np.zeros(3)
+                for i in range(rootSPP):
+                    for j in range(rootSPP):
+                        sampleX = (i + rand(state)) * invRootSPP - 0.5
+                        sampleY = (j + rand(state)) * invRootSPP - 0.5
+                        direction = initPixelPos + (x + sampleX) * pixelDX + (y + sampleY) * pixelDY - cameraPosition
+                        pixel += pixelColor(worldArray, brickArray, worldOrigin, colors, materialIDs, materialParameters, textureIDs, textureFaces, lightPositions, lightVoxelIDs, numLights, gridPositions, gridVoxelIDs, gridWeights, gridSize, cellSize, uniformFraction, topColor, botColor, maxBounces, badLightSamples, maxSteps, cameraPosition, direction, state)
+                accumulation[y, x] += pixel / rootSPP ** 2
+
+class PathTracer:
+    '''
+    Multi-core CPU version of the ray tracing compute shader (RayTracing.comp) for rendering without a GPU, such as checking image quality and convergence in tests. It reads the same material and light arrays as the SSBOs, traces the same paths (DDA, materials, reservoir sampled direct lighting, Russian roulette, and the background gradient), and accumulates frames without TAA. Block textures are sampled at the nearest texel of their CPU_TEXTURE_SIZE mip level, so textured surfaces won't match the GPU's filtering exactly
+    '''
+    def __init__(self, worldArray, brickArray, materialArray, lightArray, numLights, worldOrigin = (0, 0, 0), time = TIME_DAY, maxBounces = 10, samplesPerPixel = 1, badLightSamples = 10, maxRaySteps = VIEW_RANGE, lightGrid = None, uniformLightFraction = UNIFORM_LIGHT_FRACTION, seed = None):
+        self.worldArray = worldArray.toDense() if isColumnRLE(worldArray) else worldArray
+        self.brickArray, self.worldOrigin = brickArray, np.array(worldOrigin, np.int64)
+
+        self.colors = np.ascontiguousarray(materialArray['color'], np.float64)
+        self.materialIDs = np.ascontiguousarray(materialArray['materialID'], np.int64)
+        self.materialParameters = np.ascontiguousarray(materialArray['materialParameter'], np.float64)
+        self.textureIDs = np.ascontiguousarray(materialArray['textureID'], np.int64)
+        self.textureFaces = loadTextureFaces()
+
+        self.lightPositions = np.ascontiguousarray(lightArray['mapPos'], np.int64)
+        self.lightVoxelIDs = np.ascontiguousarray(lightArray['voxelID'], np.int64)
+        self.numLights = numLights
+
+        if lightGrid is None: # One cell that lists no lights, so every candidate is picked uniformly
+            lightGrid = LightGrid((LIGHT_CELL_SIZE, LIGHT_CELL_SIZE, LIGHT_CELL_SIZE), materialArray['color'])
+        lightGrid.update(worldOrigin) # Clears the grid's marked cells, so the grid shouldn't be one that's still uploaded to the GPU
+        self.gridPositions = np.ascontiguousarray(lightGrid.array['mapPos'], np.int64)
+        self.gridVoxelIDs = np.ascontiguousarray(lightGrid.array['voxelID'], np.int64)
+        self.gridWeights = np.ascontiguousarray(lightGrid.array['weight'], np.float64)
+        self.gridSize, self.cellSize = np.array(lightGrid.gridSize, np.int64), lightGrid.cellSize
+        self.uniformFraction = uniformLightFraction
+
+        self.topColor, self.botColor = (np.array(color, np.float64) for color in getBackgroundColors(time))
+        self.maxBounces, self.rootSPP = maxBounces, int(np.sqrt(samplesPerPixel))
+        self.badLightSamples, self.maxRaySteps = badLightSamples, maxRaySteps
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def fromWorld(cls, world, **settings):
+        '''
+        Create a path tracer for a world's voxels, brickmap, materials, lights and light grid. The light grid is rebuilt from the lights into a copy, because updating the world's own grid would clear the cells it still has to write to the GPU
+        '''
+        materialArray = buildMaterialArray(world.materialList)
+        lightGrid = LightGrid(world.worldSize, materialArray['color'], world.lights)
+        return cls(world.worldArray, world.brickmap.brickArray, materialArray, buildLightArray(world.lights), len(world.lights), world.getWorldOrigin(), lightGrid = lightGrid, **settings)
+
+    def render(self, cameraState, imageSize, numFrames = 1):
+        '''
+        Render numFrames frames from a camera state (see getCameraState) and return the gamma corrected average as an (height, width, 3) float image with its first row at the top. The camera's pixel deltas must be for the same image size
+        '''
+        imageWidth, imageHeight = imageSize
+        seeds = self.rng.integers(128, 100000, (imageHeight, imageWidth, 4)).astype(np.int64) # Like the seed image from Main.initRand
+        accumulation = np.zeros((imageHeight, imageWidth, 3))
+
+        for _ in range(numFrames):
+            renderTiles(self.worldArray, self.brickArray, self.worldOrigin, self.colors, self.materialIDs, self.materialParameters, self.textureIDs, self.textureFaces, self.lightPositions, self.lightVoxelIDs, self.numLights, self.gridPositions, self.gridVoxelIDs, self.gridWeights, self.gridSize, self.cellSize, self.uniformFraction, self.topColor, self.botColor, self.maxBounces, self.rootSPP, self.badLightSamples, self.maxRaySteps, *cameraState, seeds, accumulation)
+
+        return np.sqrt(accumulation / numFrames)[::-1]
@@ -0,0 +1,196 @@
+from Settings import *
+import csv
+import functools
+import json
+
+GPU_SUFFIX = ' (GPU)'
+
+class StageStats:
+    '''
+    Fixed size ring buffer of the last times (in milliseconds) of one profiled stage
+    '''
+    def __init__(self, history):
+        self.times = np.zeros(history, np.float64)
+        self.index, self.count = 0, 0
+
+    def add(self, milliseconds):
+        self.times[self.index] = milliseconds
+        self.index = (self.index + 1) % len(self.times)
+        self.count += 1
+
+    def getTimes(self):
+        '''
+        Get the buffered times from the oldest to the newest
+        '''
+        if self.count < len(self.times):
+            return self.times[:self.count].copy()
+        return np.roll(self.times, -self.index)
+
+    def summarize(self):
+        '''
+        Get the mean, median, 99th percentile and maximum of the buffered times, and how many times were recorded in total
+        '''
+        times = self.times[:min(self.count, len(self.times))]
+        if len(times) == 0:
+            return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+        p50, p99 = np.percentile(times, (50, 99))
+        return {'count': self.count, 'mean': float(times.mean()), 'p50': float(p50), 'p99': float(p99), 'max': float(times.max())}
+
+class ProfileScope:
+    '''
+    Context manager that adds the time spent inside it to a stage. Scopes are reused for every call of a stage, so the start times are a stack in case a stage calls itself
+    '''
+    def __init__(self, profiler, name):
+        self.profiler, self.name = profiler, name
+        self.startTimes = []
+
+    def __enter__(self):
+        self.startTimes.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exception):
+        self.profiler.record(self.name, (time.perf_counter() - self.startTimes.pop()) * 1000)
+
+class GPUProfileScope:
+    '''
+    Context manager that times a stage on the CPU and the GPU work it issues with a timer query. Every stage cycles through a few queries and reads the one from latency frames ago, so reading the result never waits for the GPU to catch up
+    '''
+    def __init__(self, profiler, name, ctx, latency):
+        self.cpuScope = ProfileScope(profiler, name)
+        self.profiler, self.name = profiler, name + GPU_SUFFIX
+        self.queries = [ctx.query(time = True) for _ in range(latency)]
+        self.pending = [False] * latency
+        self.slot = 0
+
+    def __enter__(self):
+        if self.pending[self.slot]:
+            self.profiler.record(self.name, self.queries[self.slot].elapsed / 1e6)
+        self.queries[self.slot].__enter__()
+        self.cpuScope.__enter__()
+        return self
+
+    def __exit__(self, *exception):
+        self.cpuScope.__exit__(*exception)
+        self.queries[self.slot].__exit__(*exception)
+        self.pending[self.slot] = True
+        self.slot = (self.slot + 1) % len(self.queries)
+
+class NullScope:
+    '''
+    Scope that does nothing (what a disabled profiler hands out, so a profiled stage only costs an attribute check and two empty calls)
+    '''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        pass
+
+NULL_SCOPE = NullScope()
+
+class Profiler:
+    '''
+    Lightweight profiler of named stages. Wrap a stage in 'with profiler.scope(name):' (or decorate a function with profiler.profile(name)) and the profiler keeps the last history times of every stage in a NumPy ring buffer to report their mean, median and 99th percentile. Stages timed with gpu = True also time their GPU work with timer queries once a context is attached (GL timer queries can't be nested, so only use it for stages that don't contain each other). A disabled profiler hands out a scope that does nothing
+    '''
+    def __init__(self, enabled = PROFILER_ENABLED, history = PROFILER_HISTORY, queryLatency = PROFILER_QUERY_LATENCY):
+        self.enabled, self.history, self.queryLatency = enabled, history, queryLatency
+        self.stages = {} # Stage name to its StageStats (in the order they were first recorded)
+        self.scopes, self.gpuScopes = {}, {}
+        self.ctx = None
+
+    def attachContext(self, ctx):
+        '''
+        Let gpu stages time their GPU work with timer queries on a context (None goes back to CPU times only)
+        '''
+        self.ctx = ctx
+        self.gpuScopes.clear()
+
+    def setEnabled(self, enabled):
+        self.enabled = enabled
+
+    def scope(self, name, gpu = False):
+        '''
+        Get the scope of a stage
+        '''
+        if not self.enabled:
+            return NULL_SCOPE
+        if gpu and self.ctx is not None:
+            if name not in self.gpuScopes:
+                self.gpuScopes[name] = GPUProfileScope(self, name, self.ctx, self.queryLatency)
+            return self.gpuScopes[name]
+        if name not in self.scopes:
+            self.scopes[name] = ProfileScope(self, name)
+        return self.scopes[name]
+
+    def profile(self, name):
+        '''
+        Decorator that times every call of a function as a stage
+        '''
+        def decorate(function):
+            @functools.wraps(function)
+            def profiled(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self.scope(name):
+                    return function(*args, **kwargs)
+            return profiled
+        return decorate
+
+    def record(self, name, milliseconds):
+        '''
+        Add a time (in milliseconds) to a stage
+        '''
+        if name not in self.stages:
+            self.stages[name] = StageStats(self.history)
+        self.stages[name].add(milliseconds)
+
+    def reset(self):
+        self.stages.clear()
+
+    def summarize(self):
+        '''
+        Get the statistics of every stage (in milliseconds)
+        '''
+        return {name: stats.summarize() for name, stats in self.stages.items()}
+
+    def formatLines(self):
+        '''
+        Format the statistics of every stage as aligned lines of text for the overlay
+        '''
+        summary = self.summarize()
+        nameWidth = max((len(name) for name in summary), default = 0)
+        lines = [f'{"stage":<{nameWidth}}   mean    p50    p99  (ms)']
+        for name, stats in summary.items():
+            lines.append(f'{name:<{nameWidth}} {stats["mean"]:6.2f} {stats["p50"]:6.2f} {stats["p99"]:6.2f}')
+        return lines
+
+    def exportCSV(self, filePath):
+        '''
+        Write the statistics of every stage to a CSV file (one row per stage)
+        '''
+        with open(filePath, 'w', newline = '') as file:
+            writer = csv.writer(file)
+            writer.writerow(['stage', 'count', 'mean_ms', 'p50_ms', 'p99_ms', 'max_ms'])
+            for name, stats in self.summarize().items():
+                writer.writerow([name, stats['count'], *(f'{stats[key]:.4f}' for key in ('mean', 'p50', 'p99', 'max'))])
+
+    def exportJSON(self, filePath):
+        '''
+        Write the statistics and the buffered times of every stage to a JSON file
+        '''
+        stages = {name: {**stats.summarize(), 'times': stats.getTimes().tolist()} for name, stats in self.stages.items()}
+        with open(filePath, 'w') as file:
+            json.dump({'history': self.history, 'stages': stages}, file, indent = 2)
+
+    def export(self, filePath):
+        '''
+        Write the statistics to a CSV or JSON file (picked by the file extension)
+        '''
+        os.makedirs(os.path.dirname(filePath) or '.', exist_ok = True)
+        if filePath.endswith('.csv'):
+            self.exportCSV(filePath)
+        elif filePath.endswith('.json'):
+            self.exportJSON(filePath)
+        else:
+            raise ValueError(f'{filePath} is not a .csv or .json file')
+
+profiler = Profiler() # Shared by the window and the world
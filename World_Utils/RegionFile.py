@@ -0,0 +1,162 @@
+from Settings import *
+from Materials import *
+from concurrent.futures import ThreadPoolExecutor
+import mmap
+import struct
+import zlib
+
+REGION_MAGIC = b'VXRG'
+REGION_VERSION = 1
+REGION_EXTENSION = '.region'
+REGION_COMPRESSION_LEVEL = 1 # zlib level 1 is several times faster than the level 6 that np.savez_compressed uses for a slightly bigger file
+
+# Magic, version, world size (x, y, z), chunk size, seed (-1 when unknown), camera position, number of lights
+REGION_HEADER = struct.Struct('<4sI3IIq3fI')
+
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'),
+    ('length', '<u4')
+])
+
+def mapBatched(function, items, numThreads = None, batchesPerThread = 4):
+    '''
+    Map a function over items on a thread pool in a few batches per thread (submitting every chunk on its own costs more than decompressing most of them) and return the results in order
+    '''
+    numThreads = os.cpu_count() if numThreads is None else numThreads
+    numBatches = max(1, min(len(items), numThreads * batchesPerThread))
+    batches = [items[i::numBatches] for i in range(numBatches)]
+
+    with ThreadPoolExecutor(numThreads) as executor:
+        batchResults = list(executor.map(lambda batch: [function(item) for item in batch], batches))
+
+    results = [None] * len(items)
+    for i, batchResult in enumerate(batchResults):
+        results[i::numBatches] = batchResult
+    return results
+
+def compressChunk(chunk, level):
+    '''
+    Compress a chunk with zlib (releases the GIL so chunks can be compressed on a thread pool)
+    '''
+    return zlib.compress(np.ascontiguousarray(chunk), level)
+
+def getUniformChunks(chunkSummary):
+    '''
+    Get which chunks hold a single voxel type and what that voxel is from the chunk summary's histograms (no need to read the world array)
+    '''
+    return chunkSummary.histogram.max(axis = -1) == CHUNK_SIZE ** 3, np.argmax(chunkSummary.histogram, axis = -1).astype('u1')
+
+def getChunk(worldArray, chunkIndex):
+    '''
+    Get the view of a chunk in the world array
+    '''
+    initX, initY, initZ = (int(chunkIndex[axis]) * CHUNK_SIZE for axis in range(3))
+    return worldArray[initX:initX + CHUNK_SIZE, initY:initY + CHUNK_SIZE, initZ:initZ + CHUNK_SIZE]
+
+def writeRegionPayloads(filePath, worldSize, seed, cameraPosition, lightArray, payloads):
+    '''
+    Write a region file from the already packed chunk payloads (in C order of the chunk indices). It's written to a temporary file that replaces the region file once it's complete so that a crash mid save never leaves a broken save. Returns the size of the file in bytes
+    '''
+    lightArray = np.asarray(lightArray, LIGHT_DTYPE)
+    seed = -1 if seed is None else int(seed)
+    header = REGION_HEADER.pack(REGION_MAGIC, REGION_VERSION, *worldSize, CHUNK_SIZE, seed, *(float(cameraPosition[axis]) for axis in range(3)), len(lightArray))
+
+    index = np.empty(len(payloads), INDEX_DTYPE)
+    index['length'] = [len(payload) for payload in payloads]
+    dataStart = len(header) + lightArray.nbytes + index.nbytes
+    index['offset'] = dataStart + np.concatenate(([0], np.cumsum(index['length'][:-1], dtype = 'u8')))
+
+    tempPath = filePath + '.tmp'
+    with open(tempPath, 'wb') as file:
+        file.write(header)
+        file.write(lightArray.tobytes())
+        file.write(index.tobytes())
+        for payload in payloads:
+            file.write(payload)
+        file.flush()
+        os.fsync(file.fileno()) # On disk before it replaces the save, or a power loss could leave an empty file in its place
+    os.replace(tempPath, filePath)
+
+    return int(dataStart + index['length'].sum(dtype = 'u8'))
+
+def writeRegionFile(filePath, worldArray, chunkSummary, seed, cameraPosition, lightArray, level = REGION_COMPRESSION_LEVEL, numThreads = None):
+    '''
+    Write the world to a region file: a header, the lights, an index of every chunk's offset and length, and then every chunk compressed on its own. Uniform chunks (including all-empty chunks) are stored as the single voxel byte. Returns the size of the file in bytes
+    '''
+    isUniform, uniformVoxel = getUniformChunks(chunkSummary)
+
+    def packChunk(chunkIndex):
+        if isUniform[chunkIndex]:
+            return uniformVoxel[chunkIndex].tobytes()
+        return compressChunk(getChunk(worldArray, chunkIndex), level)
+
+    payloads = mapBatched(packChunk, list(np.ndindex(chunkSummary.numChunks)), numThreads)
+    return writeRegionPayloads(filePath, np.shape(worldArray), seed, cameraPosition, lightArray, payloads)
+
+class RegionFile:
+    '''
+    Random access reader for region files. Only the header and the chunk index are read when it's opened, so any box of chunks can be loaded without reading (or inflating) the rest of the world
+    '''
+    def __init__(self, filePath):
+        self.filePath = filePath
+
+        with open(filePath, 'rb') as file:
+            magic, version, sizeX, sizeY, sizeZ, chunkSize, seed, cameraX, cameraY, cameraZ, numLights = REGION_HEADER.unpack(file.read(REGION_HEADER.size))
+            if magic != REGION_MAGIC:
+                raise RuntimeError(f'{filePath} is not a region file')
+            if version != REGION_VERSION or chunkSize != CHUNK_SIZE:
+                raise RuntimeError(f'{filePath} has region version {version} and chunk size {chunkSize} (expected {REGION_VERSION} and {CHUNK_SIZE})')
+
+            self.worldSize = (sizeX, sizeY, sizeZ)
+            self.numChunks = tuple(size // CHUNK_SIZE for size in self.worldSize)
+            self.seed = None if seed < 0 else seed
+            self.cameraPosition = glm.vec3(cameraX, cameraY, cameraZ)
+
+            self.lightArray = np.frombuffer(file.read(numLights * LIGHT_DTYPE.itemsize), LIGHT_DTYPE).copy()
+            self.index = np.frombuffer(file.read(int(np.prod(self.numChunks)) * INDEX_DTYPE.itemsize), INDEX_DTYPE).reshape(self.numChunks)
+
+    def readPayloads(self):
+        '''
+        Read the packed payload of every chunk (in C order of the chunk indices) without decompressing them
+        '''
+        with open(self.filePath, 'rb') as file, mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ) as fileMap:
+            return [fileMap[offset:offset + length] for offset, length in zip(self.index['offset'].ravel().tolist(), self.index['length'].ravel().tolist())]
+
+    def readChunk(self, fileMap, chunkIndex):
+        '''
+        Read and decompress a single compressed chunk from the memory mapped file
+        '''
+        offset, length = int(self.index[chunkIndex]['offset']), int(self.index[chunkIndex]['length'])
+        return np.frombuffer(zlib.decompress(fileMap[offset:offset + length]), 'u1').reshape(CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE)
+
+    def loadRegion(self, minChunk, maxChunk, numThreads = None):
+        '''
+        Load the box of chunks [minChunk, maxChunk) into a new array. Uniform chunks are filled in one vectorized pass and the rest are read and decompressed on a thread pool. The file is memory mapped so only the pages of those chunks are read
+        '''
+        minChunk = tuple(max(int(minChunk[axis]), 0) for axis in range(3))
+        maxChunk = tuple(min(int(maxChunk[axis]), self.numChunks[axis]) for axis in range(3))
+        numChunks = tuple(maxChunk[axis] - minChunk[axis] for axis in range(3))
+
+        regionArray = np.empty(tuple(numChunks[axis] * CHUNK_SIZE for axis in range(3)), 'u1')
+        chunkView = regionArray.reshape(numChunks[X_INDEX], CHUNK_SIZE, numChunks[Y_INDEX], CHUNK_SIZE, numChunks[Z_INDEX], CHUNK_SIZE)
+        index = self.index[minChunk[X_INDEX]:maxChunk[X_INDEX], minChunk[Y_INDEX]:maxChunk[Y_INDEX], minChunk[Z_INDEX]:maxChunk[Z_INDEX]]
+        isUniform = index['length'] == 1
+
+        with open(self.filePath, 'rb') as file, mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ) as fileMap:
+            uniformVoxel = np.zeros(numChunks, 'u1')
+            uniformVoxel[isUniform] = np.frombuffer(fileMap, 'u1')[index['offset'][isUniform]]
+            chunkView[:] = uniformVoxel[:, None, :, None, :, None]
+
+            def loadChunk(localIndex):
+                chunkX, chunkY, chunkZ = localIndex
+                chunkView[chunkX, :, chunkY, :, chunkZ, :] = self.readChunk(fileMap, tuple(localIndex[axis] + minChunk[axis] for axis in range(3)))
+
+            mapBatched(loadChunk, [tuple(localIndex) for localIndex in np.argwhere(~isUniform)], numThreads)
+
+        return regionArray
+
+    def loadWorld(self, numThreads = None):
+        '''
+        Load every chunk of the world
+        '''
+        return self.loadRegion((0, 0, 0), self.numChunks, numThreads)
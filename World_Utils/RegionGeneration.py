@@ -0,0 +1,71 @@
+from Settings import *
+from Chunk import *
+from Noise import *
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context, shared_memory
+import numba
+
+def initWorker():
+    '''
+    Give each worker process a single Numba thread because the parallelism comes from the processes themselves
+    '''
+    numba.set_num_threads(1)
+
+def generateRegion(sharedName, regionShape, worldSizeX, seed, xStart, zStart):
+    '''
+    Generate the height map of one XZ region and fill a region sized block in shared memory with its terrain (runs in a worker process)
+    '''
+    heightMap = HeightMapEngine(seed, worldSizeX).generateRegion(xStart, xStart + regionShape[X_INDEX], zStart, zStart + regionShape[Z_INDEX], numThreads = 1)
+
+    sharedBlock = shared_memory.SharedMemory(name = sharedName)
+    try:
+        blockArray = np.ndarray(regionShape, 'u1', buffer = sharedBlock.buf)
+        blockArray[:] = EMPTY_VOXEL
+        fillBlock(blockArray, heightMap, *buildElevationBands(regionShape[Y_INDEX]), seed, xStart, zStart)
+        del blockArray # The buffer can't be closed while an array still points to it
+    finally:
+        sharedBlock.close()
+
+def splitRegions(worldSize, regionSize):
+    '''
+    Split the world into XZ regions of regionSize x regionSize columns (the last regions may be smaller)
+    '''
+    return [
+        (xStart, min(xStart + regionSize, worldSize[X_INDEX]), zStart, min(zStart + regionSize, worldSize[Z_INDEX]))
+        for xStart in range(0, worldSize[X_INDEX], regionSize) for zStart in range(0, worldSize[Z_INDEX], regionSize)
+    ]
+
+def generateTerrainParallel(worldArray, seed, numWorkers, regionSize = 4 * CHUNK_SIZE):
+    '''
+    Generate the terrain of a world array with a pool of processes that each generate the height map of an XZ region and fill a block of shared memory the size of the region, which is then copied into the world array. Only a couple of regions per worker are in shared memory at once, so generating never holds a second copy of the world. Every voxel only depends on the seed and its coordinates, so the result is bit-identical to generateTerrain for any number of workers
+    '''
+    worldSize = tuple(int(size) for size in worldArray.shape)
+    regions = splitRegions(worldSize, regionSize)[::-1] # Popped from the end
+    pending = {}
+
+    with ProcessPoolExecutor(numWorkers, mp_context = get_context('spawn'), initializer = initWorker) as executor:
+        try:
+            while regions or pending:
+                while regions and len(pending) < 2 * numWorkers: # Keep every worker busy without putting the whole world in shared memory
+                    xStart, xEnd, zStart, zEnd = regions.pop()
+                    regionShape = (xEnd - xStart, worldSize[Y_INDEX], zEnd - zStart)
+                    sharedBlock = shared_memory.SharedMemory(create = True, size = int(np.prod(regionShape)))
+                    future = executor.submit(generateRegion, sharedBlock.name, regionShape, worldSize[X_INDEX], seed, xStart, zStart)
+                    pending[future] = (sharedBlock, regionShape, xStart, zStart)
+
+                finished, _ = wait(pending, return_when = FIRST_COMPLETED)
+                for future in finished:
+                    sharedBlock, regionShape, xStart, zStart = pending.pop(future)
+                    try:
+                        future.result()
+                        blockArray = np.ndarray(regionShape, 'u1', buffer = sharedBlock.buf)
+                        worldArray[xStart:xStart + regionShape[X_INDEX], :, zStart:zStart + regionShape[Z_INDEX]] = blockArray
+                        del blockArray
+                    finally:
+                        sharedBlock.close()
+                        sharedBlock.unlink()
+        finally:
+            for future, (sharedBlock, _, _, _) in pending.items(): # Only left over when a region failed
+                future.cancel()
+                sharedBlock.close()
+                sharedBlock.unlink()
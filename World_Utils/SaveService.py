@@ -0,0 +1,133 @@
+from Settings import *
+from DirtyRegions import *
+from RegionFile import *
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+class SaveService:
+    '''
+    Save the world on a background thread while play continues. A save snapshots only the chunks edited since the previous snapshot (copy on write: the world array itself is never shared with the worker), and the worker compresses them and rewrites the region file from its cache of packed chunks. Saves run one after another in the order they were requested, so edits made during a save always land in the next one. A save that fails marks its chunks dirty again so the next one retries them
+    '''
+    def __init__(self, filePath, worldSize, autosaveInterval = AUTOSAVE_INTERVAL, level = REGION_COMPRESSION_LEVEL):
+        self.filePath, self.worldSize = filePath, tuple(int(size) for size in worldSize)
+        self.autosaveInterval, self.level = autosaveInterval, level
+        self.numChunks = tuple(size // CHUNK_SIZE for size in self.worldSize)
+
+        self.dirtyChunks = DirtyRegions(self.worldSize)
+        self.dirtyLock = threading.Lock() # The worker marks the chunks of a failed save dirty again
+        self.payloads = None # Packed chunk payloads of the last written save (only touched by the worker)
+        self.retryChunks = set() # Chunks of failed saves that a save has to hold before it can be written (only touched by the worker)
+        if os.path.isfile(filePath) and RegionFile(filePath).worldSize == self.worldSize:
+            self.payloads = RegionFile(filePath).readPayloads()
+        else:
+            self.dirtyChunks.markAll()
+
+        self.executor = ThreadPoolExecutor(1)
+        self.pendingSave = None
+        self.lastSaveTime = time.perf_counter()
+
+    def markVoxel(self, mapPos):
+        '''
+        Mark the chunk holding an edited voxel so that it's part of the next snapshot
+        '''
+        self.dirtyChunks.markVoxel(mapPos)
+
+    def markVoxels(self, positions):
+        '''
+        Mark the chunks holding many edited voxels (a tuple of x, y and z arrays) so that they're part of the next snapshot
+        '''
+        self.dirtyChunks.markVoxels(positions)
+
+    def markBox(self, minPos, maxPos):
+        '''
+        Mark the chunks overlapping an edited box [minPos, maxPos) so that they're part of the next snapshot
+        '''
+        self.dirtyChunks.markBox(minPos, maxPos)
+
+    def snapshot(self, worldArray, chunkSummary):
+        '''
+        Copy every chunk edited since the last snapshot (uniform chunks only need their voxel byte) and clear the dirty chunks
+        '''
+        isUniform, uniformVoxel = getUniformChunks(chunkSummary)
+
+        with self.dirtyLock:
+            chunkIndices = self.dirtyChunks.popCells()
+
+        chunks = {}
+        for chunkIndex in chunkIndices:
+            if isUniform[chunkIndex]:
+                chunks[chunkIndex] = uniformVoxel[chunkIndex].tobytes()
+            else:
+                chunks[chunkIndex] = getChunk(worldArray, chunkIndex).copy()
+        return chunks
+
+    def writeSnapshot(self, chunks, seed, cameraPosition, lightArray):
+        '''
+        Compress the snapshot's chunks and write the region file from them and the packed chunk cache (runs on the worker thread). The cache is only replaced once the file is written, so a failed save leaves it as it was. A save snapshotted before the chunks of a failed save were marked dirty again fails too (otherwise it would count as saving edits it doesn't hold)
+        '''
+        try:
+            if not self.retryChunks <= chunks.keys():
+                raise RuntimeError(f'The save of {self.filePath} is missing chunks of a failed save')
+            payloads = [None] * int(np.prod(self.numChunks)) if self.payloads is None else list(self.payloads)
+
+            def packChunk(item):
+                chunkIndex, chunk = item
+                return chunkIndex, chunk if isinstance(chunk, bytes) else compressChunk(chunk, self.level)
+
+            for chunkIndex, payload in mapBatched(packChunk, list(chunks.items())):
+                payloads[np.ravel_multi_index(chunkIndex, self.numChunks)] = payload
+            assert all(payload is not None for payload in payloads) # Every chunk is dirty until the first save is written
+
+            fileSize = writeRegionPayloads(self.filePath, self.worldSize, seed, cameraPosition, lightArray, payloads)
+        except Exception:
+            self.retryChunks.update(chunks)
+            raise
+
+        self.payloads, self.retryChunks = payloads, set()
+        return fileSize
+
+    def remarkChunks(self, chunkIndices, future):
+        '''
+        Mark the chunks of a save dirty again if it failed (done callback of the save)
+        '''
+        if future.exception() is not None:
+            with self.dirtyLock:
+                self.dirtyChunks.cells.update(chunkIndices)
+
+    def save(self, worldArray, chunkSummary, seed, cameraPosition, lightArray):
+        '''
+        Snapshot the world on this thread and queue the compression and writing on the worker. Returns the future of the save (its result is the size of the file)
+        '''
+        chunks = self.snapshot(worldArray, chunkSummary)
+        cameraPosition = tuple(float(cameraPosition[axis]) for axis in range(3))
+
+        self.pendingSave = self.executor.submit(self.writeSnapshot, chunks, seed, cameraPosition, np.array(lightArray, LIGHT_DTYPE))
+        chunkIndices = list(chunks) # Not the chunks themselves, so the future doesn't keep the copies alive
+        self.pendingSave.add_done_callback(lambda future: self.remarkChunks(chunkIndices, future))
+        self.lastSaveTime = time.perf_counter()
+        return self.pendingSave
+
+    def isSaving(self):
+        '''
+        Check whether a save is still being written
+        '''
+        return self.pendingSave is not None and not self.pendingSave.done()
+
+    def autosaveDue(self):
+        '''
+        Check whether the autosave interval has passed since the last save (and the last save has finished)
+        '''
+        return self.autosaveInterval is not None and time.perf_counter() - self.lastSaveTime >= self.autosaveInterval and not self.isSaving()
+
+    def wait(self):
+        '''
+        Wait for the queued saves to finish and return the size of the file
+        '''
+        return None if self.pendingSave is None else self.pendingSave.result()
+
+    def close(self):
+        '''
+        Wait for the queued saves and stop the worker
+        '''
+        self.wait()
+        self.executor.shutdown()
@@ -0,0 +1,212 @@
+from Settings import *
+from Chunk import *
+from Noise import *
+from concurrent.futures import ThreadPoolExecutor
+import tempfile
+
+class ChunkStreamer:
+    '''
+    Keep a fixed window of chunk columns (the full world height) resident around the camera in a ring buffer world array. A chunk column at (chunkX, chunkZ) always lives in slot (chunkX mod windowChunks, chunkZ mod windowChunks), so a map position's array position is just its x and z wrapped by the ring size (the same wrapping convertToImagePos does in World.comp). Columns entering the window are generated or loaded on a background worker and columns leaving it are written to disk if they were modified. Without a directory the columns go to a temporary directory that is deleted on close (for worlds that are never saved)
+    '''
+    def __init__(self, worldArray, seed, directory = None, windowChunks = STREAM_WINDOW_XZ, numWorkers = 1):
+        self.temporaryDirectory = tempfile.TemporaryDirectory(prefix = 'Stream') if directory is None else None
+        self.worldArray, self.seed = worldArray, seed
+        self.directory = self.temporaryDirectory.name if directory is None else directory
+        self.windowChunks = windowChunks
+        self.ringSize = np.shape(worldArray)
+        os.makedirs(self.directory, exist_ok = True)
+
+        self.heightMapEngine = HeightMapEngine(seed) # Normalized by the fixed world size so that streamed terrain matches a generated world with the same seed
+        self.bands = buildElevationBands(self.ringSize[Y_INDEX])
+
+        self.windowOrigin = None
+        self.resident, self.modified = set(), set()
+        self.pending, self.saving = {}, {}
+        self.executor = ThreadPoolExecutor(numWorkers)
+
+    @staticmethod
+    def getChunkColumn(mapPos):
+        '''
+        Get the chunk column holding a map position
+        '''
+        return (int(mapPos[X_INDEX]) // CHUNK_SIZE, int(mapPos[Z_INDEX]) // CHUNK_SIZE)
+
+    def getWindowOrigin(self, cameraPosition):
+        '''
+        Get the chunk column at the minimum corner of the window centred on the camera
+        '''
+        cameraChunkX, cameraChunkZ = self.getChunkColumn((math.floor(cameraPosition[X_INDEX]), 0, math.floor(cameraPosition[Z_INDEX])))
+        return (cameraChunkX - self.windowChunks // 2, cameraChunkZ - self.windowChunks // 2)
+
+    def getWorldOrigin(self):
+        '''
+        Get the map position of the minimum corner of the window (passed to the ray tracing compute shader)
+        '''
+        if self.windowOrigin is None:
+            return (0, 0, 0)
+        return (self.windowOrigin[0] * CHUNK_SIZE, 0, self.windowOrigin[1] * CHUNK_SIZE)
+
+    def windowColumns(self):
+        '''
+        Return every chunk column within the window
+        '''
+        originX, originZ = self.windowOrigin
+        return {(originX + x, originZ + z) for x in range(self.windowChunks) for z in range(self.windowChunks)}
+
+    def inWindow(self, mapPos):
+        '''
+        Check whether a map position is within the window
+        '''
+        if self.windowOrigin is None or not 0 <= int(mapPos[Y_INDEX]) < self.ringSize[Y_INDEX]:
+            return False
+
+        chunkX, chunkZ = self.getChunkColumn(mapPos)
+        originX, originZ = self.windowOrigin
+        return originX <= chunkX < originX + self.windowChunks and originZ <= chunkZ < originZ + self.windowChunks
+
+    def isResident(self, mapPos):
+        '''
+        Check whether a map position is within the window and its chunk column has been loaded
+        '''
+        return self.inWindow(mapPos) and self.getChunkColumn(mapPos) in self.resident
+
+    def toArrayPos(self, mapPos):
+        '''
+        Wrap a map position into its position in the ring buffer world array
+        '''
+        return (int(mapPos[X_INDEX]) % self.ringSize[X_INDEX], int(mapPos[Y_INDEX]), int(mapPos[Z_INDEX]) % self.ringSize[Z_INDEX])
+
+    def getSlotBox(self, column):
+        '''
+        Get the box [minPos, maxPos) of the ring buffer that a chunk column lives in
+        '''
+        slotX, slotZ = (column[0] % self.windowChunks) * CHUNK_SIZE, (column[1] % self.windowChunks) * CHUNK_SIZE
+        return (slotX, 0, slotZ), (slotX + CHUNK_SIZE, self.ringSize[Y_INDEX], slotZ + CHUNK_SIZE)
+
+    def getSlot(self, column):
+        '''
+        Get the view of the ring buffer that a chunk column lives in
+        '''
+        (minX, _, minZ), (maxX, _, maxZ) = self.getSlotBox(column)
+        return self.worldArray[minX:maxX, :, minZ:maxZ]
+
+    def getColumnPath(self, column):
+        '''
+        Get the file a modified chunk column is saved to
+        '''
+        return os.path.join(self.directory, f'{column[0]}_{column[1]}.npy')
+
+    def generateColumn(self, column):
+        '''
+        Generate a chunk column from the seed (the same terrain generateTerrain gives at these coordinates)
+        '''
+        xStart, zStart = column[0] * CHUNK_SIZE, column[1] * CHUNK_SIZE
+        heightMap = self.heightMapEngine.generateRegion(xStart, xStart + CHUNK_SIZE, zStart, zStart + CHUNK_SIZE, numThreads = 1)
+
+        block = np.zeros((CHUNK_SIZE, self.ringSize[Y_INDEX], CHUNK_SIZE), 'u1')
+        fillBlock(block, heightMap, *self.bands, self.seed, xStart, zStart)
+        return block
+
+    def loadColumn(self, column, saveFuture):
+        '''
+        Load a chunk column from disk if it was saved, otherwise generate it (runs on the background worker)
+        '''
+        if saveFuture is not None:
+            saveFuture.result() # A column that is re-entering the window has to finish saving first
+
+        filePath = self.getColumnPath(column)
+        if os.path.isfile(filePath):
+            return np.load(filePath)
+        return self.generateColumn(column)
+
+    def saveColumn(self, column, block):
+        '''
+        Save a chunk column to disk (written to a temporary file first so that a crash never leaves a partial column)
+        '''
+        filePath = self.getColumnPath(column)
+        tempPath = filePath + '.tmp'
+        with open(tempPath, 'wb') as file:
+            np.save(file, block)
+        os.replace(tempPath, filePath)
+
+    def evictColumn(self, column):
+        '''
+        Evict a chunk column from the window, saving it on the background worker if it was modified and clearing its slot
+        '''
+        self.resident.discard(column)
+        if column in self.modified:
+            self.modified.discard(column)
+            self.saving[column] = self.executor.submit(self.saveColumn, column, self.getSlot(column).copy())
+
+        self.getSlot(column)[:] = EMPTY_VOXEL
+
+    def collectLoaded(self, wait = False):
+        '''
+        Copy the chunk columns that finished loading into their slots and return them
+        '''
+        loaded = []
+        for column, future in list(self.pending.items()):
+            if not wait and not future.done():
+                continue
+
+            self.pending.pop(column)
+            self.getSlot(column)[:] = future.result()
+            self.resident.add(column)
+            loaded.append(column)
+
+        for column, future in list(self.saving.items()):
+            if future.done():
+                self.saving.pop(column).result()
+        return loaded
+
+    def update(self, cameraPosition, wait = False):
+        '''
+        Move the window to the camera, evicting the chunk columns that left it and queueing the ones that entered it (closest to the camera first). Returns the chunk columns that were loaded and evicted so the caller can refresh anything derived from the world array
+        '''
+        evicted = []
+        windowOrigin = self.getWindowOrigin(cameraPosition)
+
+        if windowOrigin != self.windowOrigin:
+            self.windowOrigin = windowOrigin
+            columns = self.windowColumns()
+
+            for column in list(self.resident - columns):
+                self.evictColumn(column)
+                evicted.append(column)
+
+            for column in list(self.pending.keys() - columns):
+                self.pending.pop(column).cancel()
+
+            cameraColumn = self.getChunkColumn((math.floor(cameraPosition[X_INDEX]), 0, math.floor(cameraPosition[Z_INDEX])))
+            newColumns = sorted(columns - self.resident - self.pending.keys(), key = lambda column: (column[0] - cameraColumn[0]) ** 2 + (column[1] - cameraColumn[1]) ** 2)
+            for column in newColumns:
+                self.pending[column] = self.executor.submit(self.loadColumn, column, self.saving.get(column))
+
+        return self.collectLoaded(wait), evicted
+
+    def markModified(self, mapPos):
+        '''
+        Mark the chunk column holding a map position as modified so that it is saved when it's evicted
+        '''
+        self.modified.add(self.getChunkColumn(mapPos))
+
+    def flush(self):
+        '''
+        Save every modified resident chunk column and wait for all pending saves
+        '''
+        for column in list(self.modified):
+            self.saveColumn(column, self.getSlot(column))
+        self.modified.clear()
+
+        for column in list(self.saving):
+            self.saving.pop(column).result()
+
+    def close(self):
+        '''
+        Flush the modified chunk columns and stop the background worker (a temporary directory is deleted instead of flushed)
+        '''
+        if self.temporaryDirectory is None:
+            self.flush()
+        self.executor.shutdown(cancel_futures = True)
+        if self.temporaryDirectory is not None:
+            self.temporaryDirectory.cleanup()
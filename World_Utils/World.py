@@ -1,16 +1,33 @@
 from Settings import *
 from Chunk import *
 from Materials import *
+from LightTable import *
+from LightGrid import *
 from Noise import * 
 from Ray import *
+from DDA import *
+from DirtyRegions import *
+from ChunkSummary import *
+from Brickmap import *
+from LODPyramid import *
+from RegionGeneration import *
+from Streaming import *
+from RegionFile import *
+from SaveService import *
+from ColumnRLE import *
+from WorldCache import *
+from EditJournal import *
+from Profiler import *
+from PathTracer import *
 from World_Utils.Textures import Texture
 
 class World:
     '''
-    Create the scene with a list of hittables that are passed as a Shader Storage Buffer Object (SSBO) to the ray tracing compute shader
+    Create the scene with a list of hittables that are passed as a Shader Storage Buffer Object (SSBO) to the ray tracing compute shader. A world that isn't persistent is always generated from the seed and never reads or writes saves (for recorded input sessions, which have to start from the same world every time), and a streamed one keeps its chunk columns in a temporary directory
     '''
-    def __init__(self, ctx, rayTracer, camera):
+    def __init__(self, ctx, rayTracer, camera, seed = SEED, worldSize = None, persistent = True):
         self.ctx, self.rayTracer, self.camera = ctx, rayTracer, camera
+        self.persistent = persistent
 
         self.voxels = np.arange(START_INDEX, START_INDEX + 10) # Numpy array of voxels that can be selected using the number keys
         self.voxelPlaceID = self.voxels[0]
@@ -18,36 +35,227 @@ class World:
         self.lightIDs = {RED_LIGHT, GREEN_LIGHT, BLUE_LIGHT}
         self.initMaterials()
 
-        self.filePath = f'Worlds/{SAVE_NAME}.npz'
-
-        if os.path.isfile(self.filePath):
+        self.filePath = f'Worlds/{SAVE_NAME}{REGION_EXTENSION}'
+        self.legacyFilePath = f'Worlds/{SAVE_NAME}.npz' # Saves from before region files (converted by ConvertSaves.py)
+        self.journalPath = f'Worlds/{SAVE_NAME}{JOURNAL_EXTENSION}'
+        self.streamer, self.saveService, self.journal = None, None, None
+        self.worldCache = WorldCache(f'Worlds/{SAVE_NAME}{CACHE_EXTENSION}') if USE_WORLD_CACHE and persistent and not STREAMING and not RLE_STORAGE else None
+
+        if STREAMING:
+            self.initStreaming(seed, persistent)
+        elif self.worldCache is not None and os.path.isfile(self.filePath) and self.worldCache.isValid(self.filePath):
+            self.loadCachedWorld()
+        elif persistent and os.path.isfile(self.filePath):
             self.loadWorld()
+        elif persistent and os.path.isfile(self.legacyFilePath):
+            self.loadLegacyWorld()
         else:
-            self.worldSize = (WORLD_SIZE_XZ * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, WORLD_SIZE_XZ * CHUNK_SIZE)
-            self.worldArray = np.zeros(self.worldSize, 'u1')
+            journalHeader = readGeneratedJournalHeader(self.journalPath) if EDIT_JOURNAL and persistent else None
+            if journalHeader is not None and journalHeader['seed'] is not None: # The world crashed before its first save, so generate the same world again for its journal
+                seed, worldSize = journalHeader['seed'], journalHeader['worldSize']
+
+            self.worldSize = (WORLD_SIZE_XZ * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, WORLD_SIZE_XZ * CHUNK_SIZE) if worldSize is None else tuple(worldSize)
+            self.worldArray = ColumnRLE(self.worldSize) if RLE_STORAGE else np.zeros(self.worldSize, 'u1')
+            self.chunkSummary = ChunkSummary(self.worldSize)
+
+            self.seed = randint(0, 10000000) if seed is None else seed
+            self.generateChunks(GENERATION_WORKERS)
+
+            self.lights = LightTable()
+
+        if self.streamer is None and persistent:
+            self.saveService = SaveService(self.filePath, self.worldSize)
+        if self.worldCache is not None and self.worldCache.array is None:
+            self.worldArray = self.worldCache.create(self.worldArray, self.seed, self.filePath, os.path.isfile(self.filePath))
+        if EDIT_JOURNAL and self.saveService is not None:
+            self.journal = EditJournal(self.journalPath, self.worldSize, self.seed, onSave = os.path.isfile(self.filePath) or os.path.isfile(self.legacyFilePath))
+            self.replayJournal(self.journal.read())
+            self.journal.open()
+
+        self.lightGrid = LightGrid(self.worldSize, buildMaterialArray(self.materialList)['color'], self.lights)
+        self.dirtyRegions = DirtyRegions(self.worldSize)
+        self.brickmap = Brickmap(self.worldSize)
+        self.brickmap.build(self.worldArray, self.chunkSummary.state)
+        self.lodPyramid = LODPyramid(self.worldSize)
+        self.lodPyramid.build(self.worldArray, self.chunkSummary.state)
+        self.updateStreaming(wait = True)
+
+    def initStreaming(self, seed, persistent = True):
+        '''
+        Set up the ring buffer world array for streaming mode (its size is fixed by the window no matter how far the camera goes). Modified chunk columns are saved in a folder next to the regular saves, or in a temporary directory if the world isn't persistent
+        '''
+        self.streamPath = f'Worlds/{SAVE_NAME}_Stream' if persistent else None
+        self.filePath = os.path.join(self.streamPath, 'World.npz') if persistent else None
+
+        if persistent and os.path.isfile(self.filePath):
+            loadedWorld = np.load(self.filePath)
+            self.seed = int(loadedWorld['seed'])
+            self.camera.cameraPosition = glm.vec3(*loadedWorld['cameraPosition'])
+        else:
+            self.seed = randint(0, 10000000) if seed is None else seed
+
+        self.worldSize = (STREAM_WINDOW_XZ * CHUNK_SIZE, WORLD_SIZE_Y * CHUNK_SIZE, STREAM_WINDOW_XZ * CHUNK_SIZE)
+        self.worldArray = np.zeros(self.worldSize, 'u1')
+        self.chunkSummary = ChunkSummary(self.worldSize)
+        self.streamer = ChunkStreamer(self.worldArray, self.seed, self.streamPath, STREAM_WINDOW_XZ)
+
+        self.lights = LightTable()
+
+    @profiler.profile('World.updateStreaming')
+    def updateStreaming(self, wait = False):
+        '''
+        Move the streaming window to the camera and refresh the chunk summary, brickmap, LOD pyramid, lights, and GPU regions of every chunk column that was loaded or evicted (once per frame)
+        '''
+        if self.streamer is None:
+            return
+
+        loaded, evicted = self.streamer.update(self.camera.cameraPosition, wait)
+        for column in evicted:
+            for mapPos in [mapPos for mapPos in self.lights if self.streamer.getChunkColumn(mapPos) == column]:
+                self.lights.pop(mapPos)
+                self.lightGrid.removeLight(mapPos)
+            self.refreshColumn(column)
+        
+        for column in loaded:
+            slotLights = np.argwhere(np.isin(self.streamer.getSlot(column), list(self.lightIDs)))
+            for localPos in slotLights:
+                mapPos = (column[0] * CHUNK_SIZE + int(localPos[X_INDEX]), int(localPos[Y_INDEX]), column[1] * CHUNK_SIZE + int(localPos[Z_INDEX]))
+                self.lights[mapPos] = int(self.streamer.getSlot(column)[tuple(localPos)])
+                self.lightGrid.addLight(mapPos, self.lights[mapPos])
+            self.lightGrid.markRegion((column[0] * CHUNK_SIZE, 0, column[1] * CHUNK_SIZE), ((column[0] + 1) * CHUNK_SIZE, self.worldSize[Y_INDEX], (column[1] + 1) * CHUNK_SIZE)) # The column's cells took over the grid cells of an evicted column
+            self.refreshColumn(column)
+
+        if self.ctx is None or not (loaded or evicted):
+            return
+        
+        self.rayTracer['worldOrigin'] = self.streamer.getWorldOrigin()
+        self.writeLightsToSSBO()
+
+    def refreshColumn(self, column):
+        '''
+        Rebuild everything derived from the slot of a chunk column after it was replaced
+        '''
+        minPos, maxPos = self.streamer.getSlotBox(column)
+        for chunkY in range(self.chunkSummary.numChunks[Y_INDEX]):
+            self.chunkSummary.buildChunk(self.worldArray, (minPos[X_INDEX] // CHUNK_SIZE, chunkY, minPos[Z_INDEX] // CHUNK_SIZE))
+        
+        self.brickmap.rebuildRegion(self.worldArray, minPos, maxPos)
+        self.lodPyramid.rebuildRegion(self.worldArray, minPos, maxPos)
+        self.dirtyRegions.markBox(minPos, maxPos)
+
+    def getWorldOrigin(self):
+        '''
+        Get the map position of the first voxel of the world array (only non-zero in streaming mode)
+        '''
+        return (0, 0, 0) if self.streamer is None else self.streamer.getWorldOrigin()
+
+    def getArrayPos(self, mapPos):
+        '''
+        Get the world array position of a map position (wrapped into the ring buffer in streaming mode)
+        '''
+        if self.streamer is None:
+            return (int(mapPos[X_INDEX]), int(mapPos[Y_INDEX]), int(mapPos[Z_INDEX]))
+        return self.streamer.toArrayPos(mapPos)
+
+    @profiler.profile('World.saveWorld')
+    def saveWorld(self, wait = True):
+        '''
+        Save the world to a file with the save service, which snapshots the chunks edited since the last save and writes them on its worker thread (wait blocks until the file is written). In streaming mode only the modified chunk columns, the seed, and the camera position need to be saved
+        '''
+        if self.streamer is not None:
+            if not self.persistent:
+                return
+            self.streamer.flush() # The streamer keeps running, it's only closed when the program shuts down
+            np.savez(self.filePath, seed = self.seed, cameraPosition = self.camera.cameraPosition)
+            return
+        if self.saveService is None: # Not persistent
+            return
+        
+        segment = None if self.journal is None else self.journal.rotate() # Right before the snapshot, so the segment holds exactly the edits this save adds
+        saveFuture = self.saveService.save(self.worldArray, self.chunkSummary, self.seed, self.camera.cameraPosition, buildLightArray(self.lights))
+        if segment is not None:
+            saveFuture.add_done_callback(lambda future: future.exception() is None and self.journal.removeSegments(segment)) # Folds the journal into the save once it's written
+        if self.worldCache is not None:
+            self.worldCache.saveStarted(saveFuture)
 
-            self.heightMap = generateHeightMap()
-            self.generateChunks()
+        if wait:
+            self.saveService.wait()
+            if segment is not None:
+                self.journal.removeSegments(segment) # The callback may still be running when the wait returns
+            self.updateCache()
 
-            self.lights = {}
+    def autosave(self):
+        '''
+        Start a background save if the autosave interval has passed (once per frame)
+        '''
+        if self.saveService is not None and self.saveService.autosaveDue():
+            self.saveWorld(wait = False)
+        if self.journal is not None:
+            self.journal.flushDue()
+        self.updateCache()
 
-    def saveWorld(self):
+    def updateCache(self):
         '''
-        Save the world to a file 
+        Mark the world cache as matching the save once a save without later edits has been written
         '''
-        np.savez_compressed(self.filePath, worldArray = self.worldArray, lightArray = self.lightArray, cameraPosition = self.camera.cameraPosition)
+        if self.worldCache is not None:
+            self.worldCache.update(self.filePath)
+
+    def loadCachedWorld(self):
+        '''
+        Memory map the world array from the world cache (only the header of the region file is read for the lights and camera)
+        '''
+        regionFile = RegionFile(self.filePath)
+        self.worldArray = self.worldCache.open()
+        self.worldSize, self.seed = regionFile.worldSize, regionFile.seed
+
+        self.chunkSummary = ChunkSummary(self.worldSize)
+        self.chunkSummary.build(self.worldArray)
+
+        self.lightArray = regionFile.lightArray
+        self.camera.cameraPosition = regionFile.cameraPosition
+
+        self.loadLights()
 
     def loadWorld(self):
         '''
-        Load the world array and lights
+        Load the world array and lights from the region file (its chunks are decompressed in parallel)
+        '''
+        regionFile = RegionFile(self.filePath)
+        self.worldSize = regionFile.worldSize
+        
+        if RLE_STORAGE:
+            self.worldArray = ColumnRLE(self.worldSize)
+            for chunkX in range(regionFile.numChunks[X_INDEX]):
+                self.worldArray.encodeSlab(chunkX * CHUNK_SIZE, regionFile.loadRegion((chunkX, 0, 0), (chunkX + 1, *regionFile.numChunks[Y_INDEX:])))
+            self.worldArray.trim()
+        else:
+            self.worldArray = regionFile.loadWorld()
+        self.seed = regionFile.seed
+
+        self.chunkSummary = ChunkSummary(self.worldSize)
+        self.chunkSummary.build(self.worldArray)
+
+        self.lightArray = regionFile.lightArray
+        self.camera.cameraPosition = regionFile.cameraPosition
+
+        self.loadLights()
+
+    def loadLegacyWorld(self):
+        '''
+        Load the world array and lights from a legacy .npz save
         '''
         try:
-            loadedWorld = np.load(self.filePath)
+            loadedWorld = np.load(self.legacyFilePath)
         except:
             raise RuntimeError('''Bad Load Save. Remember to KEEP THE PROGRAM RUNNING even when the window looks closed because numpy is compressing and saving during that time. You're save to close Python when the terminal says ('Finished Saving')''')
     
-        self.worldArray = loadedWorld['worldArray']
+        self.worldArray = ColumnRLE.fromDense(loadedWorld['worldArray']) if RLE_STORAGE else loadedWorld['worldArray']
         self.worldSize = np.shape(self.worldArray)
+        self.seed = int(loadedWorld['seed']) if 'seed' in loadedWorld.files else None # Saves from before seeds were stored don't know their seed
+
+        self.chunkSummary = ChunkSummary(self.worldSize)
+        self.chunkSummary.build(self.worldArray)
 
         self.lightArray = loadedWorld['lightArray']
 
@@ -55,15 +263,53 @@ class World:
 
         self.loadLights()
     
-    def loadLights(self):
+    def replayJournal(self, records):
         '''
-        Load all the lights dictionary from the worldArray
+        Apply the edits of the journal records on top of the loaded save. Only the last record of every position matters, so the voxels are written with one scatter and the chunk summary, save and lights are updated once for all of them. Returns the number of voxels that changed
         '''
-        self.lights = {}
-        for light in np.nditer(self.lightArray):
-            mapPos, voxelID = light['mapPos'], light['voxelID']
+        records = records[np.argsort(records['sequence'], kind = 'stable')]
+        records = records[np.all((records['mapPos'] >= 0) & (records['mapPos'] < self.worldSize), axis = 1)]
+        if len(records) == 0:
+            return 0
 
-            self.lights[tuple(mapPos)] = int(voxelID)
+        records = records[::-1] # np.unique keeps the first index of every position, which is then its newest record
+        _, lastRecords = np.unique(np.ravel_multi_index(tuple(records['mapPos'].T), self.worldSize), return_index = True)
+        positions = tuple(records['mapPos'][lastRecords, axis].astype(np.intp) for axis in range(3))
+        newIDs = records['newID'][lastRecords]
+
+        if isColumnRLE(self.worldArray):
+            mapPositions = list(zip(*(position.tolist() for position in positions)))
+            oldIDs = np.array([self.worldArray.getVoxel(*mapPos) for mapPos in mapPositions], 'u1')
+            for mapPos, voxelID in zip(mapPositions, newIDs.tolist()):
+                self.worldArray.setVoxel(*mapPos, voxelID)
+        else:
+            oldIDs = self.worldArray[positions]
+            if self.worldCache is not None and np.any(oldIDs != newIDs):
+                self.worldCache.markDirty() # Before the edits reach the mapped pages
+            self.worldArray[positions] = newIDs
+
+        changed = oldIDs != newIDs
+        positions, oldIDs, newIDs = tuple(position[changed] for position in positions), oldIDs[changed], newIDs[changed]
+        if len(oldIDs) == 0:
+            return 0
+
+        self.chunkSummary.updateVoxels(positions, oldIDs, newIDs)
+        self.saveService.markVoxels(positions)
+
+        lightIDs = list(self.lightIDs)
+        for i in np.flatnonzero(np.isin(oldIDs, lightIDs) | np.isin(newIDs, lightIDs)).tolist():
+            mapPos = tuple(int(position[i]) for position in positions)
+            if mapPos in self.lights:
+                self.lights.pop(mapPos)
+            if int(newIDs[i]) in self.lightIDs:
+                self.lights[mapPos] = int(newIDs[i])
+        return len(oldIDs)
+
+    def loadLights(self):
+        '''
+        Load the light table from the saved light array
+        '''
+        self.lights = LightTable.fromArray(self.lightArray, self.lightIDs)
 
     def setVoxel(self, keyIndex):
         '''
@@ -75,117 +321,102 @@ class World:
         '''
         Set the time of the day in the renderer (background color)
         '''
-        if time == 'Night':
-            self.rayTracer['topColor'] = glm.vec3(0.01)
-            self.rayTracer['botColor'] = glm.vec3(0.02)
-        elif time == 'Day':
-            self.rayTracer['topColor'] = glm.vec3(1)
-            self.rayTracer['botColor'] = glm.vec3(0.5, 0.7, 1.0)
-        elif time == 'Dawn':
-            self.rayTracer['topColor'] = glm.vec3(0.3)
-            self.rayTracer['botColor'] = glm.vec3(0.98, 0.48, 0.38)
-        else:
-            raise RuntimeError('This day-night time does not exist!')
-
-    @staticmethod
-    def initRayMarchVars(ray):
-        '''
-        Initialize all the ray march variables and return them
-        '''
-        rayDirSign = glm.sign(ray.direction)
-        mapPos = glm.ivec3(glm.floor(ray.origin))
-        deltaDist = glm.abs(glm.vec3(glm.length(ray.direction)) / ray.direction)
-        rayStep = glm.ivec3(rayDirSign)
+        topColor, botColor = getBackgroundColors(time)
+        self.rayTracer['topColor'] = glm.vec3(topColor)
+        self.rayTracer['botColor'] = glm.vec3(botColor)
 
-        sideDist = (rayDirSign * (glm.vec3(mapPos) - ray.origin) + (rayDirSign * 0.5) + 0.5) * deltaDist
-        mask = glm.vec3(0)
-        
-        return rayDirSign, mapPos, deltaDist, rayStep, sideDist, mask
-    
-    @staticmethod 
-    def ddaStep(mapPos, sideDist, deltaDist, rayStep):
-        '''
-        Perform a DDA step 
-        '''
-        mask = glm.step(sideDist.xyz, glm.min(sideDist.yzx, sideDist.zxy))
-
-        mapPos += glm.ivec3(mask) * rayStep 
-        sideDist += mask * deltaDist 
-
-        return mapPos, sideDist, mask 
-    
     def checkInWorld(self, mapPos):
         '''
         Check whether a map position is within the world
         '''
+        if self.streamer is not None:
+            return self.streamer.isResident(mapPos)
         return glm.all(glm.greaterThanEqual(mapPos, glm.ivec3(0))) and glm.all(glm.lessThan(mapPos, glm.ivec3(self.worldSize)))
 
     def checkVoxelEmpty(self, mapPos):
         '''
-        Check if a voxel is empty 
+        Check if a voxel is empty (the chunk summary lets sky chunks skip the world array lookup)
         '''
-        return self.worldArray[mapPos.x, mapPos.y, mapPos.z] == EMPTY_VOXEL
+        arrayPos = self.getArrayPos(mapPos)
+        return self.chunkSummary.isEmpty(arrayPos) or self.worldArray[arrayPos] == EMPTY_VOXEL
     
-    @staticmethod
-    def getCenterOfVoxel(mapPos):
+    def getReachBox(self, origin, maxRange):
         '''
-        Get the center of the voxel given a map position 
+        Decode the box of voxels within maxRange of a position from column RLE storage, rolled so that wrapping a map position by the box size (as the DDA does for the streaming ring buffer) lands on its voxel. Returns the box and its minimum corner
         '''
-        return glm.vec3(mapPos) + glm.vec3(0.5)
+        minPos = tuple(min(math.floor(max(origin[axis] - maxRange, 0)), self.worldSize[axis]) for axis in range(3))
+        maxPos = tuple(max(math.floor(min(origin[axis] + maxRange, self.worldSize[axis] - 1)) + 1, minPos[axis]) for axis in range(3))
 
-    def rayMarch(self, ray, maxRange):
+        box = self.worldArray[minPos[X_INDEX]:maxPos[X_INDEX], minPos[Y_INDEX]:maxPos[Y_INDEX], minPos[Z_INDEX]:maxPos[Z_INDEX]]
+        return np.roll(box, minPos, axis = (X_INDEX, Y_INDEX, Z_INDEX)), minPos
+
+    def rayMarch(self, ray, maxRange, maxSteps = VIEW_RANGE):
         '''
-        Ray march the world with branchless raymarching and then return the intersection map position and the normal vector. Help from https://www.shadertoy.com/view/4dX3zl and https://www.shadertoy.com/view/mtyfRV
+        Ray march the world with the compiled DDA (the same traversal as rayMarch in World.comp) and then return the intersection map position and the normal vector, or None for both if nothing is hit within maxRange of the ray's origin
         '''
+        worldArray, worldOrigin = self.worldArray, self.getWorldOrigin()
+        if isColumnRLE(worldArray):
+            worldArray, worldOrigin = self.getReachBox(ray.origin, maxRange)
 
-        rayDirSign, mapPos, deltaDist, rayStep, sideDist, mask = self.initRayMarchVars(ray)
-        mask = glm.vec3(0)
+        origins, directions = np.array([tuple(ray.origin)], np.float64), np.array([tuple(ray.direction)], np.float64)
+        hits, mapPositions, normals, _, _ = castRays(worldArray, self.brickmap.brickArray, np.array(worldOrigin, np.int64), origins, directions, maxRange, maxSteps)
 
-        while glm.distance(ray.origin, self.getCenterOfVoxel(mapPos)) < maxRange:
-            if not self.checkInWorld(mapPos) or self.checkVoxelEmpty(mapPos): #If the voxel is empty or we're outside the world, continue raymarching
-                mapPos, sideDist, mask = self.ddaStep(mapPos, sideDist, deltaDist, rayStep)
-                continue 
-            
-            normal = -rayDirSign * mask 
-            return mapPos, glm.ivec3(normal)
-        
-        return None, None # Didn't intersect anything so return None 
+        if not hits[0]:
+            return None, None # Didn't intersect anything so return None 
+        return glm.ivec3(*mapPositions[0].tolist()), glm.ivec3(*normals[0].tolist())
     
+    @profiler.profile('World.writeToMapPos')
     def writeToMapPos(self, mapPos, voxelID):
         '''
-        Write to a specific map position  for the worldArray and then update the world
+        Write to a specific map position for the worldArray and mark its region to be uploaded to the GPU
         '''
-        self.worldArray[mapPos.x, mapPos.y, mapPos.z] = voxelID
-        self.world.write(self.worldArray)
-        self.rayTracer['updatedVoxel'] = True 
+        arrayPos = self.getArrayPos(mapPos)
+        if self.worldCache is not None:
+            self.worldCache.markDirty() # Before the edit reaches the mapped pages
 
-    def writeLightsToSSBO(self):
+        oldID = self.worldArray[arrayPos]
+        if self.journal is not None:
+            self.journal.append(arrayPos, oldID, voxelID)
+        self.worldArray[arrayPos] = voxelID
+
+        self.chunkSummary.update(arrayPos, oldID, voxelID)
+        self.brickmap.update(self.worldArray, arrayPos, voxelID)
+        self.lodPyramid.update(self.worldArray, arrayPos)
+        self.dirtyRegions.markVoxel(arrayPos)
+
+        if self.saveService is not None:
+            self.saveService.markVoxel(arrayPos)
+        if self.streamer is not None:
+            self.streamer.markModified(mapPos)
+
+    @profiler.profile('World.uploadDirtyRegions')
+    def uploadDirtyRegions(self):
         '''
-        Write the lights array to the SSBO 
+        Upload only the merged dirty sub-volumes of the world array (and the changed bricks of the brickmap) to their textures (once per frame). Returns the number of bytes uploaded
         '''
-        lenLights = len(self.lights)
-        self.rayTracer['numLights'] = lenLights
-
-        lightDType = np.dtype([
-            ('mapPos', 'i4', 3),
-            ('voxelID', 'i4')
-        ])
+        if not self.dirtyRegions:
+            return 0
         
-        if lenLights == 0:
-            self.lightArray = np.ones(1, lightDType)
-        else: 
-            self.lightArray = np.empty(lenLights, lightDType)
+        uploadedBytes = writeRegions(self.world, self.worldArray, self.dirtyRegions.popBoxes())
+        uploadedBytes += self.brickmap.uploadDirty()
+        self.rayTracer['updatedVoxel'] = True 
+        return uploadedBytes
 
-            for i, (mapPos, voxelID) in zip(range(lenLights), self.lights.items()):
-                self.lightArray[i]['mapPos'] = mapPos 
-                self.lightArray[i]['voxelID'] = voxelID 
+    @profiler.profile('World.writeLightsToSSBO')
+    def writeLightsToSSBO(self):
+        '''
+        Write the light slots and light grid cells that changed since the last write to their SSBOs (the whole table when the SSBO doesn't exist yet or the table grew). Returns the number of bytes written
+        '''
+        if self.ctx is None: # Headless (benchmarks and the CPU path tracer read the table and grid directly)
+            return 0
 
-        self.lightBuffer = self.ctx.buffer(self.lightArray)
-        self.lightBuffer.bind_to_storage_buffer(1)
+        self.rayTracer['numLights'] = len(self.lights)
+        return self.lights.upload(self.ctx) + self.lightGrid.upload(self.ctx, self.getWorldOrigin())
 
+    @profiler.profile('World.writeToLights')
     def writeToLights(self, mapPos, voxelID):
         '''
-        Write to the light dictionary if the voxelID is a light
+        Write to the light table if the voxelID is a light
         '''
         mapPos, voxelID = tuple(mapPos), int(voxelID)
         if (mapPos not in self.lights and voxelID == EMPTY_VOXEL) or (voxelID not in self.lightIDs and voxelID != EMPTY_VOXEL):
@@ -193,8 +424,10 @@ class World:
         
         if voxelID == EMPTY_VOXEL:
             self.lights.pop(mapPos)
+            self.lightGrid.removeLight(mapPos)
         else:
             self.lights[mapPos] = voxelID 
+            self.lightGrid.addLight(mapPos, voxelID)
         
         self.writeLightsToSSBO()
 
@@ -222,29 +455,135 @@ class World:
         self.writeToMapPos(mapPos, self.voxelPlaceID)
         self.writeToLights(mapPos, self.voxelPlaceID)
         
-    def initMaterials(self):
+    def getEditPieces(self, minPos, maxPos):
         '''
-        Initialize the materials list
+        Split a box [minPos, maxPos) of map positions into the pieces that are contiguous in the world array. Returns (piece minPos, piece maxPos, array position of the piece's first voxel) for every piece inside the world (in streaming mode, every piece of a resident chunk column)
+        '''
+        minPos = tuple(max(int(minPos[axis]), 0) if axis == Y_INDEX or self.streamer is None else int(minPos[axis]) for axis in range(3))
+        maxPos = tuple(min(int(maxPos[axis]), self.worldSize[axis]) if axis == Y_INDEX or self.streamer is None else int(maxPos[axis]) for axis in range(3))
+        if any(maxPos[axis] <= minPos[axis] for axis in range(3)):
+            return []
+
+        if self.streamer is None:
+            return [(minPos, maxPos, minPos)]
+
+        pieces = []
+        for chunkX in range(minPos[X_INDEX] // CHUNK_SIZE, (maxPos[X_INDEX] - 1) // CHUNK_SIZE + 1):
+            for chunkZ in range(minPos[Z_INDEX] // CHUNK_SIZE, (maxPos[Z_INDEX] - 1) // CHUNK_SIZE + 1):
+                pieceMin = (max(minPos[X_INDEX], chunkX * CHUNK_SIZE), minPos[Y_INDEX], max(minPos[Z_INDEX], chunkZ * CHUNK_SIZE))
+                pieceMax = (min(maxPos[X_INDEX], (chunkX + 1) * CHUNK_SIZE), maxPos[Y_INDEX], min(maxPos[Z_INDEX], (chunkZ + 1) * CHUNK_SIZE))
+                if self.streamer.isResident(pieceMin):
+                    pieces.append((pieceMin, pieceMax, self.streamer.toArrayPos(pieceMin)))
+        return pieces
+
+    @profiler.profile('World.editRegion')
+    def editRegion(self, minPos, maxPos, edit):
+        '''
+        Apply an edit to the box [minPos, maxPos) of map positions. edit(oldBox, minPos) gets the voxels of a piece of the box (see getEditPieces) and returns its new voxels, so every piece is read and written with one slice. The chunk summary, brickmap, LOD pyramid, save, dirty regions, and lights are updated once per piece, and the light SSBOs are written once. Returns the number of voxels that changed
         '''
-        self.materialList = []
+        if self.worldCache is not None:
+            self.worldCache.markDirty() # Before the edit reaches the mapped pages
 
-        self.materialList.append(LambertianMaterial(Texture('Grass')))
-        self.materialList.append(LambertianMaterial(Texture('Dirt')))
-        self.materialList.append(LambertianMaterial(Texture('Stone')))
-        self.materialList.append(LambertianMaterial(Texture('Sand')))
-        self.materialList.append(ReflectiveMaterial(Texture('Snow'), 0.5))
-        self.materialList.append(LambertianMaterial(Texture('Clay')))
-        self.materialList.append(LambertianMaterial(Texture('Wood')))
-        self.materialList.append(ReflectiveMaterial(Texture(glm.vec3(0.5)), 0))
+        numChanged, lightsChanged = 0, False
+        for pieceMin, pieceMax, arrayMin in self.getEditPieces(minPos, maxPos):
+            arrayMax = tuple(arrayMin[axis] + pieceMax[axis] - pieceMin[axis] for axis in range(3))
+            arraySlices = tuple(slice(arrayMin[axis], arrayMax[axis]) for axis in range(3))
 
-        self.materialList.append(PointLight(glm.vec3(15, 0.9, 0.9)))
-        self.materialList.append(PointLight(glm.vec3(0.9, 15, 0.9)))
-        self.materialList.append(PointLight(glm.vec3(0.9, 0.9, 15)))
+            oldBox = np.array(self.worldArray[arraySlices]) # A copy (dense slices are views)
+            newBox = np.asarray(edit(oldBox, pieceMin), 'u1')
+            changed = oldBox != newBox
+            if not changed.any():
+                continue
 
-        self.materialList.append(DielectricMaterial(Texture(glm.vec3(1, 0.8, 0.8)), 1.52))
-        self.materialList.append(DielectricMaterial(Texture(glm.vec3(0.8, 1, 0.8)), 1.52))
-        self.materialList.append(DielectricMaterial(Texture(glm.vec3(0.8, 0.8, 1)), 1.52))
-        self.materialList.append(DielectricMaterial(Texture(glm.vec3(1)), 1.52))
+            if self.journal is not None:
+                changedPositions = np.nonzero(changed)
+                self.journal.appendMany(tuple(changedPositions[axis] + arrayMin[axis] for axis in range(3)), oldBox[changed], newBox[changed])
+            self.worldArray[arraySlices] = newBox
+            numChanged += int(np.count_nonzero(changed))
+            self.chunkSummary.updateBox(arrayMin, oldBox, newBox)
+
+            brickMin = tuple(arrayMin[axis] // BRICK_SIZE * BRICK_SIZE for axis in range(3))
+            brickMax = tuple(min(-(-arrayMax[axis] // BRICK_SIZE) * BRICK_SIZE, self.worldSize[axis]) for axis in range(3))
+            self.brickmap.rebuildRegion(self.worldArray, brickMin, brickMax)
+            self.lodPyramid.rebuildRegion(self.worldArray, arrayMin, arrayMax)
+            self.dirtyRegions.markBox(arrayMin, arrayMax)
+
+            if self.saveService is not None:
+                self.saveService.markBox(arrayMin, arrayMax)
+            if self.streamer is not None:
+                self.streamer.markModified(pieceMin)
+
+            lightIDs = list(self.lightIDs)
+            lightChanges = changed & (np.isin(oldBox, lightIDs) | np.isin(newBox, lightIDs))
+            for localPos in np.argwhere(lightChanges).tolist():
+                mapPos = tuple(pieceMin[axis] + localPos[axis] for axis in range(3))
+                voxelID = int(newBox[tuple(localPos)])
+                if mapPos in self.lights:
+                    self.lights.pop(mapPos)
+                    self.lightGrid.removeLight(mapPos)
+                if voxelID in self.lightIDs:
+                    self.lights[mapPos] = voxelID
+                    self.lightGrid.addLight(mapPos, voxelID)
+                lightsChanged = True
+
+        if lightsChanged:
+            self.writeLightsToSSBO()
+        return numChanged
+
+    def fillBox(self, minPos, maxPos, voxelID):
+        '''
+        Fill the box [minPos, maxPos) of map positions with a voxel (EMPTY_VOXEL clears it). Returns the number of voxels that changed
+        '''
+        return self.editRegion(minPos, maxPos, lambda oldBox, pieceMin: np.full_like(oldBox, voxelID))
+
+    def replaceInBox(self, minPos, maxPos, oldID, newID):
+        '''
+        Replace every oldID voxel in the box [minPos, maxPos) with newID. Returns the number of voxels that changed
+        '''
+        return self.editRegion(minPos, maxPos, lambda oldBox, pieceMin: np.where(oldBox == oldID, np.uint8(newID), oldBox))
+
+    def fillSphere(self, center, radius, voxelID):
+        '''
+        Fill every voxel whose center is within radius of a map position with a voxel. Returns the number of voxels that changed
+        '''
+        center = np.array(tuple(center), np.float64)
+        minPos = tuple(math.floor(center[axis] - radius) for axis in range(3))
+        maxPos = tuple(math.floor(center[axis] + radius) + 1 for axis in range(3))
+
+        def fillPiece(oldBox, pieceMin):
+            x, y, z = (np.arange(pieceMin[axis], pieceMin[axis] + oldBox.shape[axis]) + 0.5 - center[axis] for axis in range(3))
+            inside = x[:, None, None] ** 2 + y[None, :, None] ** 2 + z[None, None, :] ** 2 <= radius ** 2
+            return np.where(inside, np.uint8(voxelID), oldBox)
+        return self.editRegion(minPos, maxPos, fillPiece)
+
+    def copyRegion(self, minPos, maxPos):
+        '''
+        Copy the voxels of the box [minPos, maxPos) of map positions into a block for pasteRegion (voxels outside the world, or not resident in streaming mode, are copied as empty)
+        '''
+        minPos, maxPos = tuple(int(axis) for axis in minPos), tuple(int(axis) for axis in maxPos)
+        block = np.zeros(tuple(max(maxPos[axis] - minPos[axis], 0) for axis in range(3)), 'u1')
+        for pieceMin, pieceMax, arrayMin in self.getEditPieces(minPos, maxPos):
+            blockSlices = tuple(slice(pieceMin[axis] - minPos[axis], pieceMax[axis] - minPos[axis]) for axis in range(3))
+            block[blockSlices] = self.worldArray[tuple(slice(arrayMin[axis], arrayMin[axis] + pieceMax[axis] - pieceMin[axis]) for axis in range(3))]
+        return block
+
+    def pasteRegion(self, minPos, block, skipEmpty = False):
+        '''
+        Paste a block (from copyRegion) with its first voxel at a map position. skipEmpty keeps the world's voxels where the block is empty. Returns the number of voxels that changed
+        '''
+        minPos, block = tuple(int(axis) for axis in minPos), np.asarray(block, 'u1')
+        maxPos = tuple(minPos[axis] + block.shape[axis] for axis in range(3))
+
+        def pastePiece(oldBox, pieceMin):
+            blockPiece = block[tuple(slice(pieceMin[axis] - minPos[axis], pieceMin[axis] - minPos[axis] + oldBox.shape[axis]) for axis in range(3))]
+            return np.where(blockPiece == EMPTY_VOXEL, oldBox, blockPiece) if skipEmpty else blockPiece
+        return self.editRegion(minPos, maxPos, pastePiece)
+
+    def initMaterials(self):
+        '''
+        Initialize the materials list
+        '''
+        self.materialList = createMaterialList()
 
     @staticmethod
     @njit(cache = True)
@@ -254,35 +593,48 @@ class World:
         '''
         return (worldIndex[X_INDEX] * CHUNK_SIZE, worldIndex[Y_INDEX] * CHUNK_SIZE, worldIndex[Z_INDEX] * CHUNK_SIZE)
     
-    def generateChunks(self):
-        '''
-        Generate the chunks for the world
-        '''
-        for worldXIndex in range(WORLD_SIZE_XZ):
-            for worldYIndex in range(WORLD_SIZE_Y):
-                for worldZIndex in range(WORLD_SIZE_XZ):
-                    chunkIndex = (worldXIndex, worldYIndex, worldZIndex)
-                    chunkPosition = self.convertWorldIndexToPosition(chunkIndex)
-                    
-                    chunk = Chunk(self.worldArray, self.heightMap, chunkIndex, chunkPosition)
-                    chunk.upload()
+    def generateChunks(self, numWorkers = 1):
+        '''
+        Generate the terrain for the whole world with a single column fill kernel (or with parallel region worker processes that generate their own part of the height map) and then summarize the chunks
+        '''
+        if numWorkers > 1:
+            worldArray = np.zeros(self.worldSize, 'u1') if isColumnRLE(self.worldArray) else self.worldArray
+            generateTerrainParallel(worldArray, self.seed, numWorkers) # In place, so a dense world is never copied
+            if isColumnRLE(self.worldArray):
+                self.worldArray = ColumnRLE.fromDense(worldArray)
+        elif isColumnRLE(self.worldArray):
+            self.generateColumnsRLE()
+        else:
+            heightMap = generateHeightMap(self.seed, self.worldSize[X_INDEX])
+            generateTerrain(self.worldArray, heightMap, self.seed)
+        self.chunkSummary.build(self.worldArray)
+
+    def generateColumnsRLE(self):
+        '''
+        Generate the terrain one slab of chunks at a time and encode every slab into the column RLE world so that the dense world is never allocated
+        '''
+        heightMap = generateHeightMap(self.seed, self.worldSize[X_INDEX])
+        bands = buildElevationBands(self.worldSize[Y_INDEX])
+
+        for xStart in range(0, self.worldSize[X_INDEX], CHUNK_SIZE):
+            slab = np.zeros((CHUNK_SIZE, *self.worldSize[Y_INDEX:]), 'u1')
+            fillBlock(slab, heightMap[xStart:xStart + CHUNK_SIZE], *bands, self.seed, xStart, 0)
+            self.worldArray.encodeSlab(xStart, slab)
+        self.worldArray.trim()
+
+    def getWorldStats(self):
+        '''
+        Return world statistics (chunk occupancy and voxel counts) from the chunk summary
+        '''
+        return self.chunkSummary.getStats()
     
     def assignMaterials(self):
         '''
         Assign all the materials to a numpy array and bind it to an OpenGL SSBO
         '''
-        materialDType = np.dtype([
-            ('color', 'f4', 3),
-            ('materialID', 'i4'),
-            ('materialParameter', 'f4'),
-            ('textureID', 'i4'),
-            ('padding', 'f4', 2)
-        ])
-
-        self.materialArray = np.empty(len(self.materialList), materialDType)
-
-        for i, material in enumerate(self.materialList):
-            material.record(self.materialArray, i)
+        self.materialArray = buildMaterialArray(self.materialList)
+        if self.ctx is None:
+            return
 
         self.materials = self.ctx.buffer(self.materialArray)
         self.materials.bind_to_storage_buffer(0)
@@ -291,8 +643,15 @@ class World:
         '''
         Assign the world image texture
         '''
-        self.world = self.ctx.texture3d(self.worldSize, 1, self.worldArray, dtype = 'u1')
+        if isColumnRLE(self.worldArray):
+            self.world = self.ctx.texture3d(self.worldSize[::-1], 1, dtype = 'u1') # Reversed because the z axis is contiguous in the world array
+            writeRegions(self.world, self.worldArray, [((xStart, 0, 0), (xStart + CHUNK_SIZE, *self.worldSize[Y_INDEX:])) for xStart in range(0, self.worldSize[X_INDEX], CHUNK_SIZE)])
+        else:
+            self.world = self.ctx.texture3d(self.worldSize[::-1], 1, self.worldArray, dtype = 'u1') # Reversed because the z axis is contiguous in the world array
         self.world.bind_to_image(2)
+        self.dirtyRegions.popBoxes() # The whole world array was just written
+        self.brickmap.assignTexture(self.ctx)
+        self.rayTracer['worldOrigin'] = self.getWorldOrigin()
 
     def assignRender(self):
         '''
@@ -300,4 +659,9 @@ class World:
         '''
         self.assignMaterials()        
         self.assignWorld()
-        self.writeLightsToSSBO()
\ No newline at end of file
+        self.writeLightsToSSBO()
+
+        self.rayTracer['lightGridSize'] = self.lightGrid.gridSize
+        self.rayTracer['lightCellSize'] = self.lightGrid.cellSize
+        self.rayTracer['lightCellCapacity'] = self.lightGrid.capacity
+        self.rayTracer['uniformLightFraction'] = UNIFORM_LIGHT_FRACTION
\ No newline at end of file
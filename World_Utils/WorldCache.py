@@ -0,0 +1,115 @@
+from Settings import *
+import struct
+
+CACHE_MAGIC = b'VXCA'
+CACHE_VERSION = 1
+CACHE_EXTENSION = '.cache'
+CACHE_DATA_OFFSET = 4096 # The voxels start on a page boundary after the header
+
+# Magic, version, world size (x, y, z), seed (-1 when unknown), size and modification time of the save it matches, whether it still matches that save
+CACHE_HEADER = struct.Struct('<4sI3IqQQI')
+
+def getSaveStamp(savePath):
+    '''
+    Get the stamp (size and modification time) that identifies a save file's current contents
+    '''
+    if not os.path.isfile(savePath):
+        return 0, 0
+    fileStats = os.stat(savePath)
+    return fileStats.st_size, fileStats.st_mtime_ns
+
+class WorldCache:
+    '''
+    Uncompressed copy of the world array on disk that's opened with np.memmap, so startup skips decompressing the save and only the pages that are actually read get loaded. Edits write straight through to the mapped pages. The header records the save it matches (by its size and modification time) and is marked dirty on the first edit, so the cache is only trusted while it holds exactly what the authoritative save holds
+    '''
+    def __init__(self, filePath):
+        self.filePath = filePath
+        self.array, self.seed, self.clean = None, None, False
+        self.editCount, self.savedEditCount, self.pendingSave = 0, None, None
+
+    def readHeader(self):
+        '''
+        Read the header of the cache file (None if it's missing or isn't a cache file)
+        '''
+        if not os.path.isfile(self.filePath) or os.path.getsize(self.filePath) < CACHE_DATA_OFFSET:
+            return None
+
+        with open(self.filePath, 'rb') as file:
+            magic, version, sizeX, sizeY, sizeZ, seed, stampSize, stampTime, clean = CACHE_HEADER.unpack(file.read(CACHE_HEADER.size))
+        if magic != CACHE_MAGIC:
+            return None
+        return {'version': version, 'worldSize': (sizeX, sizeY, sizeZ), 'seed': None if seed < 0 else seed, 'stamp': (stampSize, stampTime), 'clean': bool(clean)}
+
+    def writeHeader(self, worldSize, seed, stamp, clean):
+        '''
+        Write the header of the cache file
+        '''
+        seed = -1 if seed is None else int(seed)
+        with open(self.filePath, 'r+b') as file:
+            file.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, *worldSize, seed, *stamp, int(clean)))
+        self.clean = clean
+
+    def isValid(self, savePath):
+        '''
+        Check whether the cache holds exactly the world in a save (same version, untouched since it matched, and the save hasn't changed since)
+        '''
+        header = self.readHeader()
+        return header is not None and header['version'] == CACHE_VERSION and header['clean'] and header['stamp'] == getSaveStamp(savePath)
+
+    def open(self):
+        '''
+        Memory map the cached world array (read and write)
+        '''
+        header = self.readHeader()
+        self.seed, self.clean = header['seed'], header['clean']
+        self.array = np.memmap(self.filePath, 'u1', 'r+', CACHE_DATA_OFFSET, header['worldSize'])
+        return self.array
+
+    def create(self, worldArray, seed, savePath, matchesSave):
+        '''
+        Write a world array to a new cache and memory map it. matchesSave says whether the world array is exactly what the save holds
+        '''
+        worldSize = tuple(int(size) for size in np.shape(worldArray))
+        with open(self.filePath, 'wb') as file:
+            file.truncate(CACHE_DATA_OFFSET + int(np.prod(worldSize)))
+        self.writeHeader(worldSize, seed, getSaveStamp(savePath), False)
+
+        self.array = np.memmap(self.filePath, 'u1', 'r+', CACHE_DATA_OFFSET, worldSize)
+        self.array[:] = worldArray
+        self.seed = seed
+
+        if matchesSave:
+            self.markClean(savePath)
+        return self.array
+
+    def markDirty(self):
+        '''
+        Record an edit (the first edit after the cache matched its save marks the header dirty before the edit reaches the mapped pages)
+        '''
+        self.editCount += 1
+        if self.clean:
+            self.writeHeader(self.array.shape, self.seed, (0, 0), False)
+
+    def markClean(self, savePath):
+        '''
+        Flush the mapped pages and record that the cache now matches a save
+        '''
+        self.array.flush()
+        self.writeHeader(self.array.shape, self.seed, getSaveStamp(savePath), True)
+
+    def saveStarted(self, saveFuture):
+        '''
+        Remember the edit count when a save was snapshotted so that the cache can be marked clean once that save is written if nothing was edited since
+        '''
+        self.savedEditCount, self.pendingSave = self.editCount, saveFuture
+
+    def update(self, savePath):
+        '''
+        Mark the cache clean once the last save has been written if there were no edits after its snapshot (once per frame)
+        '''
+        if self.clean or self.pendingSave is None or not self.pendingSave.done():
+            return
+
+        saveFuture, self.pendingSave = self.pendingSave, None
+        if saveFuture.exception() is None and self.savedEditCount == self.editCount:
+            self.markClean(savePath)
@@ -1,11 +1,39 @@
-import os 
-import sys 
+import importlib
+import os
+import sys
 
 WORKING_DIR = os.getcwd()
 sys.path.append(os.path.join(WORKING_DIR, 'World_Utils'))
 
-from Noise import *
-from Chunk import *
-from Textures import *
-from Materials import *
-from World import *
\ No newline at end of file
+SUBMODULES = (
+    'Profiler', 'Noise', 'Chunk', 'RegionGeneration', 'Textures', 'BlockTextures', 'Materials', 'LightTable', 'LightGrid', 'DirtyRegions', 'ColumnRLE', 'ChunkSummary',
+    'DDA', 'Brickmap', 'LODPyramid', 'Streaming', 'RegionFile', 'SaveService', 'WorldCache', 'EditJournal', 'PathTracer', 'World'
+)
+
+def loadSubsystem():
+    '''
+    Import every submodule (Numba included) and put their public names in the package, like a star import of each of them in order. Returns the names
+    '''
+    if '__all__' in globals():
+        return __all__
+
+    names = {}
+    for moduleName in SUBMODULES:
+        module = importlib.import_module(moduleName)
+        publicNames = getattr(module, '__all__', [name for name in vars(module) if not name.startswith('_')])
+        names.update((name, getattr(module, name)) for name in publicNames)
+
+    globals().update(names)
+    globals()['__all__'] = list(names)
+    return __all__
+
+def __getattr__(name):
+    '''
+    Load the world subsystem the first time a name is looked up in the package (a star import looks up __all__), so importing a light submodule like World_Utils.Ray doesn't import Numba
+    '''
+    names = loadSubsystem()
+    if name == '__all__':
+        return names
+    if name in globals():
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")